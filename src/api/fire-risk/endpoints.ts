@@ -11,6 +11,7 @@ import type {
   FireRiskPredictionRequest,
   FireRiskPredictionResponse,
   MapDataPoint,
+  NearbyDetectionsResponse,
 } from './types';
 
 // URLs dos endpoints internos
@@ -21,6 +22,7 @@ const ENDPOINTS = {
   historicalData: '/api/fire-risk/historical',
   predict: '/api/fire-risk/predict',
   mapData: '/api/fire-risk/map-data',
+  nearby: '/api/fire-risk/nearby',
 } as const;
 
 /**
@@ -129,9 +131,11 @@ export async function getMapData(params?: {
     west: number;
   };
   municipio?: string;
+  month?: number;
 }): Promise<MapDataPoint[]> {
   const searchParams = new URLSearchParams();
   if (params?.municipio) searchParams.set('municipio', params.municipio);
+  if (params?.month) searchParams.set('month', params.month.toString());
   if (params?.bounds) {
     searchParams.set('north', params.bounds.north.toString());
     searchParams.set('south', params.bounds.south.toString());
@@ -144,3 +148,26 @@ export async function getMapData(params?: {
 
   return fetchInternal<MapDataPoint[]>(endpoint);
 }
+
+/**
+ * Busca detecções históricas perto de um ponto (raio em km ou k mais próximas)
+ */
+export async function getNearbyDetections(params: {
+  latitude: number;
+  longitude: number;
+  radiusKm?: number;
+  k?: number;
+  days?: number;
+  limit?: number;
+}): Promise<NearbyDetectionsResponse> {
+  const searchParams = new URLSearchParams({
+    lat: params.latitude.toString(),
+    lon: params.longitude.toString(),
+  });
+  if (params.radiusKm) searchParams.set('radius_km', params.radiusKm.toString());
+  if (params.k) searchParams.set('k', params.k.toString());
+  if (params.days) searchParams.set('days', params.days.toString());
+  if (params.limit) searchParams.set('limit', params.limit.toString());
+
+  return fetchInternal<NearbyDetectionsResponse>(`${ENDPOINTS.nearby}?${searchParams.toString()}`);
+}
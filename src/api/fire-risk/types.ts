@@ -20,6 +20,54 @@ export interface FireRiskMetrics {
     feature: string;
     importance: number;
   }>;
+  search?: {
+    strategy: 'grid' | 'halving' | 'random';
+    best_params: Record<string, number | string>;
+    best_score: number;
+    evaluated_configs: number;
+    wall_time_s: number;
+  };
+  backtest?: FireRiskBacktest;
+}
+
+export interface BacktestMetrics {
+  rmse: number;
+  mae: number;
+  r2: number | null;
+  n: number;
+}
+
+export interface FireRiskBacktest {
+  config: {
+    period: string;
+    horizon: number;
+    min_train_periods: number;
+    train_periods: number | null;
+    window: 'expanding' | 'rolling';
+  };
+  summary: {
+    folds: number;
+    pooled: BacktestMetrics;
+    rmse_mean: number | null;
+    rmse_std: number | null;
+    mae_mean: number | null;
+    mae_std: number | null;
+    r2_mean: number | null;
+    r2_std: number | null;
+  };
+  horizons: Array<BacktestMetrics & { horizon: number }>;
+  folds: Array<
+    BacktestMetrics & {
+      fold: number;
+      train_start: string;
+      train_end: string;
+      test_start: string;
+      test_end: string;
+      train_rows: number;
+      test_rows: number;
+      horizons: Array<BacktestMetrics & { horizon: number }>;
+    }
+  >;
 }
 
 export interface ModelComparison {
@@ -124,6 +172,27 @@ export interface MapDataPoint {
   };
 }
 
+// Detecção histórica devolvida por /api/fire-risk/nearby (mais próxima primeiro)
+export interface NearbyDetection {
+  latitude: number;
+  longitude: number;
+  data_hora: string;
+  risco_fogo: number | null;
+  frp: number | null;
+  distance_km: number;
+}
+
+export interface NearbyDetectionsResponse {
+  latitude: number;
+  longitude: number;
+  radius_km: number | null;
+  k: number | null;
+  days: number | null;
+  count: number;
+  risk_mean: number | null;
+  detections: NearbyDetection[];
+}
+
 export interface ChartDataPoint {
   name: string;
   neural_network: number;
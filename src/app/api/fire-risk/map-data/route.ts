@@ -1,6 +1,7 @@
 /**
  * API Route: GET /api/fire-risk/map-data
- * Retorna dados para visualização no mapa baseados no CSV real
+ * Retorna dados para visualização no mapa a partir do agregado por município
+ * gerado pelo pipeline Python (output/map_data.json), sem ler o CSV
  */
 
 import fs from 'fs';
@@ -24,120 +25,131 @@ interface MapPoint {
   };
 }
 
-// Carregar e processar dados do CSV
-// eslint-disable-next-line sonarjs/cognitive-complexity
-function loadMapDataFromCSV(): MapPoint[] {
-  const csvPath = path.join(process.cwd(), 'src', 'scripts', 'bdqueimadas.csv');
+// Registro de map_data.json (valores de risco entre 0 e 1)
+interface MapDataEntry {
+  latitude: number;
+  longitude: number;
+  count: number;
+  risk_mean: number | null;
+  dias_sem_chuva: number | null;
+  precipitacao: number | null;
+  frp: number | null;
+  last_detection: string;
+  predictions: {
+    neural_network: number;
+    knn: number;
+    random_forest: number;
+  };
+  average_prediction: number;
+  risk_level: string;
+}
 
-  if (!fs.existsSync(csvPath)) {
-    console.log('CSV não encontrado, usando dados de fallback');
-    return getFallbackData();
-  }
+interface MunicipalityEntry extends MapDataEntry {
+  municipio: string;
+  months: Record<string, MapDataEntry>;
+}
 
-  try {
-    const csvContent = fs.readFileSync(csvPath, 'utf-8');
-    const lines = csvContent.split('\n').filter((line) => line.trim());
-    const headers = lines[0].split(',');
-
-    // Encontrar índices das colunas
-    const latIdx = headers.indexOf('Latitude');
-    const lngIdx = headers.indexOf('Longitude');
-    const municipioIdx = headers.indexOf('Municipio');
-    const dataHoraIdx = headers.indexOf('DataHora');
-    const riscoFogoIdx = headers.indexOf('RiscoFogo');
-    const diasSemChuvaIdx = headers.indexOf('DiaSemChuva');
-    const frpIdx = headers.indexOf('FRP');
-
-    // Agrupar por município para evitar muitos pontos sobrepostos
-    const municipioData: Record<
-      string,
-      {
-        points: Array<{
-          lat: number;
-          lng: number;
-          risco: number;
-          diasSemChuva: number;
-          frp: number;
-          dataHora: string;
-        }>;
-      }
-    > = {};
-
-    // Processar linhas (pegar últimos 500 registros para performance)
-    const dataLines = lines.slice(1).slice(-500);
-
-    for (const line of dataLines) {
-      const values = line.split(',');
-      const municipio = values[municipioIdx]?.trim();
-      const lat = parseFloat(values[latIdx]);
-      const lng = parseFloat(values[lngIdx]);
-      const risco = parseFloat(values[riscoFogoIdx]);
-      const diasSemChuva = parseFloat(values[diasSemChuvaIdx]);
-      const frp = parseFloat(values[frpIdx]);
-      const dataHora = values[dataHoraIdx];
-
-      // Validar dados
-      if (!municipio || isNaN(lat) || isNaN(lng) || risco === -999) continue;
-
-      if (!municipioData[municipio]) {
-        municipioData[municipio] = { points: [] };
-      }
+interface MapData {
+  municipalities: Record<string, MunicipalityEntry>;
+}
 
-      municipioData[municipio].points.push({
-        lat,
-        lng,
-        risco: risco === -999 ? 0 : risco,
-        diasSemChuva: diasSemChuva === -999 ? 0 : diasSemChuva,
-        frp: frp || 0,
-        dataHora,
-      });
-    }
+interface LoadedMapData {
+  filePath: string;
+  mtimeMs: number;
+  municipalities: Record<string, MunicipalityEntry>;
+  ids: Record<string, string>;
+  points: MapPoint[];
+}
 
-    // Criar um ponto por município (média das coordenadas e risco)
-    const mapPoints: MapPoint[] = [];
-    let id = 1;
-
-    for (const [municipio, data] of Object.entries(municipioData)) {
-      if (data.points.length === 0) continue;
-
-      // Calcular médias
-      const avgLat = data.points.reduce((acc, p) => acc + p.lat, 0) / data.points.length;
-      const avgLng = data.points.reduce((acc, p) => acc + p.lng, 0) / data.points.length;
-      const avgRisco = data.points.reduce((acc, p) => acc + p.risco, 0) / data.points.length;
-      const avgDiasSemChuva =
-        data.points.reduce((acc, p) => acc + p.diasSemChuva, 0) / data.points.length;
-      const avgFrp = data.points.reduce((acc, p) => acc + p.frp, 0) / data.points.length;
-      const lastDataHora = data.points[data.points.length - 1].dataHora;
-
-      // Converter risco de 0-1 para 0-100
-      const riskPercent = avgRisco * 100;
-
-      mapPoints.push({
-        id: `csv-${id++}`,
-        latitude: avgLat,
-        longitude: avgLng,
-        riskLevel: Math.round(riskPercent * 10) / 10,
-        municipio: municipio.toUpperCase(),
-        dataHora: lastDataHora,
-        diasSemChuva: Math.round(avgDiasSemChuva),
-        frp: Math.round(avgFrp * 10) / 10,
-        predictions: {
-          // Usar o risco real como base para todas as predições
-          neural_network: Math.round(riskPercent * 10) / 10,
-          knn: Math.round(riskPercent * 10) / 10,
-          random_forest: Math.round(riskPercent * 10) / 10,
-        },
-      });
+// Agregado mantido em memória enquanto o arquivo não mudar
+let loaded: LoadedMapData | null = null;
+
+function findMapDataPath(): string | null {
+  const candidates = [
+    path.join(process.cwd(), 'src', 'scripts', 'output', 'map_data.json'),
+    path.join(process.cwd(), 'output', 'map_data.json'),
+  ];
+  return candidates.find((candidate) => fs.existsSync(candidate)) ?? null;
+}
+
+const toPercent = (value: number | null) => Math.round((value ?? 0) * 1000) / 10;
+
+function toMapPoint(id: string, municipio: string, entry: MapDataEntry): MapPoint {
+  return {
+    id,
+    latitude: entry.latitude,
+    longitude: entry.longitude,
+    riskLevel: toPercent(entry.risk_mean),
+    municipio,
+    dataHora: entry.last_detection,
+    diasSemChuva: Math.round(entry.dias_sem_chuva ?? 0),
+    frp: Math.round((entry.frp ?? 0) * 10) / 10,
+    predictions: {
+      neural_network: toPercent(entry.predictions.neural_network),
+      knn: toPercent(entry.predictions.knn),
+      random_forest: toPercent(entry.predictions.random_forest),
+    },
+  };
+}
+
+function loadMapData(): LoadedMapData | null {
+  const filePath = findMapDataPath();
+  if (!filePath) {
+    return null;
+  }
+
+  try {
+    const { mtimeMs } = fs.statSync(filePath);
+    if (loaded?.filePath === filePath && loaded.mtimeMs === mtimeMs) {
+      return loaded;
     }
 
-    return mapPoints.length > 0 ? mapPoints : getFallbackData();
+    const data = JSON.parse(fs.readFileSync(filePath, 'utf-8')) as MapData;
+    const names = Object.keys(data.municipalities);
+    const ids = Object.fromEntries(names.map((name, index) => [name, `mun-${index + 1}`]));
+
+    loaded = {
+      filePath,
+      mtimeMs,
+      municipalities: data.municipalities,
+      ids,
+      points: names.map((name) => toMapPoint(ids[name], name, data.municipalities[name])),
+    };
+    return loaded;
   } catch (error) {
-    console.error('Erro ao ler CSV:', error);
-    return getFallbackData();
+    console.error('Erro ao ler map_data.json:', error);
+    return null;
   }
 }
 
-// Dados de fallback caso o CSV não esteja disponível
+// Pontos de um mês (municípios sem detecções no mês ficam de fora)
+function monthPoints(data: LoadedMapData, names: string[], month: string): MapPoint[] {
+  return names.flatMap((name) => {
+    const entry = data.municipalities[name]?.months[month];
+    return entry ? [toMapPoint(`${data.ids[name]}-${month}`, name, entry)] : [];
+  });
+}
+
+function selectPoints(data: LoadedMapData, municipio: string | null, month: string | null) {
+  let names: string[] | null = null;
+  if (municipio) {
+    const key = municipio.toUpperCase();
+    names = data.municipalities[key]
+      ? [key]
+      : Object.keys(data.municipalities).filter((name) => name.includes(key));
+  }
+
+  if (month) {
+    return monthPoints(data, names ?? Object.keys(data.municipalities), month);
+  }
+  if (names) {
+    const selected = new Set(names);
+    return data.points.filter((point) => selected.has(point.municipio));
+  }
+  return data.points;
+}
+
+// Dados de fallback caso o agregado ainda não tenha sido gerado
 function getFallbackData(): MapPoint[] {
   // Dados baseados em estatísticas reais do RN (dezembro = alta seca)
   const baseRisk = 95; // Dezembro tem risco muito alto
@@ -172,20 +184,45 @@ function getFallbackData(): MapPoint[] {
   }));
 }
 
+function parseBounds(searchParams: URLSearchParams) {
+  const [north, south, east, west] = ['north', 'south', 'east', 'west'].map((name) =>
+    parseFloat(searchParams.get(name) ?? ''),
+  );
+  return [north, south, east, west].some(isNaN) ? null : { north, south, east, west };
+}
+
 export async function GET(request: Request) {
   try {
     const { searchParams } = new URL(request.url);
     const municipio = searchParams.get('municipio');
+    const month = searchParams.get('month');
+    const bounds = parseBounds(searchParams);
+
+    // Agregado do pipeline; sem ele, dados de fallback
+    const mapData = loadMapData();
+    let points: MapPoint[];
+    if (mapData) {
+      points = selectPoints(mapData, municipio, month);
+    } else {
+      points = getFallbackData();
+      if (municipio) {
+        points = points.filter((point) =>
+          point.municipio.toLowerCase().includes(municipio.toLowerCase()),
+        );
+      }
+    }
 
-    // Carregar dados do CSV
-    const mapData = loadMapDataFromCSV();
-
-    // Filtrar por município se especificado
-    const filteredData = municipio
-      ? mapData.filter((point) => point.municipio.toLowerCase().includes(municipio.toLowerCase()))
-      : mapData;
+    if (bounds) {
+      points = points.filter(
+        (point) =>
+          point.latitude <= bounds.north &&
+          point.latitude >= bounds.south &&
+          point.longitude <= bounds.east &&
+          point.longitude >= bounds.west,
+      );
+    }
 
-    return NextResponse.json(filteredData);
+    return NextResponse.json(points);
   } catch (error) {
     console.error('Error fetching map data:', error);
     return NextResponse.json({ error: 'Failed to fetch map data' }, { status: 500 });
@@ -8,8 +8,16 @@ import path from 'path';
 
 import { NextResponse } from 'next/server';
 
+import { fetchFromFireRiskServer } from '@/lib/fireRiskServer';
+
 export async function GET() {
   try {
+    // Servidor de predição (modelos já carregados), quando configurado
+    const served = await fetchFromFireRiskServer<unknown>('/metrics');
+    if (served) {
+      return NextResponse.json(served);
+    }
+
     // Tentar primeiro no diretório src/scripts/output (onde o Python salva)
     let metricsPath = path.join(process.cwd(), 'src', 'scripts', 'output', 'model_metrics.json');
 
@@ -0,0 +1,39 @@
+/**
+ * API Route: GET /api/fire-risk/nearby
+ * Detecções históricas perto de um ponto (raio ou k mais próximas), pelo
+ * índice espacial do servidor de predição Python (FIRE_RISK_SERVER_URL)
+ */
+
+import { NextResponse } from 'next/server';
+
+import type { NearbyDetectionsResponse } from '@/api/fire-risk/types';
+import { fetchFromFireRiskServer } from '@/lib/fireRiskServer';
+
+// Parâmetros repassados ao servidor
+const FORWARDED_PARAMS = ['lat', 'lon', 'radius_km', 'k', 'days', 'limit'];
+
+export async function GET(request: Request) {
+  const { searchParams } = new URL(request.url);
+  const lat = parseFloat(searchParams.get('lat') ?? '');
+  const lon = parseFloat(searchParams.get('lon') ?? '');
+  if (isNaN(lat) || isNaN(lon)) {
+    return NextResponse.json({ error: 'lat and lon are required' }, { status: 400 });
+  }
+
+  const query = new URLSearchParams();
+  for (const name of FORWARDED_PARAMS) {
+    const value = searchParams.get(name);
+    if (value !== null) {
+      query.set(name, value);
+    }
+  }
+
+  const nearby = await fetchFromFireRiskServer<NearbyDetectionsResponse>(
+    `/detections/nearby?${query.toString()}`,
+  );
+  if (!nearby) {
+    return NextResponse.json({ error: 'Fire risk server unavailable' }, { status: 503 });
+  }
+
+  return NextResponse.json(nearby);
+}
@@ -1,7 +1,8 @@
 /**
  * API Route: POST /api/fire-risk/predict
  * Faz predição de risco de fogo para uma localização específica
- * Usa fórmula baseada nos pesos de feature importance do Random Forest
+ * Usa os modelos treinados via servidor de predição Python (FIRE_RISK_SERVER_URL)
+ * e, se indisponível, fórmula baseada nos pesos de feature importance do Random Forest
  */
 
 import fs from 'fs';
@@ -9,6 +10,8 @@ import path from 'path';
 
 import { NextRequest, NextResponse } from 'next/server';
 
+import { fetchFromFireRiskServer } from '@/lib/fireRiskServer';
+
 interface PredictionRequest {
   latitude: number;
   longitude: number;
@@ -18,6 +21,12 @@ interface PredictionRequest {
   frp?: number;
 }
 
+interface ServerPrediction {
+  predictions: Record<'neural_network' | 'knn' | 'random_forest', number>;
+  average_prediction: number;
+  risk_level: string;
+}
+
 function getRiskLevel(average: number): 'low' | 'medium' | 'high' | 'critical' {
   if (average < 25) return 'low';
   if (average < 50) return 'medium';
@@ -85,15 +94,69 @@ export async function POST(request: NextRequest) {
       return NextResponse.json({ error: 'Latitude e longitude são obrigatórios' }, { status: 400 });
     }
 
-    const modelData = loadModelData();
-    const fi = modelData.featureImportance;
-
     // Parâmetros de entrada (com defaults baseados na época atual - dezembro = seca)
-    const currentMonth = new Date().getMonth() + 1;
+    const now = new Date();
+    const currentMonth = now.getMonth() + 1;
     const diaSemChuva = body.diaSemChuva ?? (currentMonth >= 6 ? 50 : 10);
     const precipitacao = body.precipitacao ?? 0;
     const frp = body.frp ?? 5;
 
+    const location = {
+      latitude: body.latitude,
+      longitude: body.longitude,
+      municipio: body.municipio || 'Mossoró',
+    };
+    const inputFeatures = {
+      diaSemChuva,
+      precipitacao,
+      frp,
+      mes: currentMonth,
+    };
+
+    // Predição real dos modelos (escala 0-1), quando o servidor está configurado
+    const served = await fetchFromFireRiskServer<{ predictions: ServerPrediction[] }>(
+      '/predict',
+      {
+        method: 'POST',
+        body: JSON.stringify({
+          Latitude: body.latitude,
+          Longitude: body.longitude,
+          ...(body.municipio && { Municipio: body.municipio.toUpperCase() }),
+          DiaSemChuva: diaSemChuva,
+          Precipitacao: precipitacao,
+          FRP: frp,
+          Mes: currentMonth,
+          Dia: now.getDate(),
+          DiaSemana: (now.getDay() + 6) % 7,
+          Hora: now.getHours(),
+          // Data da predição: define a janela das features de vizinhança
+          DataHora: now.toISOString(),
+        }),
+      },
+    );
+
+    if (served?.predictions?.[0]) {
+      const toPercent = (value: number) => Math.round(value * 1000) / 10;
+      const prediction = served.predictions[0];
+      const average = toPercent(prediction.average_prediction);
+
+      return NextResponse.json({
+        location,
+        input_features: inputFeatures,
+        predictions: {
+          neural_network: toPercent(prediction.predictions.neural_network),
+          knn: toPercent(prediction.predictions.knn),
+          random_forest: toPercent(prediction.predictions.random_forest),
+          average,
+          risk_level: getRiskLevel(average),
+        },
+        timestamp: now.toISOString(),
+      });
+    }
+
+    const modelData = loadModelData();
+    const fi = modelData.featureImportance;
+
     // Calcular risco baseado na fórmula de feature importance
     // Normalizar cada feature para escala 0-1
 
@@ -144,17 +207,8 @@ export async function POST(request: NextRequest) {
     const average = (predictions.neural_network + predictions.knn + predictions.random_forest) / 3;
 
     const response = {
-      location: {
-        latitude: body.latitude,
-        longitude: body.longitude,
-        municipio: body.municipio || 'Mossoró',
-      },
-      input_features: {
-        diaSemChuva,
-        precipitacao,
-        frp,
-        mes: currentMonth,
-      },
+      location,
+      input_features: inputFeatures,
       predictions: {
         neural_network: predictions.neural_network,
         knn: predictions.knn,
@@ -162,7 +216,7 @@ export async function POST(request: NextRequest) {
         average: Math.round(average * 10) / 10,
         risk_level: getRiskLevel(average),
       },
-      timestamp: new Date().toISOString(),
+      timestamp: now.toISOString(),
     };
 
     return NextResponse.json(response);
@@ -8,9 +8,17 @@ import path from 'path';
 
 import { NextResponse } from 'next/server';
 
+import { fetchFromFireRiskServer } from '@/lib/fireRiskServer';
+
 // eslint-disable-next-line sonarjs/cognitive-complexity
 export async function GET() {
   try {
+    // Servidor de predição (modelos já carregados), quando configurado
+    const served = await fetchFromFireRiskServer<unknown>('/predictions/year');
+    if (served) {
+      return NextResponse.json(served);
+    }
+
     // Tentar primeiro no diretório src/scripts/output (onde o Python salva)
     let predictionsPath = path.join(
       process.cwd(),
@@ -0,0 +1,37 @@
+/**
+ * Cliente do servidor de predição Python (src/scripts/fire_risk_server.py)
+ * Ativo apenas quando FIRE_RISK_SERVER_URL está definido; em caso de falha as
+ * rotas continuam usando os JSONs gerados pelo script
+ */
+
+import { FIRE_RISK_SERVER_URL } from '@/config';
+
+const REQUEST_TIMEOUT_MS = 2000;
+
+export async function fetchFromFireRiskServer<T>(
+  path: string,
+  init?: RequestInit,
+): Promise<T | null> {
+  if (!FIRE_RISK_SERVER_URL) {
+    return null;
+  }
+
+  try {
+    const response = await fetch(`${FIRE_RISK_SERVER_URL.replace(/\/$/, '')}${path}`, {
+      ...init,
+      headers: { 'Content-Type': 'application/json', ...init?.headers },
+      cache: 'no-store',
+      signal: AbortSignal.timeout(REQUEST_TIMEOUT_MS),
+    });
+
+    if (!response.ok) {
+      console.error(`Fire risk server ${path} returned ${response.status}`);
+      return null;
+    }
+
+    return (await response.json()) as T;
+  } catch (error) {
+    console.error(`Fire risk server ${path} unavailable:`, error);
+    return null;
+  }
+}
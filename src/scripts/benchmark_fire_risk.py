@@ -0,0 +1,282 @@
+"""
+Benchmark do pipeline de Predição de Risco de Fogo
+Gera dados sintéticos no formato do BDQueimadas em várias escalas e mede
+cada etapa do FireRiskPredictor (leitura, limpeza, features, treino e
+predição de cada modelo). Roda offline, apenas em CPU.
+
+Uso:
+    python benchmark_fire_risk.py                          # 10k, 1M e 10M linhas
+    python benchmark_fire_risk.py --sizes 10000 100000
+    python benchmark_fire_risk.py --save-baseline          # grava a referência
+    python benchmark_fire_risk.py --threshold 0.25         # compara com a referência
+    python benchmark_fire_risk.py --out-of-core            # treino em blocos a partir do disco
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from fire_risk_prediction import FireRiskPredictor, OutputWriter, create_synthetic_bdqueimadas
+
+# Escalas padrão do benchmark (linhas do CSV sintético)
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+
+# Linhas geradas/gravadas por vez ao criar o CSV sintético
+GENERATION_CHUNK = 1_000_000
+
+# Janela de datas dos registros sintéticos
+SYNTHETIC_START = '2015-01-01'
+SYNTHETIC_END = '2024-12-31 23:59:59'
+
+# Linhas usadas na medição de predição em lote
+PREDICT_ROWS = 10_000
+
+# Diferença mínima (s) para uma etapa mais lenta contar como regressão
+MIN_REGRESSION_SECONDS = 0.05
+
+
+def write_synthetic_csv(path, n_rows, seed=42):
+    """
+    Grava um CSV sintético de n_rows linhas em blocos, com datas distribuídas
+    uniformemente na janela SYNTHETIC_START..SYNTHETIC_END
+    """
+    start = pd.Timestamp(SYNTHETIC_START)
+    span = pd.Timestamp(SYNTHETIC_END) - start
+    tmp_path = f'{path}.tmp'
+
+    for i, offset in enumerate(range(0, n_rows, GENERATION_CHUNK)):
+        n_chunk = min(GENERATION_CHUNK, n_rows - offset)
+        chunk = create_synthetic_bdqueimadas(
+            n_chunk,
+            seed=seed + i,
+            start=start + span * (offset / n_rows),
+            end=start + span * ((offset + n_chunk - 1) / n_rows)
+        )
+        chunk['DataHora'] = chunk['DataHora'].dt.strftime('%Y/%m/%d %H:%M:%S')
+        chunk.to_csv(tmp_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+
+    os.replace(tmp_path, path)
+
+
+def synthetic_csv(data_dir, n_rows, seed=42):
+    """
+    Caminho do CSV sintético de n_rows linhas, gerado só na primeira vez
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f'synthetic_{n_rows}_{seed}.csv')
+
+    if not os.path.exists(path):
+        print(f"🧪 Gerando CSV sintético com {n_rows} linhas...")
+        write_synthetic_csv(path, n_rows, seed)
+
+    return path
+
+
+def write_json(path, data):
+    """
+    Grava data em path (JSON indentado) de forma atômica
+    """
+    return OutputWriter(os.path.dirname(path) or '.').json(os.path.basename(path), data, indent=2)
+
+
+def run_size(csv_path, parallel=False, out_of_core=False):
+    """
+    Executa o pipeline completo sobre um CSV e retorna as medições por etapa
+    """
+    with tempfile.TemporaryDirectory(prefix='fire_risk_bench_') as work_dir:
+        predictor = FireRiskPredictor(data_path=csv_path, cache_dir=os.path.join(work_dir, 'cache'))
+
+        start = time.perf_counter()
+
+        # Leitura sem cache e depois a partir do cache Parquet
+        predictor.load_and_prepare_data()
+        cached = FireRiskPredictor(data_path=csv_path, cache_dir=predictor.cache_dir)
+        cached.load_and_prepare_data()
+        predictor.profile.append({**cached.profile[-1], 'stage': 'load_from_cache'})
+
+        if out_of_core:
+            predictor.prepare_features(memmap_dir=os.path.join(work_dir, 'design'))
+            predictor.train_out_of_core()
+        else:
+            predictor.prepare_features()
+            predictor.train_all(parallel=parallel)
+
+        # Predição em lote e por modelo
+        X_test = pd.DataFrame(
+            predictor.scaler.inverse_transform(predictor.X_test_scaled), columns=predictor.feature_names
+        )
+        batch = X_test.sample(n=PREDICT_ROWS, replace=len(X_test) < PREDICT_ROWS, random_state=42)
+        predictor.predict_batch(batch)
+
+        model_predict = {}
+        batch_scaled = predictor.scaler.transform(batch)
+        for model_name, model in predictor.models.items():
+            model_start = time.perf_counter()
+            model.predict(batch_scaled)
+            elapsed = time.perf_counter() - model_start
+            model_predict[model_name] = {
+                'wall_time_s': round(elapsed, 4),
+                'rows_per_s': round(len(batch) / elapsed, 1)
+            }
+
+        predictor.predict_year()
+        predictor.predict_week()
+
+        # Bundle: gravação e cold start
+        bundle_path = os.path.join(work_dir, 'model_bundle.joblib')
+        predictor.save(bundle_path)
+        load_start = time.perf_counter()
+        FireRiskPredictor.load(bundle_path)
+        load_time = time.perf_counter() - load_start
+
+        total_time = time.perf_counter() - start
+
+    # Etapas de nível superior e o treino de cada modelo
+    stages = {}
+    for record in predictor.profile:
+        if record['depth'] == 0 or record['stage'].startswith('train_'):
+            stages.setdefault(record['stage'], {
+                key: value for key, value in record.items()
+                if key not in ('stage', 'depth', 'worker')
+            })
+    stages['load_bundle'] = {'wall_time_s': round(load_time, 4)}
+
+    return {
+        'rows_read': predictor.rows_read,
+        'rows_regional': len(predictor.df_mossoro),
+        'total_time_s': round(total_time, 4),
+        'stages': stages,
+        'model_predict': model_predict,
+    }
+
+
+def find_regressions(results, baseline, threshold):
+    """
+    Etapas cujo tempo de parede cresceu mais que threshold (fração) em
+    relação à referência
+    """
+    regressions = []
+    for size, current in results['sizes'].items():
+        reference = baseline.get('sizes', {}).get(size)
+        if not reference:
+            continue
+
+        timings = {f'stage:{name}': stage['wall_time_s'] for name, stage in current['stages'].items()}
+        timings.update({f'predict:{name}': m['wall_time_s'] for name, m in current['model_predict'].items()})
+        timings['total'] = current['total_time_s']
+
+        reference_timings = {f'stage:{name}': stage['wall_time_s'] for name, stage in reference['stages'].items()}
+        reference_timings.update({f'predict:{name}': m['wall_time_s'] for name, m in reference['model_predict'].items()})
+        reference_timings['total'] = reference['total_time_s']
+
+        for name, value in timings.items():
+            before = reference_timings.get(name)
+            if before is None:
+                continue
+            if value > before * (1 + threshold) and value - before > MIN_REGRESSION_SECONDS:
+                regressions.append({
+                    'size': size,
+                    'metric': name,
+                    'baseline_s': before,
+                    'current_s': value,
+                    'change': round(value / before - 1, 3) if before else None
+                })
+
+    return regressions
+
+
+def main():
+    """
+    Executa o benchmark nas escalas pedidas e compara com a referência
+    """
+    parser = argparse.ArgumentParser(description='Benchmark do pipeline de risco de fogo')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='número de linhas de cada CSV sintético')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default='./cache/benchmark',
+                        help='diretório dos CSVs sintéticos (reaproveitados entre execuções)')
+    parser.add_argument('--output', default='./output/benchmark_results.json')
+    parser.add_argument('--baseline', default='./output/benchmark_baseline.json')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='grava os resultados como nova referência')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='aumento relativo de tempo considerado regressão')
+    parser.add_argument('--parallel', action='store_true',
+                        help='treina os modelos em paralelo (train_all)')
+    parser.add_argument('--out-of-core', action='store_true',
+                        help='matriz em disco e treino em blocos (train_out_of_core)')
+    args = parser.parse_args()
+
+    print("⏱️  Benchmark do Sistema de Predição de Risco de Fogo")
+    print("=" * 80)
+
+    results = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'scikit-learn': sklearn.__version__,
+        },
+        'parallel': args.parallel,
+        'out_of_core': args.out_of_core,
+        'seed': args.seed,
+        'sizes': {},
+    }
+
+    for n_rows in args.sizes:
+        csv_path = synthetic_csv(args.data_dir, n_rows, args.seed)
+        print(f"\n🚀 Executando pipeline com {n_rows} linhas...")
+        results['sizes'][str(n_rows)] = run_size(csv_path, parallel=args.parallel, out_of_core=args.out_of_core)
+
+    write_json(args.output, results)
+    print(f"\n💾 Resultados salvos em {args.output}")
+
+    # Resumo
+    print("\n📊 Tempo por etapa (s):")
+    print("=" * 80)
+    summary = pd.DataFrame({
+        size: {name: stage['wall_time_s'] for name, stage in result['stages'].items()}
+        for size, result in results['sizes'].items()
+    })
+    print(summary.to_string())
+    print("=" * 80)
+
+    if args.save_baseline:
+        write_json(args.baseline, results)
+        print(f"✅ Referência salva em {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("⚠️  Nenhuma referência encontrada. Use --save-baseline para criar uma.")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    if not regressions:
+        print(f"✅ Nenhuma regressão acima de {args.threshold:.0%} em relação à referência")
+        return 0
+
+    print(f"❌ {len(regressions)} regressões acima de {args.threshold:.0%}:")
+    for regression in regressions:
+        change = f" (+{regression['change']:.0%})" if regression['change'] is not None else ""
+        print(f"   - {regression['size']} linhas, {regression['metric']}: "
+              f"{regression['baseline_s']:.3f}s -> {regression['current_s']:.3f}s{change}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
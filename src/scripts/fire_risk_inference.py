@@ -0,0 +1,737 @@
+"""
+Inferência rápida do ensemble de Risco de Fogo, apenas com NumPy
+Os modelos treinados (Random Forest, MLP e KNN) são achatados em arrays
+contíguos e avaliados de forma vetorizada, sem importar scikit-learn ou
+pandas. O arquivo é gerado por FireRiskPredictor.export_fast_bundle().
+
+Uso:
+    from fire_risk_inference import FastPredictor
+
+    predictor = FastPredictor.load('./output/model_bundle_fast.npz')
+    result = predictor.predict_batch({'Latitude': [-5.19], 'Longitude': [-37.34], 'Mes': [10]})
+"""
+
+import json
+import os
+
+import numpy as np
+
+# Versão do formato do .npz (2: índice espacial e janela de vizinhança com
+# defasagem)
+FAST_BUNDLE_VERSION = 2
+
+# Linhas avaliadas por vez na floresta (mantém os índices em cache),
+# elementos da matriz de distâncias por bloco na busca do KNN e diferença
+# relativa até a qual duas distâncias contam como empate (o arredondamento
+# difere entre a forma expandida da distância e a do scikit-learn)
+RF_BLOCK_ROWS = 1024
+KNN_BLOCK_ELEMENTS = 4_000_000
+KNN_TIE_TOLERANCE = 1e-9
+
+# Índice espacial: lado da célula da grade (km), raio médio da Terra (km) e
+# pares consulta x detecção avaliados por bloco nas consultas vetorizadas
+SPATIAL_CELL_KM = 10.0
+EARTH_RADIUS_KM = 6371.0088
+SPATIAL_BLOCK_PAIRS = 4_000_000
+
+
+class FlatRandomForest:
+    """
+    Random Forest com os nós de todas as árvores em arrays contíguos, com
+    índices globais. Como no scikit-learn (construção em profundidade), o
+    filho esquerdo de um nó é sempre o nó seguinte; as folhas têm limiar
+    -inf e filho direito igual a si mesmas, então descer além da folha não
+    muda o nó. Todas as árvores descem juntas, um nível por iteração.
+    """
+
+    def __init__(self, feature, threshold, right, value, roots, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+
+    @classmethod
+    def from_sklearn(cls, forest):
+        """
+        Achata um RandomForestRegressor (uma saída) já treinado
+        """
+        feature, threshold, right, value, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            own = np.arange(tree.node_count)
+            is_leaf = tree.children_left < 0
+            if not np.all(is_leaf | (tree.children_left == own + 1)):
+                raise ValueError("Árvore fora da ordem em profundidade; não é possível achatar")
+
+            roots.append(offset)
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(np.where(is_leaf, -np.inf, tree.threshold))
+            right.append(np.where(is_leaf, own, tree.children_right) + offset)
+            value.append(tree.value[:, 0, 0])
+
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(feature).astype(np.intp),
+            threshold=np.concatenate(threshold).astype(np.float64),
+            right=np.concatenate(right).astype(np.intp),
+            value=np.concatenate(value).astype(np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+        )
+
+    def predict(self, X):
+        # Mesma precisão do scikit-learn: as árvores comparam em float32
+        X = np.asarray(X, dtype=np.float32)
+        n_features = X.shape[1]
+
+        predictions = np.empty(len(X))
+        for start in range(0, len(X), RF_BLOCK_ROWS):
+            block = np.ascontiguousarray(X[start:start + RF_BLOCK_ROWS])
+            values = block.ravel()
+            row_offset = (np.arange(len(block)) * n_features)[:, None]
+
+            node = np.tile(self.roots, (len(block), 1))
+            for _ in range(self.max_depth):
+                go_left = values[row_offset + self.feature[node]] <= self.threshold[node]
+                node = np.where(go_left, node + 1, self.right[node])
+
+            predictions[start:start + RF_BLOCK_ROWS] = self.value[node].mean(axis=1)
+        return predictions
+
+    def to_arrays(self, prefix):
+        return {
+            f'{prefix}feature': self.feature,
+            f'{prefix}threshold': self.threshold,
+            f'{prefix}right': self.right,
+            f'{prefix}value': self.value,
+            f'{prefix}roots': self.roots,
+            f'{prefix}max_depth': np.asarray(self.max_depth),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix):
+        return cls(**{
+            name: arrays[f'{prefix}{name}']
+            for name in ('feature', 'threshold', 'right', 'value', 'roots', 'max_depth')
+        })
+
+
+class FlatMLP:
+    """
+    MLP de regressão como matrizes de pesos: camadas ocultas com a ativação
+    do treino e saída identidade
+    """
+
+    ACTIVATIONS = {
+        'relu': lambda x: np.maximum(x, 0, out=x),
+        'tanh': lambda x: np.tanh(x, out=x),
+        'logistic': lambda x: np.divide(1, 1 + np.exp(-x, out=x), out=x),
+        'identity': lambda x: x,
+    }
+
+    def __init__(self, weights, biases, activation):
+        self.weights = weights
+        self.biases = biases
+        self.activation = activation
+
+    @classmethod
+    def from_sklearn(cls, mlp):
+        """
+        Copia os pesos de um MLPRegressor (uma saída) já treinado
+        """
+        return cls(
+            weights=[np.ascontiguousarray(w) for w in mlp.coefs_],
+            biases=[np.ascontiguousarray(b) for b in mlp.intercepts_],
+            activation=mlp.activation,
+        )
+
+    def predict(self, X):
+        activation = self.ACTIVATIONS[self.activation]
+        # Sem conversão: float64 x pesos float32 resulta em float64, como no scikit-learn
+        hidden = np.asarray(X)
+        for i, (weights, bias) in enumerate(zip(self.weights, self.biases)):
+            hidden = hidden @ weights
+            hidden += bias
+            if i < len(self.weights) - 1:
+                hidden = activation(hidden)
+        return hidden[:, 0]
+
+    def to_arrays(self, prefix):
+        arrays = {f'{prefix}activation': np.asarray(self.activation)}
+        for i, (weights, bias) in enumerate(zip(self.weights, self.biases)):
+            arrays[f'{prefix}weights_{i}'] = weights
+            arrays[f'{prefix}bias_{i}'] = bias
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix):
+        n_layers = sum(1 for name in arrays if name.startswith(f'{prefix}weights_'))
+        return cls(
+            weights=[arrays[f'{prefix}weights_{i}'] for i in range(n_layers)],
+            biases=[arrays[f'{prefix}bias_{i}'] for i in range(n_layers)],
+            activation=str(arrays[f'{prefix}activation']),
+        )
+
+
+class FlatKNN:
+    """
+    KNN de regressão por força bruta em blocos sobre o conjunto de
+    referência (euclidiana ou manhattan, pesos 'uniform' ou 'distance')
+    """
+
+    def __init__(self, points, targets, n_neighbors, weights, metric):
+        self.points = points
+        self.targets = targets
+        self.n_neighbors = int(n_neighbors)
+        self.weights = str(weights)
+        self.metric = str(metric)
+
+    @classmethod
+    def from_sklearn(cls, knn):
+        """
+        Conjunto de referência de um KNeighborsRegressor ou de um
+        ApproximateKNNRegressor (avaliado aqui com busca exata)
+        """
+        if hasattr(knn, 'points_'):
+            points, targets = knn.points_, knn.targets_
+        else:
+            points, targets = knn._fit_X, knn._y
+        return cls(
+            points=np.ascontiguousarray(points, dtype=np.float64),
+            targets=np.asarray(targets, dtype=np.float64),
+            n_neighbors=knn.n_neighbors,
+            weights=knn.weights,
+            metric=knn.metric,
+        )
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        k = self.n_neighbors
+        block = max(1, KNN_BLOCK_ELEMENTS // len(self.points))
+
+        predictions = np.empty(len(X))
+        for start in range(0, len(X), block):
+            dist = self._distances(X[start:start + block])
+            idx, _ = self._neighbors(dist)
+            neighbor_dist = np.take_along_axis(dist, idx, axis=1)
+            predictions[start:start + block] = self._weighted_mean(neighbor_dist, self.targets[idx])
+        return predictions
+
+    def boundary_ties(self, X):
+        """
+        Linhas de X cuja k-ésima distância empata com a de outro ponto de
+        referência fora dos k vizinhos. Nelas a escolha do vizinho é
+        arbitrária (o scikit-learn desempata de forma diferente em cada
+        algoritmo); aqui ficam sempre os menores índices.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        block = max(1, KNN_BLOCK_ELEMENTS // len(self.points))
+        return np.concatenate([
+            self._neighbors(self._distances(X[start:start + block]))[1]
+            for start in range(0, len(X), block)
+        ]) if len(X) else np.zeros(0, dtype=bool)
+
+    def _neighbors(self, dist):
+        """
+        Índices dos k vizinhos de cada linha e máscara das linhas com empate
+        na k-ésima distância (resolvido pelos menores índices)
+        """
+        k = self.n_neighbors
+        idx = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        kth = np.take_along_axis(dist, idx, axis=1).max(axis=1)[:, None]
+        near = np.abs(dist - kth) <= KNN_TIE_TOLERANCE * np.maximum(kth, 1.0)
+        tied = ((dist < kth) | near).sum(axis=1) > k
+        if tied.any():
+            # Distâncias empatadas viram a k-ésima; a ordenação estável
+            # desempata pelo índice
+            snapped = np.where(near[tied], kth[tied], dist[tied])
+            idx[tied] = np.argsort(snapped, axis=1, kind='stable')[:, :k]
+        return idx, tied
+
+    def _distances(self, X):
+        if self.metric == 'manhattan':
+            dist = np.zeros((len(X), len(self.points)))
+            for j in range(X.shape[1]):
+                dist += np.abs(X[:, j][:, None] - self.points[:, j][None, :])
+            return dist
+        if self.metric == 'euclidean':
+            sq = (X ** 2).sum(axis=1)[:, None] + (self.points ** 2).sum(axis=1)[None, :] - 2 * X @ self.points.T
+            return np.sqrt(np.maximum(sq, 0))
+        raise ValueError(f"Métrica não suportada: {self.metric}")
+
+    def _weighted_mean(self, dist, neighbor_y):
+        if self.weights == 'uniform':
+            return neighbor_y.mean(axis=1)
+
+        # Mesma regra do scikit-learn: vizinhos à distância zero levam todo o peso
+        with np.errstate(divide='ignore'):
+            weights = 1.0 / dist
+        exact = np.isinf(weights).any(axis=1)
+        weights[exact] = np.isinf(weights[exact])
+        return (weights * neighbor_y).sum(axis=1) / weights.sum(axis=1)
+
+    def to_arrays(self, prefix):
+        return {
+            f'{prefix}points': self.points,
+            f'{prefix}targets': self.targets,
+            f'{prefix}n_neighbors': np.asarray(self.n_neighbors),
+            f'{prefix}weights': np.asarray(self.weights),
+            f'{prefix}metric': np.asarray(self.metric),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix):
+        return cls(**{
+            name: arrays[f'{prefix}{name}']
+            for name in ('points', 'targets', 'n_neighbors', 'weights', 'metric')
+        })
+
+
+class FlatScaler:
+    """
+    Normalização do StandardScaler: (X - média) / desvio
+    """
+
+    def __init__(self, mean, scale):
+        self.mean_ = np.asarray(mean, dtype=np.float64)
+        self.scale_ = np.asarray(scale, dtype=np.float64)
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        X -= self.mean_
+        X /= self.scale_
+        return X
+
+
+class SpatialIndex:
+    """
+    Índice em grade (hash de células) sobre as detecções históricas. As
+    coordenadas são projetadas em km (equiretangular, na latitude média das
+    detecções) e cada detecção cai numa célula de lado cell_km. As detecções
+    ficam ordenadas por célula e, dentro da célula, por data: "detecções da
+    célula c entre as datas t0 e t1" é um intervalo contíguo, achado com
+    searchsorted na chave composta posição_da_célula * span + dias.
+
+    Datas são dias (float) desde 1970-01-01; consultas sem data usam o fim
+    do histórico.
+    """
+
+    def __init__(self, latitude, longitude, days, risk, frp, cell_km=SPATIAL_CELL_KM, origin=None):
+        """
+        Recebe as detecções já ordenadas por (célula, data), como em build()
+        """
+        self.latitude = np.asarray(latitude, dtype=np.float64)
+        self.longitude = np.asarray(longitude, dtype=np.float64)
+        self.days = np.asarray(days, dtype=np.float64)
+        self.risk = np.asarray(risk, dtype=np.float32)
+        self.frp = np.asarray(frp, dtype=np.float32)
+        self.cell_km = float(cell_km)
+        self._offsets = {}
+        self.origin = np.asarray(
+            origin if origin is not None else self._origin(self.latitude, self.longitude), dtype=np.float64
+        )
+
+        self.x, self.y = self._project(self.latitude, self.longitude)
+        cell_x, cell_y = self._cells(self.x, self.y)
+        keys = self._cell_key(cell_x, cell_y)
+        self.cell_keys, counts = np.unique(keys, return_counts=True)
+        self.cell_bounds = (
+            (cell_x.min(), cell_x.max(), cell_y.min(), cell_y.max()) if len(keys) else (0, 0, 0, 0)
+        )
+
+        self.first_day = float(self.days.min()) if len(self.days) else 0.0
+        self.last_day = float(self.days.max()) if len(self.days) else 0.0
+        self.span = self.last_day - self.first_day + 1
+        self.sort_key = np.repeat(np.arange(len(self.cell_keys)), counts) * self.span + (self.days - self.first_day)
+
+    def __len__(self):
+        return len(self.days)
+
+    @classmethod
+    def build(cls, latitude, longitude, time, risk, frp=None, cell_km=SPATIAL_CELL_KM):
+        """
+        Monta o índice; detecções sem coordenadas ou sem data ficam de fora
+
+        Args:
+            latitude, longitude: graus
+            time: datetime64, strings ISO ou dias desde 1970-01-01
+            risk: RiscoFogo de cada detecção (NaN é ignorado nas médias)
+            frp: FRP de cada detecção (opcional)
+            cell_km: lado da célula; consultas com raio até cell_km visitam
+                só as 9 células em volta do ponto
+        """
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        days = cls.to_days(time)
+        risk = np.asarray(risk, dtype=np.float32)
+        frp = np.full(len(days), np.nan, dtype=np.float32) if frp is None else np.asarray(frp, dtype=np.float32)
+
+        valid = np.isfinite(latitude) & np.isfinite(longitude) & np.isfinite(days)
+        latitude, longitude, days, risk, frp = (a[valid] for a in (latitude, longitude, days, risk, frp))
+
+        index = cls.__new__(cls)
+        index.cell_km = float(cell_km)
+        index.origin = cls._origin(latitude, longitude)
+        keys = index._cell_key(*index._cells(*index._project(latitude, longitude)))
+        order = np.lexsort((days, keys))
+
+        return cls(latitude[order], longitude[order], days[order], risk[order], frp[order],
+                   cell_km=cell_km, origin=index.origin)
+
+    def extend(self, latitude, longitude, time, risk, frp=None):
+        """
+        Novo índice com as detecções atuais e as novas (mesma célula e origem)
+        """
+        new = SpatialIndex.build(latitude, longitude, time, risk, frp, cell_km=self.cell_km)
+        latitude, longitude, days, risk, frp = (
+            np.concatenate([getattr(self, name), getattr(new, name)])
+            for name in ('latitude', 'longitude', 'days', 'risk', 'frp')
+        )
+        keys = self._cell_key(*self._cells(*self._project(latitude, longitude)))
+        order = np.lexsort((days, keys))
+        return SpatialIndex(latitude[order], longitude[order], days[order], risk[order], frp[order],
+                            cell_km=self.cell_km, origin=self.origin)
+
+    @staticmethod
+    def to_days(time):
+        """
+        Dias (float) desde 1970-01-01; NaT e valores ausentes viram NaN
+        """
+        time = np.asarray(time)
+        if time.dtype.kind == 'O':
+            # Registros JSON: strings ISO misturadas com None/NaN
+            time = np.array([None if value is None or value != value else value for value in time],
+                            dtype='datetime64[s]')
+        elif time.dtype.kind in 'US':
+            time = time.astype('datetime64[s]')
+        if time.dtype.kind == 'M':
+            days = time.astype('datetime64[s]').astype(np.int64) / 86400.0
+            days[np.isnat(time)] = np.nan
+            return days
+        return time.astype(np.float64)
+
+    @staticmethod
+    def _origin(latitude, longitude):
+        if not len(latitude):
+            return np.zeros(2)
+        return np.array([latitude.mean(), longitude.mean()])
+
+    def _project(self, latitude, longitude):
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        scale = np.pi / 180 * EARTH_RADIUS_KM
+        x = (longitude - self.origin[1]) * scale * np.cos(np.radians(self.origin[0]))
+        y = (latitude - self.origin[0]) * scale
+        return x, y
+
+    def _cells(self, x, y):
+        return np.floor(x / self.cell_km).astype(np.int64), np.floor(y / self.cell_km).astype(np.int64)
+
+    @staticmethod
+    def _cell_key(cell_x, cell_y):
+        return cell_x * (1 << 32) + cell_y
+
+    def _day_offsets(self, days, default, query_ids):
+        """
+        Posição das datas de cada par dentro do span de uma célula (limitada
+        ao intervalo); uma data só vale para todas as consultas
+        """
+        if days is None:
+            return default
+        days = np.clip(np.asarray(days, dtype=np.float64) - self.first_day, 0, self.span)
+        return days if days.size == 1 else days[query_ids]
+
+    def _cell_offsets(self, reach):
+        """
+        Deslocamentos (dx, dy) das células a até reach células de distância
+        """
+        if reach not in self._offsets:
+            offsets = np.arange(-reach, reach + 1)
+            dx, dy = np.meshgrid(offsets, offsets, indexing='ij')
+            self._offsets[reach] = (dx.reshape(-1, 1), dy.reshape(-1, 1))
+        return self._offsets[reach]
+
+    def _candidates(self, x, y, radius_km, start=None, end=None):
+        """
+        Pares (consulta, detecção) das células ao alcance de radius_km com
+        data em [start, end); retorna os índices e a distância em km
+        """
+        cell_x, cell_y = self._cells(x, y)
+        reach = int(np.ceil(radius_km / self.cell_km))
+        n_cells = len(self.cell_keys)
+
+        if (2 * reach + 1) ** 2 <= n_cells:
+            # Células vizinhas de cada consulta, numa única busca
+            dx, dy = self._cell_offsets(reach)
+            keys = self._cell_key(cell_x + dx, cell_y + dy).ravel()
+            query_ids = np.tile(np.arange(len(x)), dx.size)
+            ranks = np.searchsorted(self.cell_keys, keys)
+            found = self.cell_keys[np.minimum(ranks, n_cells - 1)] == keys
+            query_ids, ranks = query_ids[found], ranks[found]
+        else:
+            # Alcance maior que o próprio índice: todas as células
+            # cell_y negativo "empresta" de cell_x na chave: arredonda antes
+            all_x = (self.cell_keys + (1 << 31)) >> 32
+            all_y = self.cell_keys - (all_x << 32)
+            near = (
+                (np.abs(all_x - cell_x.reshape(-1, 1)) <= reach) &
+                (np.abs(all_y - cell_y.reshape(-1, 1)) <= reach)
+            )
+            query_ids, ranks = np.nonzero(near)
+
+        base = ranks * self.span
+        lo = np.searchsorted(self.sort_key, base + self._day_offsets(start, 0.0, query_ids), side='left')
+        hi = np.searchsorted(self.sort_key, base + self._day_offsets(end, self.span, query_ids), side='left')
+
+        counts = hi - lo
+        point_ids = np.arange(counts.sum()) + np.repeat(lo - (np.cumsum(counts) - counts), counts)
+        query_ids = np.repeat(query_ids, counts)
+
+        distance = np.hypot(self.x[point_ids] - x[query_ids], self.y[point_ids] - y[query_ids])
+        keep = distance <= radius_km
+        return query_ids[keep], point_ids[keep], distance[keep]
+
+    def query_radius(self, latitude, longitude, radius_km, start=None, end=None):
+        """
+        Detecções a até radius_km de um ponto, com data em [start, end)
+
+        Returns:
+            (índices, distâncias em km), do mais próximo ao mais distante
+        """
+        x, y = self._project(np.atleast_1d(latitude), np.atleast_1d(longitude))
+        start = None if start is None else self.to_days(np.atleast_1d(start))
+        end = None if end is None else self.to_days(np.atleast_1d(end))
+        _, point_ids, distance = self._candidates(x, y, radius_km, start, end)
+
+        order = np.argsort(distance, kind='stable')
+        return point_ids[order], distance[order]
+
+    def query_knn(self, latitude, longitude, k, start=None, end=None):
+        """
+        As k detecções mais próximas de um ponto (com data em [start, end)).
+        O raio começa em uma célula e dobra até conter k detecções.
+
+        Returns:
+            (índices, distâncias em km), do mais próximo ao mais distante
+        """
+        x, y = self._project(np.atleast_1d(latitude), np.atleast_1d(longitude))
+        cell_x, cell_y = self._cells(x, y)
+        min_x, max_x, min_y, max_y = self.cell_bounds
+        # Alcance (em células) que cobre o índice inteiro a partir do ponto
+        full_reach = max(abs(cell_x[0] - min_x), abs(cell_x[0] - max_x),
+                         abs(cell_y[0] - min_y), abs(cell_y[0] - max_y)) + 1
+
+        radius = self.cell_km
+        while True:
+            point_ids, distance = self.query_radius(latitude, longitude, radius, start, end)
+            if len(point_ids) >= k or radius >= full_reach * self.cell_km * np.sqrt(2):
+                return point_ids[:k], distance[:k]
+            radius *= 2
+
+    def neighbourhood(self, latitude, longitude, time=None, radius_km=SPATIAL_CELL_KM, window_days=30,
+                      lag_days=0, until=None):
+        """
+        Para cada ponto, número de detecções a até radius_km na janela de
+        window_days que termina lag_days antes da sua data, e o RiscoFogo
+        médio delas (0 sem detecções). Vetorizado, em blocos de consultas.
+
+        A janela nunca passa do fim do histórico nem de until: pontos sem
+        data, ou com data além do histórico, usam as últimas detecções
+        conhecidas, como numa previsão feita agora.
+
+        Args:
+            latitude, longitude: arrays de graus
+            time: data de cada ponto (None ou NaT: fim do histórico)
+            lag_days: distância entre o fim da janela e a data do ponto
+                (horizonte da previsão; deixa de fora as detecções quase
+                simultâneas ao ponto)
+            until: data limite para o fim da janela (ex.: origem de um fold
+                do backtest)
+
+        Returns:
+            (contagem, risco médio); NaN para pontos sem coordenadas
+        """
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        history_end = np.nextafter(self.last_day, np.inf)
+        if until is not None:
+            history_end = min(history_end, float(self.to_days(np.asarray([until]))[0]))
+        end = np.full(len(latitude), np.nan) if time is None else self.to_days(time) - lag_days
+        end = np.where(np.isfinite(end), np.minimum(end, history_end), history_end)
+
+        count = np.full(len(latitude), np.nan)
+        risk = np.full(len(latitude), np.nan)
+        valid = np.flatnonzero(np.isfinite(latitude) & np.isfinite(longitude))
+        if not len(valid):
+            return count, risk
+
+        x, y = self._project(latitude[valid], longitude[valid])
+        end = end[valid]
+
+        # Tamanho do bloco pela densidade média por célula visitada
+        reach = 2 * int(np.ceil(radius_km / self.cell_km)) + 1
+        per_query = max(1.0, reach ** 2 * len(self) / max(1, len(self.cell_keys)))
+        block = max(1, int(SPATIAL_BLOCK_PAIRS / per_query))
+
+        for start in range(0, len(valid), block):
+            rows = slice(start, start + block)
+            query_ids, point_ids, _ = self._candidates(
+                x[rows], y[rows], radius_km, end[rows] - window_days, end[rows]
+            )
+            n_rows = len(x[rows])
+            point_risk = self.risk[point_ids].astype(np.float64)
+            scored = ~np.isnan(point_risk)
+
+            total = np.bincount(query_ids, minlength=n_rows)
+            risk_sum = np.bincount(query_ids[scored], weights=point_risk[scored], minlength=n_rows)
+            risk_count = np.bincount(query_ids[scored], minlength=n_rows)
+
+            count[valid[rows]] = total
+            risk[valid[rows]] = risk_sum / np.maximum(risk_count, 1)
+
+        return count, risk
+
+    def to_arrays(self, prefix):
+        return {
+            f'{prefix}latitude': self.latitude,
+            f'{prefix}longitude': self.longitude,
+            f'{prefix}days': self.days,
+            f'{prefix}risk': self.risk,
+            f'{prefix}frp': self.frp,
+            f'{prefix}cell_km': np.asarray(self.cell_km),
+            f'{prefix}origin': self.origin,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix):
+        return cls(**{
+            name: arrays[f'{prefix}{name}']
+            for name in ('latitude', 'longitude', 'days', 'risk', 'frp', 'cell_km', 'origin')
+        })
+
+
+# Tipo de cada modelo achatado no arquivo
+FLAT_MODELS = {
+    'random_forest': FlatRandomForest,
+    'neural_network': FlatMLP,
+    'knn': FlatKNN,
+}
+
+
+class FastPredictor:
+    """
+    Ensemble achatado: normalização, predição de cada modelo, média e nível
+    de risco, com os mesmos arredondamentos de FireRiskPredictor.predict_batch.
+    Com o índice espacial, as features de vizinhança ausentes são calculadas
+    a partir de Latitude/Longitude (e DataHora, quando presente).
+    """
+
+    def __init__(self, meta, models, scaler, spatial_index=None):
+        self.meta = meta
+        self.models = models
+        self.scaler = scaler
+        self.spatial_index = spatial_index
+        self.feature_names = meta['feature_names']
+        self.default_features = meta['default_features']
+
+    @classmethod
+    def load(cls, path):
+        """
+        Carrega o arquivo .npz gravado por export_fast_bundle
+        """
+        with np.load(path, allow_pickle=False) as data:
+            arrays = dict(data)
+
+        meta = json.loads(arrays.pop('meta').tobytes().decode('utf-8'))
+        if meta.get('format_version') != FAST_BUNDLE_VERSION:
+            raise ValueError(
+                f"Bundle {path} tem versão {meta.get('format_version')}, esperada {FAST_BUNDLE_VERSION}. "
+                f"Exporte novamente com export_fast_bundle()."
+            )
+
+        models = {
+            model_name: FLAT_MODELS[model_name].from_arrays(arrays, f'{model_name}__')
+            for model_name in meta['models']
+        }
+        spatial_index = SpatialIndex.from_arrays(arrays, 'spatial__') if meta.get('neighbourhood') else None
+        return cls(meta, models, FlatScaler(arrays['scaler__mean'], arrays['scaler__scale']), spatial_index)
+
+    def save(self, path):
+        """
+        Grava o ensemble num único .npz (sem pickle), de forma atômica
+        """
+        arrays = {'scaler__mean': self.scaler.mean_, 'scaler__scale': self.scaler.scale_}
+        for model_name, model in self.models.items():
+            arrays.update(model.to_arrays(f'{model_name}__'))
+        if self.spatial_index is not None:
+            arrays.update(self.spatial_index.to_arrays('spatial__'))
+        arrays['meta'] = np.frombuffer(json.dumps(self.meta, ensure_ascii=False).encode('utf-8'), dtype=np.uint8)
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.tmp.npz'
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    def feature_matrix(self, features):
+        """
+        Matriz (linhas x self.feature_names) a partir de um dicionário de
+        colunas ou de uma lista de registros; colunas ausentes recebem
+        self.default_features
+        """
+        if isinstance(features, (list, tuple)):
+            names = {name for record in features for name in record}
+            features = {
+                name: [record.get(name, self.default_features.get(name)) for record in features]
+                for name in names
+            }
+
+        neighbourhood = self.meta.get('neighbourhood')
+        if (self.spatial_index is not None and 'Latitude' in features and 'Longitude' in features
+                and any(name not in features for name in neighbourhood['features'])):
+            values = self.spatial_index.neighbourhood(
+                features['Latitude'], features['Longitude'], features.get('DataHora'),
+                neighbourhood['radius_km'], neighbourhood['window_days'], neighbourhood['lag_days']
+            )
+            features = {**dict(zip(neighbourhood['features'], values)), **features}
+
+        n_rows = len(next(iter(features.values()))) if features else 0
+        X = np.empty((n_rows, len(self.feature_names)))
+        for j, name in enumerate(self.feature_names):
+            if name in features:
+                X[:, j] = np.asarray(features[name], dtype=np.float64)
+                X[np.isnan(X[:, j]), j] = self.default_features[name]
+            else:
+                X[:, j] = self.default_features[name]
+        return X
+
+    def predict_models(self, X):
+        """
+        Predições de cada modelo (limitadas entre 0 e 1) para a matriz X
+        """
+        X_scaled = self.scaler.transform(X)
+        return {
+            model_name: np.round(np.clip(model.predict(X_scaled), 0, 1), 4)
+            for model_name, model in self.models.items()
+        }
+
+    def predict_batch(self, features):
+        """
+        Prediz risco para várias linhas de uma vez
+
+        Returns:
+            Dicionário com um array por modelo, 'average_prediction' e
+            'risk_level'
+        """
+        predictions = self.predict_models(self.feature_matrix(features))
+
+        average = np.round(np.mean(list(predictions.values()), axis=0), 4)
+        levels = np.array(self.meta['risk_level_names'])
+        predictions['average_prediction'] = average
+        predictions['risk_level'] = levels[np.digitize(average, self.meta['risk_level_thresholds'])]
+        return predictions
@@ -10,58 +10,357 @@ Modelos implementados:
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+from contextlib import contextmanager, nullcontext, redirect_stdout
+import copy
 from datetime import datetime, timedelta
+import functools
+import hashlib
+import inspect
 import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
+from types import SimpleNamespace
+
+# Pico de memória do processo (indisponível no Windows)
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Cache colunar (opcional)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Scikit-learn, joblib e matplotlib são importados dentro das funções que os
+# usam: predizer a partir do bundle achatado não carrega nenhum deles
+
+# Inferência achatada (apenas NumPy)
+from fire_risk_inference import (
+    FastPredictor, FlatRandomForest, FlatMLP, FlatScaler, SpatialIndex, FLAT_MODELS,
+    FAST_BUNDLE_VERSION
+)
 
-# Scikit-learn
-from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
-from sklearn.neighbors import KNeighborsRegressor
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.neural_network import MLPRegressor
-
-# Visualização
 import warnings
 warnings.filterwarnings('ignore')
 
+# Região de interesse (filtro aplicado durante a leitura do CSV)
+REGION_STATE = 'RIO GRANDE DO NORTE'
+REGION_MUNICIPALITY = 'MOSSORÓ'
+
+# Modo multirregião: estados do Nordeste (coluna Estado do BDQueimadas),
+# colunas que definem cada shard, mínimo de linhas para treinar um shard e
+# bundles achatados mantidos em memória pelo registro
+NORTHEAST_STATES = [
+    'MARANHÃO', 'PIAUÍ', 'CEARÁ', 'RIO GRANDE DO NORTE', 'PARAÍBA',
+    'PERNAMBUCO', 'ALAGOAS', 'SERGIPE', 'BAHIA',
+]
+SHARD_KEYS = {'state': ['Estado'], 'state-biome': ['Estado', 'Bioma']}
+SHARD_MIN_ROWS = 500
+REGISTRY_DIR = './output/regions'
+REGISTRY_VERSION = 1
+REGISTRY_MAX_LOADED = 4
+
+# Colunas do BDQueimadas usadas pelo pipeline e seus tipos compactos
+CSV_DTYPES = {
+    'Estado': 'category',
+    'Municipio': 'category',
+    'Bioma': 'category',
+    'DiaSemChuva': 'float32',
+    'Precipitacao': 'float32',
+    'RiscoFogo': 'float32',
+    'FRP': 'float32',
+    'Latitude': 'float32',
+    'Longitude': 'float32',
+}
+CSV_COLUMNS = ['DataHora'] + list(CSV_DTYPES)
+
+# Linhas por bloco na leitura do CSV nacional
+CSV_CHUNKSIZE = 200_000
+
+# Parâmetros de limpeza (fazem parte da chave do cache)
+INVALID_VALUE = -999
+INVALID_VALUE_COLS = ['DiaSemChuva', 'Precipitacao', 'RiscoFogo', 'FRP']
+OUTLIER_COLS = ['DiaSemChuva', 'Precipitacao', 'FRP']
+IQR_FACTOR = 1.5
+
+# Chave dos limites da limpeza nos metadados do cache Parquet
+CLEANER_METADATA_KEY = b'fire_risk_cleaner'
+
+# Features de vizinhança (índice espacial sobre as detecções, opcionais):
+# número de detecções a até NEIGHBOURHOOD_RADIUS_KM numa janela de
+# NEIGHBOURHOOD_WINDOW_DAYS que termina NEIGHBOURHOOD_LAG_DAYS antes da data
+# (horizonte de predict_week) e o RiscoFogo médio delas; máximo de detecções
+# devolvidas por nearby_detections
+NEIGHBOURHOOD_FEATURES = ['DeteccoesVizinhas', 'RiscoVizinhanca']
+NEIGHBOURHOOD_RADIUS_KM = 50.0
+NEIGHBOURHOOD_WINDOW_DAYS = 90
+NEIGHBOURHOOD_LAG_DAYS = 7
+NEARBY_MAX_RESULTS = 500
+
+# Features dos modelos: numéricas e categóricas (codificadas com LabelEncoder)
+NUMERIC_FEATURES = [
+    'DiaSemChuva', 'Precipitacao', 'FRP',
+    'Latitude', 'Longitude',
+    'Mes', 'Dia', 'DiaSemana', 'Hora'
+]
+CATEGORICAL_FEATURES = ['Bioma', 'Municipio']
+
+# Bytes amostrados do início, meio e fim do CSV para a impressão digital
+FINGERPRINT_BLOCK = 1 << 20
+
+# Features resumidas pela mediana mensal e número de faixas (de largura fixa,
+# entre o mínimo e o máximo do treino) dos histogramas incrementais usados
+# para atualizar essas medianas sem reler o histórico
+MONTHLY_MEDIAN_FEATURES = ['DiaSemChuva', 'Precipitacao', 'FRP', 'Latitude', 'Longitude']
+MONTHLY_MEDIAN_BINS = 2048
+
+# Busca de hiperparâmetros do KNN
+KNN_PARAM_GRID = {
+    'n_neighbors': [3, 5, 7, 9, 11],
+    'weights': ['uniform', 'distance'],
+    'metric': ['euclidean', 'manhattan']
+}
+KNN_CV_FOLDS = 5
+KNN_HALVING_FACTOR = 3
+
+# Ordem dos modelos (mesma ordem das predições e da média do ensemble)
+MODEL_TRAINERS = {
+    'neural_network': 'train_neural_network',
+    'knn': 'train_knn',
+    'random_forest': 'train_random_forest',
+}
+
+# Backends do KNN: árvores/força bruta do scikit-learn ou índice aproximado
+KNN_BACKENDS = ['auto', 'kd_tree', 'ball_tree', 'brute', 'approximate']
+
+# Backtesting temporal (rolling origin): granularidade das origens (período
+# do pandas), períodos à frente avaliados, histórico mínimo antes da
+# primeira origem, número máximo de folds (as origens mais recentes) e
+# linhas mínimas de teste para um fold ser avaliado
+BACKTEST_PERIOD = 'M'
+BACKTEST_HORIZON = 2
+BACKTEST_MIN_TRAIN_PERIODS = 6
+BACKTEST_MAX_FOLDS = 6
+BACKTEST_MIN_TEST_ROWS = 30
+
+# Níveis de risco pela média das predições (limites inferiores de cada nível)
+RISK_LEVEL_THRESHOLDS = [0.2, 0.4, 0.6, 0.8]
+RISK_LEVEL_NAMES = ['MÍNIMO', 'BAIXO', 'MODERADO', 'ALTO', 'CRÍTICO']
+
+# Grade espacial de risco: extensão padrão (lon_min, lat_min, lon_max, lat_max)
+# cobrindo o RN e linhas avaliadas por chamada de predict_batch
+REGION_BBOX = (-38.6, -7.0, -34.9, -4.8)
+GRID_BATCH_ROWS = 200_000
+
+# Cache de predições: capacidade (linhas), validade (s) e, no modo
+# aproximado (opcional), resolução usada para quantizar as features contínuas
+# na chave (as demais são arredondadas para inteiro)
+PREDICTION_CACHE_SIZE = 100_000
+PREDICTION_CACHE_TTL = 3600
+PREDICTION_CACHE_RESOLUTION = {
+    'DiaSemChuva': 1.0,
+    'Precipitacao': 0.1,
+    'FRP': 0.1,
+    'Latitude': 0.001,
+    'Longitude': 0.001,
+    'RiscoVizinhanca': 0.001,
+}
+
+# Linhas convertidas por vez ao gravar NDJSON e alinhamento (bytes) de cada
+# coluna no binário colunar (permite Float32Array/Float64Array direto no Node)
+NDJSON_CHUNK_ROWS = 50_000
+COLUMNS_ALIGNMENT = 8
+
+# Treino incremental: épocas do MLP e árvores novas da floresta por
+# atualização, tamanho máximo da floresta (as árvores mais antigas saem),
+# atualizações entre reconstruções completas e deslocamento máximo da média
+# das features (em desvios padrão do treino) antes de forçar a reconstrução
+INCREMENTAL_MLP_EPOCHS = 5
+INCREMENTAL_RF_TREES = 10
+RF_MAX_TREES = 200
+FULL_REBUILD_EVERY = 30
+SCALER_DRIFT_THRESHOLD = 0.5
+
+# Treino fora da memória (train_out_of_core): linhas lidas do disco por
+# bloco, mini-batch, épocas e paciência (épocas sem melhora na validação) do
+# MLP, sacolas e linhas por sacola da floresta, amostra de reservatório do
+# KNN e linhas de treino usadas na validação do MLP e nas métricas de treino
+STREAM_BLOCK_ROWS = 100_000
+STREAM_BATCH_ROWS = 256
+STREAM_MLP_EPOCHS = 200
+STREAM_MLP_PATIENCE = 10
+STREAM_RF_BAGS = 10
+STREAM_RF_BAG_ROWS = 200_000
+STREAM_KNN_RESERVOIR_ROWS = 50_000
+STREAM_METRIC_ROWS = 20_000
+
+# Versão do formato do bundle de modelos (incrementar ao mudar seu conteúdo).
+# 4: cleaner, spatial_index, model_version, scaler_running e
+# updates_since_rebuild; features de vizinhança opcionais e com defasagem.
+# 5: monthly_sketches em MonthlyHistograms (faixas de largura fixa).
+# 6: knn_reference (conjunto de referência do KNN, para update_models)
+BUNDLE_VERSION = 6
+BUNDLE_PATH = './output/model_bundle.joblib'
+
+# Bundle achatado para inferência só com NumPy (fire_risk_inference) e
+# diferença máxima aceita entre os modelos achatados e o scikit-learn
+FAST_BUNDLE_PATH = './output/model_bundle_fast.npz'
+FAST_EXPORT_TOLERANCE = 1e-6
+FAST_EXPORT_CHECK_ROWS = 2000
+
+# Modelos avaliados pela versão achatada dentro do preditor (o KNN segue no
+# scikit-learn, cuja busca em árvore vence a força bruta em lotes grandes)
+COMPILED_MODELS = {
+    'random_forest': FlatRandomForest,
+    'neural_network': FlatMLP,
+}
+
+def _profiled(stage, rows_in=None, rows_out=None):
+    """
+    Decorator que registra a etapa em self.profile (tempo de parede/CPU, pico
+    de RSS e linhas de entrada/saída)
+
+    Args:
+        stage: nome da etapa
+        rows_in: função (self, *args, **kwargs) -> linhas de entrada, avaliada antes
+        rows_out: função (self, resultado) -> linhas de saída, avaliada depois
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self._profile_stage(stage) as record:
+                if rows_in:
+                    record['rows_in'] = rows_in(self, *args, **kwargs)
+                result = method(self, *args, **kwargs)
+                if rows_out:
+                    record['rows_out'] = rows_out(self, result)
+            return result
+        return wrapper
+    return decorator
+
+
+def _peak_rss_mb():
+    """
+    Pico de memória residente do processo em MB (ru_maxrss é KB no Linux)
+    """
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
 class FireRiskPredictor:
     """
     Classe principal para predição de risco de fogo
     """
 
-    def __init__(self, data_path=None):
+    def __init__(self, data_path=None, cache_dir='./cache', profiler_hook=None,
+                 prediction_cache_size=PREDICTION_CACHE_SIZE, prediction_cache_ttl=PREDICTION_CACHE_TTL,
+                 prediction_cache_resolution=None, region=None, neighbourhood_features=False):
         """
         Inicializa o preditor
 
         Args:
             data_path: caminho para o arquivo CSV com dados do BDQueimadas
+            region: filtro da leitura como {coluna: [valores]} (ex.: {'Estado':
+                ['CEARÁ']}); None mantém o recorte de Mossoró/RN
+            cache_dir: diretório do cache Parquet dos dados limpos (None desativa)
+            profiler_hook: função chamada com o registro de cada etapa medida
+            prediction_cache_size: linhas no cache de predições (0 desativa)
+            prediction_cache_ttl: validade (s) de cada predição em cache
+            prediction_cache_resolution: None usa a linha exata como chave do
+                cache; PREDICTION_CACHE_RESOLUTION (ou outro {feature:
+                resolução}) ativa o modo aproximado, em que linhas próximas
+                compartilham a predição
+            neighbourhood_features: inclui NEIGHBOURHOOD_FEATURES entre as
+                features dos modelos (no backtest de Mossoró/RN melhoram o
+                Random Forest e pioram a MLP; desligado por padrão)
         """
         self.data_path = data_path
+        self.cache_dir = cache_dir
+        self.region = region
+        self.profiler_hook = profiler_hook
+        self.profile = []
+        self._profile_depth = 0
+        self.rows_read = 0
         self.df = None
         self.df_mossoro = None
-        self.X_train = None
-        self.X_test = None
+        self.cleaner = None
+        self.X_design = None
+        self.y_design = None
+        self.n_train = 0
+        self.train_index = None
+        self.test_index = None
+        self.X_train_scaled = None
+        self.X_test_scaled = None
         self.y_train = None
         self.y_test = None
-        self.scaler = StandardScaler()
+        self.scaler = None
         self.label_encoders = {}
-
-        # Modelos
+        self.feature_names = []
+        self.neighbourhood_features = neighbourhood_features
+        self.spatial_index = None
+
+        # Estatísticas de referência para predição (calculadas no treino)
+        self.monthly_stats = {}
+        self.monthly_sketches = None
+        self.overall_stats = {}
+        self.default_features = {}
+
+        # Modelos e conjunto de referência (X, y) do KNN do scikit-learn,
+        # usado para refazer o KNN com as linhas novas em update_models
         self.models = {}
+        self.knn_reference = None
         self.predictions = {}
         self.metrics = {}
 
-    def load_and_prepare_data(self):
+        # Versão dos modelos (renovada a cada treino) e cache de predições
+        self.model_version = None
+        self.scaler_running = None
+        self.updates_since_rebuild = 0
+        self.prediction_cache = PredictionCache(prediction_cache_size, prediction_cache_ttl)
+        self.prediction_cache_resolution = prediction_cache_resolution
+
+        # Predições anuais/semanais já calculadas nesta versão dos modelos
+        # (reaproveitadas por save_results)
+        self.forecasts = {}
+
+        # Modelos achatados (compile_models) e a versão a que correspondem
+        self.compiled_models = {}
+        self.compiled_version = None
+
+    @_profiled('load_and_prepare_data',
+               rows_out=lambda self, result: len(self.df_mossoro) if self.df_mossoro is not None else 0)
+    def load_and_prepare_data(self, chunksize=CSV_CHUNKSIZE, use_cache=True):
         """
         Carrega e prepara os dados do BDQueimadas
+
+        Args:
+            chunksize: número de linhas lidas por bloco do CSV
+            use_cache: reutiliza o cache Parquet dos dados já limpos, se válido
         """
         print("📊 Carregando dados do BDQueimadas...")
 
+        cache_path = self._cache_path() if use_cache else None
+        if cache_path and os.path.exists(cache_path):
+            self.df_mossoro = self._read_cache(cache_path)
+            self.df = self.df_mossoro
+            print(f"✅ Dados carregados do cache: {len(self.df_mossoro)} registros de {self.region_label}")
+            return self.df_mossoro
+
         if self.data_path:
-            self.df = pd.read_csv(self.data_path)
+            # Filtrar dados da região (default: Mossoró e Rio Grande do Norte) durante a leitura
+            print(f"🎯 Filtrando dados de {self.region_label}...")
+            self.df = self._read_regional_csv(chunksize)
         else:
             # Usar dados do notebook original
             print("⚠️  Usando dados de exemplo. Configure data_path para usar dados reais.")
@@ -78,138 +377,495 @@ class FireRiskPredictor:
         self.df['DiaSemana'] = self.df['DataHora'].dt.dayofweek
         self.df['Hora'] = self.df['DataHora'].dt.hour
 
-        # Filtrar dados de Mossoró e região (Rio Grande do Norte)
-        print("🎯 Filtrando dados de Mossoró e região (RN)...")
-        self.df_mossoro = self.df[
-            (self.df['Estado'] == 'RIO GRANDE DO NORTE') |
-            (self.df['Municipio'].str.contains('MOSSORÓ', case=False, na=False))
-        ].copy()
+        self.df_mossoro = self.df
 
-        print(f"✅ Dados carregados: {len(self.df_mossoro)} registros de Mossoró/RN")
+        print(f"✅ Dados carregados: {len(self.df_mossoro)} registros de {self.region_label}")
 
-        # Tratamento de outliers (capping)
+        # Tratamento de outliers (capping); o quadro bruto não é mantido
         self._normalize_outliers()
+        self.df = self.df_mossoro
+
+        if cache_path:
+            self._write_cache(cache_path)
 
         return self.df_mossoro
 
-    def _normalize_outliers(self):
+    @contextmanager
+    def _profile_stage(self, stage):
         """
-        Normaliza outliers usando técnica de capping (IQR)
+        Mede uma etapa do pipeline e acrescenta o registro em self.profile
         """
-        print("🔧 Normalizando outliers e tratando valores inválidos...")
+        record = {'stage': stage, 'depth': self._profile_depth}
+        rss_before = _peak_rss_mb()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        self._profile_depth += 1
+
+        try:
+            yield record
+        finally:
+            self._profile_depth -= 1
+            record['wall_time_s'] = round(time.perf_counter() - wall_start, 4)
+            record['cpu_time_s'] = round(time.process_time() - cpu_start, 4)
+
+            rss_after = _peak_rss_mb()
+            if rss_after is not None:
+                record['peak_rss_mb'] = round(rss_after, 1)
+                record['peak_rss_delta_mb'] = round(rss_after - rss_before, 1)
+
+            # Vazão (linhas/s) para etapas com contagem de linhas
+            rows = record.get('rows_in', record.get('rows_out'))
+            if rows and record['wall_time_s'] > 0:
+                record['rows_per_s'] = round(rows / record['wall_time_s'], 1)
+
+            self.profile.append(record)
+            if self.profiler_hook:
+                self.profiler_hook(record)
+
+    def save_profile(self, output_dir='./output'):
+        """
+        Salva as medições das etapas em pipeline_profile.json
+        """
+        profile = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'data_path': self.data_path,
+            'rows_read': self.rows_read,
+            'stages': self.profile,
+        }
+        path = OutputWriter(output_dir).json('pipeline_profile.json', profile, indent=2)
+
+        print(f"⏱️  Perfil do pipeline salvo em {path}")
+
+    @property
+    def region_label(self):
+        """
+        Nome da região para as mensagens
+        """
+        if self.region is None:
+            return 'Mossoró/RN'
+        return ' / '.join(str(value) for values in self.region.values() for value in values)
+
+    def _region_mask(self, chunk):
+        """
+        Linhas de um bloco do CSV que pertencem à região do preditor
+        """
+        if self.region is None:
+            return (
+                (chunk['Estado'] == REGION_STATE) |
+                (chunk['Municipio'].str.contains(REGION_MUNICIPALITY, case=False, na=False))
+            )
+
+        mask = np.ones(len(chunk), dtype=bool)
+        for col, values in self.region.items():
+            mask &= chunk[col].isin(values).to_numpy()
+        return mask
+
+    def _cache_path(self):
+        """
+        Retorna o caminho do cache Parquet para o CSV atual, ou None se o cache
+        não estiver disponível. A chave combina a impressão digital do CSV com
+        os parâmetros e o código da limpeza, então qualquer mudança em um deles
+        aponta para um arquivo novo.
+        """
+        if pq is None or not self.cache_dir or not self.data_path:
+            return None
+        if not os.path.exists(self.data_path):
+            return None
+
+        key = hashlib.sha256()
+        key.update(_file_fingerprint(self.data_path).encode())
+        key.update(json.dumps({
+            'region': self.region or [REGION_STATE, REGION_MUNICIPALITY],
+            'dtypes': CSV_DTYPES,
+            'invalid_value': INVALID_VALUE,
+            'invalid_value_cols': INVALID_VALUE_COLS,
+            'outlier_cols': OUTLIER_COLS,
+            'iqr_factor': IQR_FACTOR,
+        }, sort_keys=True).encode())
+        for method in (self.load_and_prepare_data, self._read_regional_csv, self._region_mask,
+                       self._normalize_outliers, OutlierCleaner):
+            key.update(inspect.getsource(method).encode())
+
+        stem = os.path.splitext(os.path.basename(self.data_path))[0]
+        return os.path.join(self.cache_dir, f'{stem}_{key.hexdigest()[:16]}.parquet')
+
+    def _read_cache(self, cache_path):
+        """
+        Lê o cache Parquet com memory mapping; os limites da limpeza vêm dos
+        metadados do arquivo
+        """
+        table = pq.read_table(cache_path, memory_map=True)
+
+        metadata = table.schema.metadata or {}
+        if CLEANER_METADATA_KEY in metadata:
+            self.cleaner = OutlierCleaner.from_dict(json.loads(metadata[CLEANER_METADATA_KEY]))
+        return table.to_pandas()
 
-        # Colunas que podem ter valor -999 como placeholder para dados ausentes
-        invalid_value_cols = ['DiaSemChuva', 'Precipitacao', 'RiscoFogo', 'FRP']
+    def _write_cache(self, cache_path):
+        """
+        Grava o cache Parquet de forma atômica e remove versões antigas do
+        mesmo CSV
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        table = pa.Table.from_pandas(self.df_mossoro)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            CLEANER_METADATA_KEY: json.dumps(self.cleaner.to_dict()).encode(),
+        })
+        tmp_path = f'{cache_path}.tmp'
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, cache_path)
+
+        prefix = os.path.basename(cache_path).rsplit('_', 1)[0] + '_'
+        for name in os.listdir(self.cache_dir):
+            old_path = os.path.join(self.cache_dir, name)
+            if name.startswith(prefix) and name.endswith('.parquet') and old_path != cache_path:
+                os.remove(old_path)
+
+        print(f"💾 Cache salvo em {cache_path}")
+
+    def _read_regional_csv(self, chunksize):
+        """
+        Lê o CSV em blocos, apenas com as colunas usadas pelo pipeline,
+        mantendo somente as linhas da região (_region_mask). O pico de memória
+        acompanha o tamanho do recorte regional e não o do arquivo nacional.
+        """
+        self.rows_read = 0
+        reader = pd.read_csv(
+            self.data_path,
+            usecols=lambda col: col in CSV_COLUMNS,
+            dtype=CSV_DTYPES,
+            chunksize=chunksize
+        )
 
-        # Converter -999 para NaN (são valores ausentes, não zeros)
-        for col in invalid_value_cols:
-            if col in self.df_mossoro.columns:
-                invalid_count = (self.df_mossoro[col] == -999).sum()
-                if invalid_count > 0:
-                    print(f"   - {col}: {invalid_count} valores -999 encontrados")
-                self.df_mossoro.loc[self.df_mossoro[col] == -999, col] = np.nan
+        chunks = []
+        total_rows = 0
+        for chunk in reader:
+            total_rows += len(chunk)
+            chunks.append(chunk[self._region_mask(chunk)])
 
-        # Remover linhas onde RiscoFogo é inválido (é o target, não podemos imputar)
-        initial_count = len(self.df_mossoro)
-        self.df_mossoro = self.df_mossoro.dropna(subset=['RiscoFogo'])
-        removed_count = initial_count - len(self.df_mossoro)
-        if removed_count > 0:
-            print(f"   - Removidas {removed_count} linhas com RiscoFogo inválido")
+        df = pd.concat(chunks, ignore_index=True)
 
-        # Normalizar outliers nas features numéricas (não no target RiscoFogo)
-        numeric_cols = ['DiaSemChuva', 'Precipitacao', 'FRP']
+        # Blocos diferentes geram categorias diferentes; recompor no recorte final
+        for col, dtype in CSV_DTYPES.items():
+            if dtype == 'category' and col in df.columns:
+                df[col] = df[col].astype('category').cat.remove_unused_categories()
 
-        for col in numeric_cols:
-            if col in self.df_mossoro.columns:
-                # Preencher NaN restantes com 0 para features (não para target)
-                self.df_mossoro[col] = self.df_mossoro[col].fillna(0)
+        self.rows_read = total_rows
+        print(f"   - {total_rows} linhas lidas, {len(df)} mantidas")
+        return df
 
-                q1 = self.df_mossoro[col].quantile(0.25)
-                q3 = self.df_mossoro[col].quantile(0.75)
-                iqr = q3 - q1
+    @_profiled('normalize_outliers',
+               rows_in=lambda self: len(self.df_mossoro),
+               rows_out=lambda self, result: len(self.df_mossoro))
+    def _normalize_outliers(self):
+        """
+        Normaliza outliers usando técnica de capping (IQR). Os limites ficam
+        em self.cleaner, para limpar lotes novos sem reestimá-los.
+        """
+        print("🔧 Normalizando outliers e tratando valores inválidos...")
 
-                lower_limit = q1 - 1.5 * iqr
-                upper_limit = q3 + 1.5 * iqr
+        self.cleaner = OutlierCleaner()
+        self.df_mossoro = self.cleaner.fit_transform(self.df_mossoro)
 
-                self.df_mossoro.loc[self.df_mossoro[col] < lower_limit, col] = lower_limit
-                self.df_mossoro.loc[self.df_mossoro[col] > upper_limit, col] = upper_limit
+        report = self.cleaner.report_
+        for col, invalid_count in report['invalid_counts'].items():
+            if invalid_count > 0:
+                print(f"   - {col}: {invalid_count} valores {INVALID_VALUE} encontrados")
+        if report['removed_rows'] > 0:
+            print(f"   - Removidas {report['removed_rows']} linhas com RiscoFogo inválido")
 
         print("✅ Outliers normalizados e valores inválidos tratados")
 
-    def prepare_features(self):
+    @_profiled('prepare_features',
+               rows_in=lambda self, *args, **kwargs: len(self.df_mossoro),
+               rows_out=lambda self, result: len(self.y_design))
+    def prepare_features(self, partition_by='Ano', memmap_dir=None):
         """
         Prepara features para treinamento dos modelos
+
+        A matriz de features (float32) é alocada uma única vez, já com as
+        linhas de treino antes das de teste, e preenchida partição a partição.
+        Valores ausentes e a normalização são aplicados no próprio lugar;
+        X_train_scaled e X_test_scaled são fatias (views) dessa matriz.
+
+        Args:
+            partition_by: coluna de df_mossoro que define as partições (None: uma só)
+            memmap_dir: se informado, a matriz e o target ficam em
+                design_matrix.npy e design_target.npy nesse diretório (memory
+                mapping) e só uma partição por vez é carregada em memória
         """
-        print("🔨 Preparando features...")
+        from sklearn.model_selection import train_test_split
+        from sklearn.preprocessing import StandardScaler, LabelEncoder
 
-        # Features numéricas
-        numeric_features = [
-            'DiaSemChuva', 'Precipitacao', 'FRP',
-            'Latitude', 'Longitude',
-            'Mes', 'Dia', 'DiaSemana', 'Hora'
-        ]
+        print("🔨 Preparando features...")
 
-        # Features categóricas para encoding
-        categorical_features = ['Bioma', 'Municipio']
+        self.build_spatial_index()
 
-        # Criar DataFrame de features
-        X = self.df_mossoro[numeric_features].copy()
+        df = self.df_mossoro
+        n_rows = len(df)
+        if partition_by is not None and partition_by in df.columns:
+            partitions = list(df.groupby(partition_by, sort=True, dropna=False, observed=True).indices.values())
+        else:
+            partitions = [np.arange(n_rows)]
 
-        # Encoding de features categóricas
+        # Encoding de features categóricas: classes vistas em todas as partições
+        categorical_features = [col for col in CATEGORICAL_FEATURES if col in df.columns]
+        self.label_encoders = {}
         for col in categorical_features:
-            if col in self.df_mossoro.columns:
-                le = LabelEncoder()
-                X[f'{col}_encoded'] = le.fit_transform(self.df_mossoro[col].astype(str))
-                self.label_encoders[col] = le
+            self.label_encoders[col] = LabelEncoder().fit(_label_values(df[col]))
+
+        numeric_features = NUMERIC_FEATURES + (NEIGHBOURHOOD_FEATURES if self.neighbourhood_features else [])
+        self.feature_names = numeric_features + [f'{col}_encoded' for col in categorical_features]
+        n_numeric = len(numeric_features)
+
+        # Split train/test (índices das linhas de df_mossoro)
+        self.train_index, self.test_index = train_test_split(
+            np.arange(n_rows), test_size=0.2, random_state=42
+        )
+        self.n_train = len(self.train_index)
+
+        # Posição de cada linha de df_mossoro na matriz (treino, depois teste)
+        destination = np.empty(n_rows, dtype=np.intp)
+        destination[np.concatenate([self.train_index, self.test_index])] = np.arange(n_rows)
+
+        shape = (n_rows, len(self.feature_names))
+        if memmap_dir:
+            os.makedirs(memmap_dir, exist_ok=True)
+            X = np.lib.format.open_memmap(
+                os.path.join(memmap_dir, 'design_matrix.npy'), mode='w+', dtype='float32', shape=shape
+            )
+            y = np.lib.format.open_memmap(
+                os.path.join(memmap_dir, 'design_target.npy'), mode='w+', dtype='float64', shape=(n_rows,)
+            )
+        else:
+            X = np.empty(shape, dtype='float32')
+            y = np.empty(n_rows, dtype='float64')
 
-        # Target: RiscoFogo
-        y = self.df_mossoro['RiscoFogo'].copy()
+        for rows in partitions:
+            part = df.iloc[rows]
+            block = np.empty((len(rows), shape[1]), dtype='float32')
+            block[:, :n_numeric] = part[numeric_features].to_numpy(dtype='float32')
+            for j, col in enumerate(categorical_features):
+                block[:, n_numeric + j] = _encode_labels(part[col], self.label_encoders[col])
+
+            X[destination[rows]] = block
+            y[destination[rows]] = part['RiscoFogo'].to_numpy(dtype='float64')
 
         # Tratamento de valores NaN
         print("🔧 Tratando valores ausentes (NaN)...")
 
         # Verificar quantos NaN existem
-        nan_count_X = X.isna().sum().sum()
-        nan_count_y = y.isna().sum()
+        nan_columns = [j for j in range(shape[1]) if np.isnan(X[:, j]).any()]
+        nan_count_X = sum(int(np.isnan(X[:, j]).sum()) for j in nan_columns)
+        nan_count_y = int(np.isnan(y).sum())
 
         if nan_count_X > 0 or nan_count_y > 0:
             print(f"   - Encontrados {nan_count_X} valores NaN em features")
             print(f"   - Encontrados {nan_count_y} valores NaN em target")
 
             # Preencher NaN em features numéricas com a mediana
-            for col in X.columns:
-                if X[col].isna().any():
-                    median_val = X[col].median()
-                    X[col] = X[col].fillna(median_val)
+            for j in nan_columns:
+                column = X[:, j]
+                column[np.isnan(column)] = np.nanmedian(column)
 
             # Preencher NaN no target com a mediana
-            if y.isna().any():
-                y = y.fillna(y.median())
+            if nan_count_y:
+                y[np.isnan(y)] = np.nanmedian(y)
 
             print("   ✅ Valores NaN preenchidos com a mediana")
 
-        # Split train/test
-        self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
+        self.X_design = X
+        self.y_design = y
+        self._fit_reference_stats(X)
 
-        # Normalização
-        self.X_train_scaled = self.scaler.fit_transform(self.X_train)
-        self.X_test_scaled = self.scaler.transform(self.X_test)
+        # Normalização: estatísticas do treino, aplicadas em blocos no lugar
+        self.scaler = StandardScaler()
+        for start in range(0, self.n_train, CSV_CHUNKSIZE):
+            block = X[start:min(start + CSV_CHUNKSIZE, self.n_train)]
+            self.scaler.partial_fit(pd.DataFrame(block, columns=self.feature_names, copy=False))
+
+        mean = self.scaler.mean_.astype('float32')
+        scale = self.scaler.scale_.astype('float32')
+        for start in range(0, n_rows, CSV_CHUNKSIZE):
+            block = X[start:start + CSV_CHUNKSIZE]
+            block -= mean
+            block /= scale
+
+        self.X_train_scaled = X[:self.n_train]
+        self.X_test_scaled = X[self.n_train:]
+        self.y_train = y[:self.n_train]
+        self.y_test = y[self.n_train:]
+
+        # Estatísticas acumuladas pelas atualizações incrementais (partem do treino)
+        self.scaler_running = copy.deepcopy(self.scaler)
+        self.updates_since_rebuild = 0
+        self._models_changed()
 
         print(f"✅ Features preparadas:")
-        print(f"   - Training set: {len(self.X_train)} amostras")
-        print(f"   - Test set: {len(self.X_test)} amostras")
-        print(f"   - Features: {X.columns.tolist()}")
+        print(f"   - Training set: {len(self.X_train_scaled)} amostras")
+        print(f"   - Test set: {len(self.X_test_scaled)} amostras")
+        print(f"   - Features: {self.feature_names}")
+        print(f"   - Partições: {len(partitions)} ({partition_by or 'nenhuma'})")
 
         return self.X_train_scaled, self.X_test_scaled, self.y_train, self.y_test
 
+    @_profiled('build_spatial_index', rows_in=lambda self: len(self.df_mossoro))
+    def build_spatial_index(self, cell_km=NEIGHBOURHOOD_RADIUS_KM):
+        """
+        Monta o índice espacial (grade) das detecções de df_mossoro e, com
+        neighbourhood_features, calcula as features de vizinhança de cada
+        detecção, só com as detecções até NEIGHBOURHOOD_LAG_DAYS antes dela.
+        Sem o índice, essa contagem seria O(n²).
+
+        Args:
+            cell_km: lado da célula da grade (com o lado igual ao raio, cada
+                consulta visita só as 9 células em volta do ponto)
+        """
+        df = self.df_mossoro
+        self.spatial_index = SpatialIndex.build(
+            df['Latitude'].to_numpy(), df['Longitude'].to_numpy(), df['DataHora'].to_numpy(),
+            df['RiscoFogo'].to_numpy(), df['FRP'].to_numpy(), cell_km=cell_km
+        )
+        if self.neighbourhood_features:
+            for name, values in self._neighbourhood_features(df).items():
+                df[name] = values
+
+        print(f"🗺️  Índice espacial: {len(self.spatial_index)} detecções em "
+              f"{len(self.spatial_index.cell_keys)} células de {cell_km:g} km")
+        return self.spatial_index
+
+    def _neighbourhood_features(self, df, until=None):
+        """
+        NEIGHBOURHOOD_FEATURES de cada linha de df pelo índice espacial, na
+        janela que termina NEIGHBOURHOOD_LAG_DAYS antes da DataHora da linha
+        (sem DataHora, no fim do histórico). Treino, predição e backtest usam
+        esta mesma função.
+
+        Args:
+            until: fim máximo da janela (origem do fold no backtest)
+        """
+        time = pd.to_datetime(df['DataHora'], errors='coerce').to_numpy() if 'DataHora' in df.columns else None
+        count, risk = self.spatial_index.neighbourhood(
+            df['Latitude'].to_numpy(dtype='float64'), df['Longitude'].to_numpy(dtype='float64'), time,
+            NEIGHBOURHOOD_RADIUS_KM, NEIGHBOURHOOD_WINDOW_DAYS, NEIGHBOURHOOD_LAG_DAYS, until
+        )
+        return pd.DataFrame(dict(zip(NEIGHBOURHOOD_FEATURES, (count, risk))), index=df.index)
+
+    def _with_neighbourhood(self, df):
+        """
+        df com as features de vizinhança ausentes (colunas ou valores)
+        calculadas pelo índice, quando o modelo as usa e df traz
+        Latitude/Longitude
+        """
+        names = [name for name in NEIGHBOURHOOD_FEATURES if name in self.feature_names]
+        if not names or self.spatial_index is None or not {'Latitude', 'Longitude'} <= set(df.columns):
+            return df
+        if all(name in df.columns for name in names) and not df[names].isna().any().any():
+            return df
+
+        values = self._neighbourhood_features(df)[names]
+        values = values.fillna({name: self.default_features[name] for name in names})
+        return df.assign(**{
+            name: df[name].fillna(values[name]) if name in df.columns else values[name]
+            for name in names
+        })
+
+    def nearby_detections(self, latitude, longitude, radius_km=NEIGHBOURHOOD_RADIUS_KM, k=None,
+                          days=None, limit=NEARBY_MAX_RESULTS):
+        """
+        Detecções históricas perto de um ponto, pelo índice espacial
+
+        Args:
+            latitude, longitude: ponto da consulta
+            radius_km: raio da busca (ignorado com k)
+            k: se informado, as k detecções mais próximas
+            days: só detecções dos últimos days dias do histórico
+            limit: máximo de detecções na resposta (o resumo usa todas)
+
+        Returns:
+            Dicionário com o resumo (contagem, RiscoFogo médio) e as detecções
+            da mais próxima para a mais distante
+        """
+        if self.spatial_index is None:
+            raise ValueError("Índice espacial indisponível; treine os modelos novamente")
+
+        index = self.spatial_index
+        start = None if days is None else index.last_day - days
+        if k is not None:
+            ids, distance = index.query_knn(latitude, longitude, k, start=start)
+        else:
+            ids, distance = index.query_radius(latitude, longitude, radius_km, start=start)
+
+        risk = index.risk[ids]
+        shown = slice(0, limit)
+        dates = (index.days[ids[shown]] * 86400).astype('datetime64[s]')
+        return {
+            'latitude': latitude,
+            'longitude': longitude,
+            'radius_km': None if k is not None else radius_km,
+            'k': k,
+            'days': days,
+            'count': int(len(ids)),
+            'risk_mean': round(float(np.nanmean(risk)), 4) if np.isfinite(risk).any() else None,
+            'detections': [
+                {
+                    'latitude': round(float(lat), 5),
+                    'longitude': round(float(lon), 5),
+                    'data_hora': str(date),
+                    'risco_fogo': None if np.isnan(value) else round(float(value), 4),
+                    'frp': None if np.isnan(frp) else round(float(frp), 2),
+                    'distance_km': round(float(dist), 3),
+                }
+                for lat, lon, date, value, frp, dist in zip(
+                    index.latitude[ids[shown]], index.longitude[ids[shown]], dates,
+                    risk[shown], index.frp[ids[shown]], distance[shown]
+                )
+            ],
+        }
+
+    def _fit_reference_stats(self, X):
+        """
+        Calcula as estatísticas do dataset usadas nas predições, para que o
+        preditor não dependa mais de df_mossoro depois do treino
+
+        Args:
+            X: matriz de features ainda não normalizada (colunas em
+                self.feature_names)
+        """
+        self.monthly_stats = self._calculate_monthly_stats()
+        self.monthly_sketches = MonthlyHistograms().fit(self.df_mossoro)
+
+        # Média geral do dataset (meses sem dados)
+        self.overall_stats = {
+            'DiaSemChuva': float(self.df_mossoro['DiaSemChuva'].median()),
+            'Precipitacao': float(self.df_mossoro['Precipitacao'].median()),
+            'FRP': float(self.df_mossoro['FRP'].median()),
+            'Latitude': float(self.df_mossoro['Latitude'].median()),
+            'Longitude': float(self.df_mossoro['Longitude'].median()),
+            'RiscoFogo_medio': float(self.df_mossoro['RiscoFogo'].mean()),
+            'count': 0
+        }
+
+        # Vetor de features padrão: mediana das numéricas e moda das
+        # categóricas, no mesmo código do LabelEncoder usado no treino
+        self.default_features = {}
+        for j, name in enumerate(self.feature_names):
+            if name.endswith('_encoded'):
+                self.default_features[name] = int(np.bincount(X[:, j].astype(np.intp)).argmax())
+            else:
+                self.default_features[name] = float(np.median(X[:, j]))
+
+    @_profiled('train_neural_network', rows_in=lambda self: len(self.X_train_scaled))
     def train_neural_network(self):
         """
         Treina Rede Neural (MLP) para predição de risco
         """
         print("\n🧠 Treinando Rede Neural (MLP)...")
 
+        from sklearn.neural_network import MLPRegressor
+
         mlp = MLPRegressor(
             hidden_layer_sizes=(100, 50, 25),
             activation='relu',
@@ -242,36 +898,42 @@ class FireRiskPredictor:
         self.models['neural_network'] = mlp
         self.predictions['neural_network'] = y_pred_test
         self.metrics['neural_network'] = metrics
+        self._models_changed()
 
         print(f"✅ Rede Neural treinada!")
         self._print_metrics(metrics)
 
         return mlp
 
-    def train_knn(self):
+    @_profiled('train_knn', rows_in=lambda self, *args, **kwargs: len(self.X_train_scaled))
+    def train_knn(self, search='grid', n_iter=8, n_jobs=-1, backend='auto'):
         """
         Treina K-Nearest Neighbors para predição de risco
+
+        Args:
+            search: estratégia de busca dos hiperparâmetros: 'grid' (todas as
+                combinações), 'halving' (successive halving sobre o número de
+                amostras) ou 'random' (n_iter combinações sorteadas)
+            n_iter: orçamento de combinações da busca 'random'
+            n_jobs: processos usados no cálculo dos vizinhos
+            backend: índice do modelo final (um de KNN_BACKENDS); o índice é
+                salvo junto com o modelo no bundle
         """
         print("\n🎯 Treinando K-Nearest Neighbors (KNN)...")
 
-        # Grid Search para encontrar melhor K
-        param_grid = {
-            'n_neighbors': [3, 5, 7, 9, 11],
-            'weights': ['uniform', 'distance'],
-            'metric': ['euclidean', 'manhattan']
-        }
+        if backend not in KNN_BACKENDS:
+            raise ValueError(f"Backend de KNN desconhecido: {backend}")
 
-        knn = KNeighborsRegressor()
-        grid_search = GridSearchCV(
-            knn, param_grid, cv=5,
-            scoring='neg_mean_squared_error',
-            n_jobs=-1
+        start = time.perf_counter()
+        best_params, best_score, evaluated = self._knn_search(
+            np.asarray(self.X_train_scaled), np.asarray(self.y_train, dtype='float64'), search, n_iter, n_jobs
         )
+        best_knn = _make_knn(backend, best_params)
+        best_knn.fit(self.X_train_scaled, self.y_train)
+        search_time = time.perf_counter() - start
 
-        grid_search.fit(self.X_train_scaled, self.y_train)
-        best_knn = grid_search.best_estimator_
-
-        print(f"   Melhores parâmetros: {grid_search.best_params_}")
+        print(f"   Melhores parâmetros: {best_params}")
+        print(f"   Busca '{search}': {evaluated} avaliações em {search_time:.2f}s")
 
         # Predições
         y_pred_train = best_knn.predict(self.X_train_scaled)
@@ -284,28 +946,144 @@ class FireRiskPredictor:
             'KNN'
         )
 
+        metrics['search'] = {
+            'strategy': search,
+            'best_params': best_params,
+            'best_score': best_score,
+            'evaluated_configs': evaluated,
+            'wall_time_s': round(search_time, 3)
+        }
+        metrics['backend'] = backend
+
         self.models['knn'] = best_knn
+        self.knn_reference = None if backend == 'approximate' else (self.X_train_scaled, self.y_train)
         self.predictions['knn'] = y_pred_test
         self.metrics['knn'] = metrics
+        self._models_changed()
 
         print(f"✅ KNN treinado!")
         self._print_metrics(metrics)
 
         return best_knn
 
-    def train_random_forest(self):
+    def _knn_search(self, X, y, search, n_iter, n_jobs):
+        """
+        Busca dos hiperparâmetros do KNN por validação cruzada em (X, y)
+
+        Returns:
+            Tupla (melhores parâmetros, melhor score (-MSE), combinações avaliadas)
+        """
+        from sklearn.model_selection import ParameterGrid
+
+        candidates = list(ParameterGrid(KNN_PARAM_GRID))
+
+        if search == 'random':
+            rng = np.random.RandomState(42)
+            chosen = rng.choice(len(candidates), min(n_iter, len(candidates)), replace=False)
+            candidates = [candidates[i] for i in sorted(chosen)]
+        elif search not in ('grid', 'halving'):
+            raise ValueError(f"Estratégia de busca desconhecida: {search}")
+
+        evaluated = 0
+        if search == 'halving':
+            # Successive halving: todas as combinações em uma amostra pequena,
+            # as melhores 1/KNN_HALVING_FACTOR seguem para amostras maiores
+            order = np.random.RandomState(42).permutation(len(X))
+            n_rounds = int(np.ceil(np.log(len(candidates)) / np.log(KNN_HALVING_FACTOR)))
+            min_samples = KNN_CV_FOLDS * max(KNN_PARAM_GRID['n_neighbors']) * 2
+
+            for round_idx in range(n_rounds):
+                n_samples = len(X) // KNN_HALVING_FACTOR ** (n_rounds - 1 - round_idx)
+                subset = np.sort(order[:max(n_samples, min(min_samples, len(X)))])
+                scores = self._knn_cv_scores(X[subset], y[subset], candidates, n_jobs)
+                evaluated += len(candidates)
+
+                if round_idx < n_rounds - 1:
+                    ranked = sorted(range(len(candidates)), key=lambda i: scores[i])
+                    keep = int(np.ceil(len(candidates) / KNN_HALVING_FACTOR))
+                    candidates = [candidates[i] for i in sorted(ranked[:keep])]
+        else:
+            scores = self._knn_cv_scores(X, y, candidates, n_jobs)
+            evaluated = len(candidates)
+
+        best_idx = int(np.argmin(scores))
+        return candidates[best_idx], -float(scores[best_idx]), evaluated
+
+    def _knn_cv_scores(self, X, y, candidates, n_jobs):
+        """
+        Erro quadrático médio da validação cruzada de cada combinação.
+
+        O grafo de vizinhos é calculado uma vez por métrica e fold (com o maior
+        K) e reaproveitado por todos os K e pesos daquela métrica. Os resultados
+        ficam em cache no disco, indexados pelos dados, então uma nova busca
+        sobre o mesmo dataset não recalcula nada.
+        """
+        cache_path = None
+        cached = {}
+        if self.cache_dir:
+            digest = hashlib.sha256(X.tobytes())
+            digest.update(y.tobytes())
+            digest.update(f'{X.shape}:{KNN_CV_FOLDS}'.encode())
+            cache_path = os.path.join(self.cache_dir, f'knn_search_{digest.hexdigest()[:16]}.json')
+            if os.path.exists(cache_path):
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+
+        def config_key(params):
+            return f"{params['metric']}|{params['n_neighbors']}|{params['weights']}"
+
+        missing = [params for params in candidates if config_key(params) not in cached]
+        if missing:
+            from joblib import Parallel, delayed
+            from sklearn.model_selection import KFold
+
+            folds = list(KFold(n_splits=KNN_CV_FOLDS).split(X))
+            max_k = max(params['n_neighbors'] for params in missing)
+            metrics = sorted({params['metric'] for params in missing})
+
+            graphs = Parallel(n_jobs=n_jobs)(
+                delayed(_knn_fold_graph)(X, y, train_idx, val_idx, metric, max_k)
+                for metric in metrics
+                for train_idx, val_idx in folds
+            )
+            graphs = {
+                metric: graphs[i * len(folds):(i + 1) * len(folds)]
+                for i, metric in enumerate(metrics)
+            }
+
+            for params in missing:
+                fold_mse = [
+                    np.mean((_knn_predict_from_graph(dist, neighbor_y, params['n_neighbors'], params['weights']) - y_val) ** 2)
+                    for dist, neighbor_y, y_val in graphs[params['metric']]
+                ]
+                cached[config_key(params)] = float(np.mean(fold_mse))
+
+            if cache_path:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(cache_path, 'w', encoding='utf-8') as f:
+                    json.dump(cached, f)
+
+        return [cached[config_key(params)] for params in candidates]
+
+    @_profiled('train_random_forest', rows_in=lambda self, *args, **kwargs: len(self.X_train_scaled))
+    def train_random_forest(self, n_jobs=-1):
         """
         Treina Random Forest para comparação
+
+        Args:
+            n_jobs: núcleos usados no treino das árvores
         """
         print("\n🌲 Treinando Random Forest...")
 
+        from sklearn.ensemble import RandomForestRegressor
+
         rf = RandomForestRegressor(
             n_estimators=100,
             max_depth=10,
             min_samples_split=5,
             min_samples_leaf=2,
             random_state=42,
-            n_jobs=-1
+            n_jobs=n_jobs
         )
 
         rf.fit(self.X_train_scaled, self.y_train)
@@ -323,7 +1101,7 @@ class FireRiskPredictor:
 
         # Feature importance
         feature_importance = pd.DataFrame({
-            'feature': self.X_train.columns,
+            'feature': self.feature_names,
             'importance': rf.feature_importances_
         }).sort_values('importance', ascending=False)
 
@@ -332,16 +1110,457 @@ class FireRiskPredictor:
         self.models['random_forest'] = rf
         self.predictions['random_forest'] = y_pred_test
         self.metrics['random_forest'] = metrics
+        self._models_changed()
+
+        print(f"✅ Random Forest treinado!")
+        self._print_metrics(metrics)
+
+        return rf
+
+    @_profiled('train_all', rows_in=lambda self, *args, **kwargs: len(self.X_train_scaled))
+    def train_all(self, parallel=True, n_cores=None):
+        """
+        Treina os três modelos. Em modo paralelo cada modelo roda em um
+        processo; a matriz de features é gravada uma vez em disco (ou
+        reaproveitada, se prepare_features já a criou com memory mapping) e
+        aberta com memory mapping pelos processos, sem cópia por pickle.
+
+        Args:
+            parallel: treina os modelos ao mesmo tempo em processos separados
+            n_cores: orçamento total de núcleos (default: todos); dividido
+                entre os modelos para não haver sobre-assinatura. No modo
+                sequencial, limita os jobs do KNN e do Random Forest.
+
+        Returns:
+            Dicionário com os modelos treinados
+        """
+        if not parallel:
+            for model_key, trainer in MODEL_TRAINERS.items():
+                if n_cores and model_key != 'neural_network':
+                    getattr(self, trainer)(n_jobs=n_cores)
+                else:
+                    getattr(self, trainer)()
+            return self.models
+
+        print("\n⚙️  Treinando modelos em paralelo...")
+        budget = _core_budget(n_cores or os.cpu_count() or 1)
+
+        with tempfile.TemporaryDirectory(prefix='fire_risk_') as arrays_dir:
+            if isinstance(self.X_design, np.memmap) and self.X_design.filename:
+                self.X_design.flush()
+                design_path = self.X_design.filename
+            else:
+                design_path = os.path.join(arrays_dir, 'design_matrix.npy')
+                np.save(design_path, self.X_design)
+            target_path = os.path.join(arrays_dir, 'design_target.npy')
+            np.save(target_path, self.y_design)
+
+            from joblib import Parallel, delayed
+
+            results = Parallel(n_jobs=len(MODEL_TRAINERS), backend='loky')(
+                delayed(_train_model_worker)(
+                    model_key, design_path, target_path, self.n_train,
+                    self.feature_names, self.cache_dir, budget[model_key]
+                )
+                for model_key in MODEL_TRAINERS
+            )
+
+        for model_key, (model, y_pred_test, metrics, profile) in zip(MODEL_TRAINERS, results):
+            self.models[model_key] = model
+            if model_key == 'knn':
+                self.knn_reference = (self.X_train_scaled, self.y_train)
+            self.predictions[model_key] = y_pred_test
+            self.metrics[model_key] = metrics
+            self._models_changed()
+
+            # Etapas medidas no processo do modelo
+            for record in profile:
+                record['depth'] += self._profile_depth
+                record['worker'] = model_key
+                self.profile.append(record)
+
+        print(f"✅ Modelos treinados em paralelo (núcleos: {budget})")
+        return self.models
+
+    @_profiled('train_out_of_core', rows_in=lambda self, *args, **kwargs: self.n_train)
+    def train_out_of_core(self, epochs=STREAM_MLP_EPOCHS, n_bags=STREAM_RF_BAGS, bag_rows=STREAM_RF_BAG_ROWS,
+                          reservoir_rows=STREAM_KNN_RESERVOIR_ROWS, knn_search='halving', n_jobs=-1, seed=42):
+        """
+        Treina os três modelos lendo a matriz de features em blocos de
+        STREAM_BLOCK_ROWS linhas: a memória do treino não cresce com o
+        dataset. O quadro regional limpo (df_mossoro) e o índice espacial
+        continuam em memória, montados por load_and_prepare_data e
+        prepare_features; o modo vale para quando a matriz de features (e não
+        esse quadro) não cabe na RAM. Feito para a matriz em disco de
+        prepare_features(memmap_dir=...), cujo scaler já é ajustado em blocos
+        (partial_fit); as linhas de treino estão na ordem embaralhada do
+        split, então qualquer trecho contíguo é uma amostra aleatória.
+
+        - MLP: partial_fit em mini-batches de STREAM_BATCH_ROWS, com os blocos
+          em ordem sorteada a cada época; para quando o erro na validação (as
+          últimas linhas do treino) não melhora por STREAM_MLP_PATIENCE épocas
+        - Random Forest: n_bags florestas menores, cada uma num trecho de
+          bag_rows linhas sorteado do disco, reunidas num só estimador
+        - KNN: busca e conjunto de referência numa amostra de reservatório de
+          reservoir_rows linhas
+
+        Args:
+            epochs: máximo de épocas do MLP
+            n_bags: sacolas (florestas) do Random Forest
+            bag_rows: linhas de cada sacola
+            reservoir_rows: tamanho da amostra de reservatório do KNN
+            knn_search: estratégia de busca do KNN (ver train_knn)
+            n_jobs: núcleos usados pelo KNN e pelo Random Forest
+            seed: semente da ordem dos blocos, das sacolas e do reservatório
+
+        Returns:
+            Dicionário com os modelos treinados
+        """
+        print("\n💽 Treinando modelos fora da memória...")
+
+        if isinstance(self.X_design, np.memmap):
+            self.X_design.flush()
+        rng = np.random.default_rng(seed)
+
+        self._train_neural_network_streaming(epochs, rng)
+        self._train_knn_reservoir(reservoir_rows, knn_search, n_jobs, rng)
+        self._train_random_forest_bagged(n_bags, bag_rows, n_jobs, rng)
+        return self.models
+
+    @_profiled('train_neural_network_streaming', rows_in=lambda self, *args, **kwargs: self.n_train)
+    def _train_neural_network_streaming(self, epochs, rng):
+        """
+        MLP treinado com partial_fit sobre os blocos do disco (ver train_out_of_core)
+        """
+        print("\n🧠 Treinando Rede Neural (MLP) em mini-batches...")
+
+        from sklearn.neural_network import MLPRegressor
+
+        mlp = MLPRegressor(
+            hidden_layer_sizes=(100, 50, 25),
+            activation='relu',
+            solver='adam',
+            alpha=0.001,
+            batch_size=STREAM_BATCH_ROWS,
+            learning_rate_init=0.001,
+            random_state=42,
+            verbose=False
+        )
+
+        # Validação: as últimas linhas do treino ficam fora dos mini-batches
+        n_val = min(self.n_train // 10, STREAM_METRIC_ROWS)
+        n_fit = self.n_train - n_val
+        X_val, y_val = self._read_design(n_fit, self.n_train)
+        blocks = _row_blocks(0, n_fit, STREAM_BLOCK_ROWS)
+
+        best, best_loss, stale, epochs_run = mlp, np.inf, 0, 0
+        for _ in range(epochs):
+            for i in rng.permutation(len(blocks)):
+                mlp.partial_fit(*self._read_design(*blocks[i]))
+            epochs_run += 1
+
+            loss = float(np.mean((mlp.predict(X_val) - y_val) ** 2))
+            if loss < best_loss - mlp.tol:
+                best, best_loss, stale = copy.deepcopy(mlp), loss, 0
+            else:
+                stale += 1
+                if stale >= STREAM_MLP_PATIENCE:
+                    break
+        mlp = best
+
+        metrics, y_pred_test = self._streamed_metrics(mlp, 'Neural Network')
+        metrics['out_of_core'].update({
+            'epochs': epochs_run,
+            'batch_size': STREAM_BATCH_ROWS,
+            'validation_rows': n_val,
+            'validation_mse': best_loss
+        })
+
+        self.models['neural_network'] = mlp
+        self.predictions['neural_network'] = y_pred_test
+        self.metrics['neural_network'] = metrics
+        self._models_changed()
+
+        print(f"✅ Rede Neural treinada! ({epochs_run} épocas)")
+        self._print_metrics(metrics)
+
+        return mlp
+
+    @_profiled('train_knn_reservoir', rows_in=lambda self, *args, **kwargs: self.n_train)
+    def _train_knn_reservoir(self, reservoir_rows, search, n_jobs, rng):
+        """
+        KNN sobre uma amostra de reservatório do treino (ver train_out_of_core)
+        """
+        print("\n🎯 Treinando K-Nearest Neighbors (KNN) numa amostra de reservatório...")
+
+        start_time = time.perf_counter()
+        size = min(reservoir_rows, self.n_train)
+        X_res = np.empty((size, len(self.feature_names)))
+        y_res = np.empty(size)
+
+        # Algoritmo R: as primeiras linhas enchem o reservatório; a linha i
+        # substitui a posição sorteada em [0, i] quando ela cai no reservatório
+        for start, stop in _row_blocks(0, self.n_train, STREAM_BLOCK_ROWS):
+            X_block, y_block = self._read_design(start, stop)
+            fill = min(max(size - start, 0), stop - start)
+            X_res[start:start + fill] = X_block[:fill]
+            y_res[start:start + fill] = y_block[:fill]
+
+            slots = rng.integers(0, np.arange(start + fill, stop) + 1)
+            kept = slots < size
+            X_res[slots[kept]] = X_block[fill:][kept]
+            y_res[slots[kept]] = y_block[fill:][kept]
+
+        best_params, best_score, evaluated = self._knn_search(X_res, y_res, search, 8, n_jobs)
+        knn = _make_knn('auto', best_params)
+        knn.fit(X_res, y_res)
+        search_time = time.perf_counter() - start_time
+
+        print(f"   Melhores parâmetros: {best_params}")
+        print(f"   Busca '{search}': {evaluated} avaliações em {search_time:.2f}s ({size} linhas)")
+
+        metrics, y_pred_test = self._streamed_metrics(knn, 'KNN')
+        metrics['search'] = {
+            'strategy': search,
+            'best_params': best_params,
+            'best_score': best_score,
+            'evaluated_configs': evaluated,
+            'wall_time_s': round(search_time, 3)
+        }
+        metrics['backend'] = 'auto'
+        metrics['out_of_core']['reservoir_rows'] = size
+
+        self.models['knn'] = knn
+        self.knn_reference = (X_res, y_res)
+        self.predictions['knn'] = y_pred_test
+        self.metrics['knn'] = metrics
+        self._models_changed()
+
+        print(f"✅ KNN treinado!")
+        self._print_metrics(metrics)
+
+        return knn
+
+    @_profiled('train_random_forest_bagged', rows_in=lambda self, *args, **kwargs: self.n_train)
+    def _train_random_forest_bagged(self, n_bags, bag_rows, n_jobs, rng, n_estimators=100):
+        """
+        Random Forest reunido a partir de florestas treinadas em trechos
+        sorteados do disco (ver train_out_of_core)
+        """
+        print(f"\n🌲 Treinando Random Forest em {n_bags} sacolas...")
+
+        from sklearn.ensemble import RandomForestRegressor
+
+        bag_rows = min(bag_rows, self.n_train)
+        rf = None
+        for _ in range(n_bags):
+            start = int(rng.integers(0, self.n_train - bag_rows + 1))
+            forest = RandomForestRegressor(
+                n_estimators=-(-n_estimators // n_bags),
+                max_depth=10,
+                min_samples_split=5,
+                min_samples_leaf=2,
+                random_state=int(rng.integers(2 ** 31)),
+                n_jobs=n_jobs
+            )
+            forest.fit(*self._read_design(start, start + bag_rows))
+
+            if rf is None:
+                rf = forest
+            else:
+                rf.estimators_ += forest.estimators_
+        rf.set_params(n_estimators=len(rf.estimators_))
+
+        metrics, y_pred_test = self._streamed_metrics(rf, 'Random Forest')
+        metrics['feature_importance'] = pd.DataFrame({
+            'feature': self.feature_names,
+            'importance': rf.feature_importances_
+        }).sort_values('importance', ascending=False).to_dict('records')
+        metrics['out_of_core'].update({'bags': n_bags, 'bag_rows': bag_rows, 'trees': len(rf.estimators_)})
+
+        self.models['random_forest'] = rf
+        self.predictions['random_forest'] = y_pred_test
+        self.metrics['random_forest'] = metrics
+        self._models_changed()
 
         print(f"✅ Random Forest treinado!")
         self._print_metrics(metrics)
 
         return rf
 
+    def _read_design(self, start, stop):
+        """
+        Linhas [start, stop) da matriz de features (float64) e do target
+        """
+        return (
+            np.asarray(self.X_design[start:stop], dtype='float64'),
+            np.asarray(self.y_design[start:stop], dtype='float64')
+        )
+
+    def _streamed_metrics(self, model, model_name):
+        """
+        Métricas de um modelo treinado fora da memória: o teste é predito em
+        blocos e o treino é avaliado nas primeiras STREAM_METRIC_ROWS linhas
+        (registradas em metrics['out_of_core'])
+
+        Returns:
+            Tupla (métricas, predições do teste)
+        """
+        X_train, y_train = self._read_design(0, min(self.n_train, STREAM_METRIC_ROWS))
+        y_pred_test = np.concatenate([
+            model.predict(self._read_design(start, stop)[0])
+            for start, stop in _row_blocks(self.n_train, len(self.y_design), STREAM_BLOCK_ROWS)
+        ])
+
+        metrics = self._calculate_metrics(
+            y_train, model.predict(X_train),
+            self.y_test, y_pred_test,
+            model_name
+        )
+        metrics['out_of_core'] = {'train_metric_rows': len(y_train)}
+        return metrics, y_pred_test
+
+    @_profiled('update_models', rows_in=lambda self, new_data, *args, **kwargs: len(new_data))
+    def update_models(self, new_data, full_rebuild_every=FULL_REBUILD_EVERY):
+        """
+        Atualiza os modelos com novas detecções, com custo proporcional às
+        linhas novas: o MLP continua de onde parou (partial_fit), a floresta
+        ganha INCREMENTAL_RF_TREES árvores treinadas na janela nova
+        (warm_start) e o KNN incorpora a janela ao conjunto de referência.
+
+        O scaler usado pelos modelos fica congelado até a próxima reconstrução
+        (os modelos foram treinados nessa escala); suas estatísticas
+        acumuladas (partial_fit em scaler_running) medem o desvio dos dados.
+        A cada full_rebuild_every atualizações, ou quando o desvio passa de
+        SCALER_DRIFT_THRESHOLD, tudo é retreinado a partir de data_path, que
+        deve já conter as novas detecções.
+
+        Args:
+            new_data: DataFrame com as colunas de df_mossoro (limpo aqui com
+                os limites do treino em self.cleaner)
+            full_rebuild_every: atualizações incrementais entre reconstruções
+
+        Returns:
+            Dicionário com o modo da atualização ('incremental' ou 'full'), o
+            desvio do scaler e o RMSE de cada modelo na janela nova, medido
+            antes de treinar nela
+        """
+        print(f"\n🔄 Atualizando modelos com {len(new_data)} novas detecções...")
+
+        if self.cleaner is not None:
+            new_data = self.cleaner.transform(new_data)
+
+        # Detecções novas entram no índice espacial; a vizinhança de cada uma
+        # usa as anteriores (histórico e janela nova)
+        if self.spatial_index is not None:
+            self.spatial_index = self.spatial_index.extend(
+                new_data['Latitude'].to_numpy(), new_data['Longitude'].to_numpy(),
+                new_data['DataHora'].to_numpy(), new_data['RiscoFogo'].to_numpy(), new_data['FRP'].to_numpy()
+            )
+            if self.neighbourhood_features:
+                new_data = new_data.assign(**self._neighbourhood_features(new_data))
+        X_new, y_new = self._feature_matrix(new_data)
+        X_scaled = self.scaler.transform(X_new)
+
+        # Avaliação na janela nova antes de treinar nela
+        from sklearn.metrics import mean_squared_error
+
+        rmse_before = {
+            model_name: float(np.sqrt(mean_squared_error(y_new, model.predict(X_scaled))))
+            for model_name, model in self.models.items()
+        }
+
+        if self.scaler_running is None:
+            self.scaler_running = copy.deepcopy(self.scaler)
+        self.scaler_running.partial_fit(X_new)
+        drift = float(np.max(np.abs(self.scaler_running.mean_ - self.scaler.mean_) / self.scaler.scale_))
+
+        self.updates_since_rebuild += 1
+        rebuild = self.updates_since_rebuild >= full_rebuild_every or drift > SCALER_DRIFT_THRESHOLD
+        if rebuild and self.data_path:
+            print(f"   - Reconstrução completa (atualizações: {self.updates_since_rebuild}, desvio: {drift:.3f})")
+            self.load_and_prepare_data()
+            self.prepare_features()
+            self.train_all()
+            return {'mode': 'full', 'drift': drift, 'rmse_before': rmse_before}
+        if rebuild:
+            print("⚠️  Reconstrução completa necessária, mas data_path não foi configurado")
+
+        # MLP: mais épocas sobre a janela nova, a partir dos pesos atuais
+        mlp = self.models['neural_network']
+        if mlp.early_stopping:
+            # partial_fit não aceita early_stopping; a melhor perda passa a ser a de treino
+            mlp.set_params(early_stopping=False)
+            mlp.best_loss_ = min(mlp.loss_curve_)
+        for _ in range(INCREMENTAL_MLP_EPOCHS):
+            mlp.partial_fit(X_scaled, y_new)
+
+        # Random Forest: árvores novas na janela, descartando as mais antigas
+        rf = self.models['random_forest']
+        rf.set_params(warm_start=True, n_estimators=len(rf.estimators_) + INCREMENTAL_RF_TREES)
+        rf.fit(X_scaled, y_new)
+        if len(rf.estimators_) > RF_MAX_TREES:
+            rf.estimators_ = rf.estimators_[-RF_MAX_TREES:]
+            rf.set_params(n_estimators=RF_MAX_TREES)
+        self.metrics['random_forest']['feature_importance'] = pd.DataFrame({
+            'feature': self.feature_names,
+            'importance': rf.feature_importances_
+        }).sort_values('importance', ascending=False).to_dict('records')
+
+        # KNN: janela nova entra no conjunto de referência
+        self.models['knn'], self.knn_reference = _extend_knn(
+            self.models['knn'], self.knn_reference, X_scaled, y_new
+        )
+
+        self.update_monthly_stats(new_data)
+        self._models_changed()
+
+        print(f"✅ Modelos atualizados (desvio do scaler: {drift:.3f}, "
+              f"atualizações desde a reconstrução: {self.updates_since_rebuild})")
+        return {'mode': 'incremental', 'drift': drift, 'rmse_before': rmse_before}
+
+    def _feature_matrix(self, df):
+        """
+        Features (na ordem do treino) e target de um DataFrame limpo, com os
+        LabelEncoders já ajustados; categorias novas e valores ausentes
+        recebem self.default_features
+        """
+        df = df.dropna(subset=['RiscoFogo'])
+        return self._encode_features(df), df['RiscoFogo'].to_numpy(dtype='float64')
+
+    def _encode_features(self, df):
+        """
+        Features na ordem do treino para todas as linhas de df, com as
+        categóricas brutas codificadas pelos LabelEncoders (colunas *_encoded
+        já presentes são mantidas) e as features de vizinhança calculadas
+        pelo índice espacial; colunas ausentes recebem self.default_features
+        """
+        df = self._with_neighbourhood(df)
+        X = df.reindex(columns=NUMERIC_FEATURES + NEIGHBOURHOOD_FEATURES).astype('float64')
+        for col, le in self.label_encoders.items():
+            if col in df.columns:
+                codes = pd.Categorical(df[col].astype(str), categories=le.classes_).codes
+                X[f'{col}_encoded'] = np.where(codes >= 0, codes, self.default_features[f'{col}_encoded'])
+            elif f'{col}_encoded' in df.columns:
+                X[f'{col}_encoded'] = df[f'{col}_encoded'].to_numpy()
+
+        return X.reindex(columns=self.feature_names).fillna(pd.Series(self.default_features))
+
+    def _models_changed(self):
+        """
+        Renova a versão dos modelos e descarta as predições em cache (chamado
+        sempre que um modelo ou o scaler é treinado)
+        """
+        self.model_version = uuid.uuid4().hex
+        self.prediction_cache.clear()
+        self.forecasts.clear()
+
     def _calculate_metrics(self, y_train, y_pred_train, y_test, y_pred_test, model_name):
         """
         Calcula métricas de avaliação dos modelos
         """
+        from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+
         return {
             'model_name': model_name,
             'train': {
@@ -367,6 +1586,266 @@ class FireRiskPredictor:
         print(f"      Test MAE:  {metrics['test']['mae']:.4f}")
         print(f"      Test R²:   {metrics['test']['r2']:.4f}")
 
+    def benchmark_knn_backends(self, n_probes=(1, 2, 4, 8, 16), output_dir='./output'):
+        """
+        Compara os backends do KNN com a busca exata (força bruta) no X_test:
+        tempo de construção do índice, latência das consultas e recall dos
+        vizinhos retornados
+
+        Args:
+            n_probes: valores de n_probe avaliados no backend aproximado
+            output_dir: diretório onde salvar knn_benchmark.json
+
+        Returns:
+            Lista com o resultado de cada backend
+        """
+        from sklearn.metrics import mean_squared_error
+
+        print("\n⏱️  Comparando backends do KNN...")
+
+        knn_params = self.models['knn'].get_params()
+        params = {name: knn_params[name] for name in ('n_neighbors', 'weights', 'metric')}
+        X_train = np.asarray(self.X_train_scaled)
+        X_test = np.asarray(self.X_test_scaled)
+
+        exact = _make_knn('brute', params).fit(X_train, self.y_train)
+        exact_idx = exact.kneighbors(X_test, return_distance=False)
+        exact_pred = exact.predict(X_test)
+
+        configs = [('brute', {}), ('kd_tree', {}), ('ball_tree', {})]
+        configs += [('approximate', {'n_probe': n_probe}) for n_probe in n_probes]
+
+        results = []
+        for backend, options in configs:
+            model = _make_knn(backend, params, **options)
+
+            start = time.perf_counter()
+            model.fit(X_train, self.y_train)
+            build_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            idx = model.kneighbors(X_test, return_distance=False)
+            y_pred = model.predict(X_test)
+            query_time = time.perf_counter() - start
+
+            recall = np.mean([
+                len(np.intersect1d(found, expected)) / len(expected)
+                for found, expected in zip(idx, exact_idx)
+            ])
+
+            results.append({
+                'backend': backend,
+                **options,
+                'build_time_s': round(build_time, 4),
+                'query_time_s': round(query_time, 4),
+                'us_per_query': round(query_time / len(X_test) * 1e6, 2),
+                'recall': round(float(recall), 4),
+                'rmse_vs_exact': float(np.sqrt(np.mean((y_pred - exact_pred) ** 2))),
+                'test_rmse': float(np.sqrt(mean_squared_error(self.y_test, y_pred)))
+            })
+
+        print(pd.DataFrame(results).to_string(index=False))
+
+        OutputWriter(output_dir).json(
+            'knn_benchmark.json', {'params': params, 'n_queries': len(X_test), 'results': results}, indent=2
+        )
+
+        return results
+
+    @_profiled('backtest', rows_in=lambda self, *args, **kwargs: len(self.df_mossoro))
+    def backtest(self, period=BACKTEST_PERIOD, horizon=BACKTEST_HORIZON,
+                 min_train_periods=BACKTEST_MIN_TRAIN_PERIODS, max_folds=BACKTEST_MAX_FOLDS,
+                 train_periods=None, n_cores=None):
+        """
+        Validação temporal com origem deslizante: cada fold treina os três
+        modelos só com detecções anteriores à origem (por DataHora) e avalia
+        nos `horizon` períodos seguintes, sem o vazamento entre horas vizinhas
+        do split aleatório. Os folds ficam em cache (matrizes .npy já
+        normalizadas com o scaler do próprio fold) e cada par fold/modelo é
+        treinado num processo separado.
+
+        Requer prepare_features (encoders e ordem das features).
+
+        Args:
+            period: granularidade das origens (alias de período do pandas)
+            horizon: períodos após a origem avaliados em cada fold
+            min_train_periods: períodos de histórico antes da primeira origem
+            max_folds: número máximo de folds (as origens mais recentes)
+            train_periods: None para janela expansível, N para janela
+                deslizante com os N períodos anteriores à origem
+            n_cores: orçamento total de núcleos (default: todos)
+
+        Returns:
+            Dicionário com o backtest de cada modelo (também gravado em
+            self.metrics[modelo]['backtest'])
+        """
+        print(f"\n⏳ Backtesting temporal (período '{period}', horizonte {horizon})...")
+
+        X, y = self._feature_matrix(self.df_mossoro)
+        rows = self.df_mossoro.loc[X.index]
+        codes, periods = pd.factorize(rows['DataHora'].dt.to_period(period), sort=True)
+        X = X.to_numpy(dtype='float32')
+
+        origins = list(range(min_train_periods, len(periods)))[-max_folds:]
+        if not origins:
+            print(f"⚠️  Apenas {len(periods)} períodos: histórico insuficiente para o backtest")
+            return {}
+
+        config = {
+            'period': period,
+            'horizon': horizon,
+            'min_train_periods': min_train_periods,
+            'train_periods': train_periods,
+            'window': 'expanding' if train_periods is None else 'rolling',
+        }
+        if self.spatial_index is not None:
+            config['neighbourhood_lag_days'] = NEIGHBOURHOOD_LAG_DAYS
+
+        # Chave dos folds em cache: dados, períodos e configuração
+        key = hashlib.sha256()
+        for values in (X, y, codes):
+            key.update(np.ascontiguousarray(values).tobytes())
+        key.update(json.dumps({**config, 'origins': origins, 'features': self.feature_names}).encode())
+
+        n_cores = n_cores or os.cpu_count() or 1
+        cache_root = os.path.join(self.cache_dir, 'backtest') if self.cache_dir else None
+        with nullcontext(cache_root) if cache_root else tempfile.TemporaryDirectory(prefix='fire_risk_bt_') as root:
+            folds_dir = os.path.join(root, key.hexdigest()[:16])
+            folds = self._backtest_folds(X, y, codes, periods, origins, horizon, train_periods, folds_dir, rows)
+            if cache_root:
+                _remove_stale_dirs(root, keep=folds_dir)
+
+            tasks = [(fold, model_key) for fold in folds for model_key in MODEL_TRAINERS]
+            n_jobs = min(len(tasks), n_cores)
+            from joblib import Parallel, delayed
+
+            results = Parallel(n_jobs=n_jobs, backend='loky')(
+                delayed(_backtest_worker)(
+                    model_key, fold['design_path'], fold['target_path'], fold['n_train'],
+                    self.feature_names, self.cache_dir, max(1, n_cores // n_jobs)
+                )
+                for fold, model_key in tasks
+            )
+
+        # Métricas por fold e por horizonte (agregadas entre os folds)
+        predictions = {model_key: [] for model_key in MODEL_TRAINERS}
+        for (fold, model_key), y_pred in zip(tasks, results):
+            predictions[model_key].append((fold, y_pred))
+
+        report = {}
+        for model_key, fold_predictions in predictions.items():
+            fold_reports = []
+            pooled = {}
+            for fold, y_pred in fold_predictions:
+                fold_reports.append({
+                    **{name: value for name, value in fold.items() if not name.endswith('_path')
+                       and name not in ('n_train', 'y_test', 'steps')},
+                    **_regression_metrics(fold['y_test'], y_pred),
+                    'horizons': [
+                        {'horizon': int(step), **_regression_metrics(fold['y_test'][mask], y_pred[mask])}
+                        for step in np.unique(fold['steps'])
+                        for mask in [fold['steps'] == step]
+                    ],
+                })
+                for step in np.unique(fold['steps']):
+                    mask = fold['steps'] == step
+                    pooled.setdefault(int(step), []).append((fold['y_test'][mask], y_pred[mask]))
+
+            summary = {'folds': len(fold_reports), 'pooled': _regression_metrics(
+                np.concatenate([fold['y_test'] for fold, _ in fold_predictions]),
+                np.concatenate([y_pred for _, y_pred in fold_predictions])
+            )}
+            for name in ('rmse', 'mae', 'r2'):
+                values = [r[name] for r in fold_reports if r[name] is not None]
+                summary[f'{name}_mean'] = float(np.mean(values)) if values else None
+                summary[f'{name}_std'] = float(np.std(values)) if values else None
+
+            report[model_key] = {
+                'config': config,
+                'summary': summary,
+                'horizons': [
+                    {'horizon': step, **_regression_metrics(
+                        np.concatenate([t for t, _ in pairs]), np.concatenate([p for _, p in pairs])
+                    )}
+                    for step, pairs in sorted(pooled.items())
+                ],
+                'folds': fold_reports,
+            }
+            self.metrics.setdefault(model_key, {})['backtest'] = report[model_key]
+
+        print(f"✅ Backtest concluído: {len(folds)} folds")
+        print(pd.DataFrame({
+            model_key: {
+                'RMSE': result['summary']['rmse_mean'],
+                'MAE': result['summary']['mae_mean'],
+                'R²': result['summary']['r2_mean'],
+                'R² (agregado)': result['summary']['pooled']['r2'],
+            }
+            for model_key, result in report.items()
+        }).T.round(4).to_string())
+
+        return report
+
+    def _backtest_folds(self, X, y, codes, periods, origins, horizon, train_periods, folds_dir, rows):
+        """
+        Grava (ou reaproveita do cache) a matriz de cada fold: linhas de
+        treino seguidas das de teste, normalizadas com o scaler ajustado no
+        treino do fold, e o alvo correspondente
+
+        As features de vizinhança das linhas de teste são recalculadas com a
+        janela limitada à origem do fold, como numa previsão feita na origem
+        (rows são as linhas de df_mossoro na ordem de X).
+        """
+        os.makedirs(folds_dir, exist_ok=True)
+        neighbourhood = [name for name in NEIGHBOURHOOD_FEATURES if name in self.feature_names]
+        if self.spatial_index is None:
+            neighbourhood = []
+
+        folds = []
+        for origin in origins:
+            start = 0 if train_periods is None else max(0, origin - train_periods)
+            train_mask = (codes >= start) & (codes < origin)
+            test_mask = (codes >= origin) & (codes < origin + horizon)
+            if not train_mask.any() or test_mask.sum() < BACKTEST_MIN_TEST_ROWS:
+                continue
+
+            fold_id = len(folds)
+            design_path = os.path.join(folds_dir, f'fold{fold_id}_design.npy')
+            target_path = os.path.join(folds_dir, f'fold{fold_id}_target.npy')
+            if not (os.path.exists(design_path) and os.path.exists(target_path)):
+                from sklearn.preprocessing import StandardScaler
+
+                X_test = X[test_mask].copy()
+                if neighbourhood:
+                    values = self._neighbourhood_features(rows[test_mask], until=periods[origin].start_time)
+                    values = values[neighbourhood].fillna({name: self.default_features[name] for name in neighbourhood})
+                    X_test[:, [self.feature_names.index(name) for name in neighbourhood]] = values.to_numpy()
+
+                scaler = StandardScaler().fit(X[train_mask])
+                design = scaler.transform(np.vstack([X[train_mask], X_test])).astype('float32')
+                np.save(f'{design_path}.tmp.npy', design)
+                np.save(f'{target_path}.tmp.npy', np.concatenate([y[train_mask], y[test_mask]]))
+                os.replace(f'{design_path}.tmp.npy', design_path)
+                os.replace(f'{target_path}.tmp.npy', target_path)
+
+            last = min(origin + horizon, len(periods)) - 1
+            folds.append({
+                'fold': fold_id,
+                'train_start': str(periods[start]),
+                'train_end': str(periods[origin - 1]),
+                'test_start': str(periods[origin]),
+                'test_end': str(periods[last]),
+                'train_rows': int(train_mask.sum()),
+                'test_rows': int(test_mask.sum()),
+                'n_train': int(train_mask.sum()),
+                'design_path': design_path,
+                'target_path': target_path,
+                'y_test': y[test_mask],
+                'steps': codes[test_mask] - origin + 1,
+            })
+
+        return folds
+
     def compare_models(self):
         """
         Compara os modelos treinados
@@ -389,21 +1868,313 @@ class FireRiskPredictor:
 
         return df_comparison
 
-    def predict_year(self, year=2025, location_data=None):
+    @_profiled('predict_batch',
+               rows_in=lambda self, features, *args, **kwargs: len(features),
+               rows_out=lambda self, result: len(result))
+    def predict_batch(self, features, use_cache=True):
         """
-        Prediz risco de fogo para todos os meses do ano usando estatísticas reais do dataset
+        Prediz risco de fogo para várias linhas de uma vez: normaliza a matriz
+        inteira e chama cada modelo uma única vez
+
+        Com o cache ativo, só as linhas sem predição em cache para esta versão
+        dos modelos passam pelos modelos, sempre com os valores exatos. Por
+        padrão a chave é a própria linha e o resultado é idêntico ao de
+        use_cache=False. Com prediction_cache_resolution a chave é a linha
+        quantizada e a primeira linha de cada chave alimenta o cache: um
+        acerto devolve a predição de outra linha da mesma célula, o que pode
+        mudar a predição (até ~0.1 nos dados do BDQueimadas, perto das
+        fronteiras das árvores e dos vizinhos do KNN).
 
         Args:
-            year: ano para as predições (default: 2025)
-            location_data: dados da localização (lat, lon, etc)
+            features: DataFrame com colunas de self.feature_names (colunas
+                ausentes recebem o valor de self.default_features; as de
+                vizinhança são calculadas a partir de Latitude/Longitude e
+                da DataHora, quando houver)
+            use_cache: consulta e alimenta self.prediction_cache
 
         Returns:
-            Lista com predições mensais
+            DataFrame com a predição de cada modelo (limitada entre 0 e 1), a
+            média das predições e o nível de risco de cada linha
         """
-        print(f"\n🔮 Gerando predições mensais para {year}...")
+        features = self._with_neighbourhood(features)
+        columns = {}
+        for name in self.feature_names:
+            if name in features.columns:
+                columns[name] = features[name].to_numpy()
+            else:
+                columns[name] = np.full(len(features), self.default_features[name])
+
+        X = pd.DataFrame(columns, index=features.index)
+        use_cache = use_cache and self.prediction_cache.max_size > 0 and len(features) > 0
+        if not use_cache:
+            predictions = self._predict_models(X)
+        else:
+            # Chave no cache: linhas distintas (exatas ou quantizadas)
+            resolution = self.prediction_cache_resolution
+            X_key = np.column_stack([
+                _quantize(columns[name], resolution.get(name, 1.0)) if resolution
+                else np.asarray(columns[name], dtype='float64') + 0.0
+                for name in self.feature_names
+            ])
+            X_unique, inverse = np.unique(X_key, axis=0, return_inverse=True)
+            inverse = inverse.ravel()
+            keys = [(self.model_version, row.tobytes()) for row in X_unique]
+
+            cached = self.prediction_cache.get_many(keys)
+            hit = np.array([value is not None for value in cached])[inverse]
+            predictions = np.empty((len(X), len(self.models)))
+            if hit.any():
+                predictions[hit] = np.asarray([cached[i] for i in inverse[hit]])
+            if not hit.all():
+                computed = self._predict_models(X[~hit])
+                predictions[~hit] = computed
+                new_keys, first = np.unique(inverse[~hit], return_index=True)
+                self.prediction_cache.put_many([keys[i] for i in new_keys], computed[first])
+
+        result = pd.DataFrame(predictions, columns=list(self.models), index=features.index)
+
+        # Média das predições e nível de risco
+        average = np.round(predictions.mean(axis=1), 4)
+        result['average_prediction'] = average
+        result['risk_level'] = np.array(RISK_LEVEL_NAMES)[np.digitize(average, RISK_LEVEL_THRESHOLDS)]
+
+        return result
+
+    def _predict_models(self, features):
+        """
+        Normaliza as features (DataFrame na ordem do treino) e retorna a matriz
+        de predições (linhas x modelos), limitadas entre 0 e 1
+        """
+        if self.compiled_version != self.model_version:
+            self.compile_models()
+
+        features_scaled = self.scaler.transform(features)
+        return np.column_stack([
+            np.round(np.clip(self.compiled_models.get(model_name, model).predict(features_scaled), 0, 1), 4)
+            for model_name, model in self.models.items()
+        ])
+
+    def compile_models(self):
+        """
+        Achata os modelos de COMPILED_MODELS em arrays NumPy para a predição
+        em processo (sem o overhead por chamada do scikit-learn). Refeito
+        automaticamente quando model_version muda.
+        """
+        self.compiled_models = {
+            model_name: COMPILED_MODELS[model_name].from_sklearn(model)
+            for model_name, model in self.models.items()
+            if model_name in COMPILED_MODELS
+        }
+        self.compiled_version = self.model_version
+        return self.compiled_models
+
+    def export_fast_bundle(self, path=FAST_BUNDLE_PATH, tolerance=FAST_EXPORT_TOLERANCE):
+        """
+        Exporta o ensemble achatado (scaler, Random Forest, MLP, KNN e índice
+        espacial) num
+        .npz carregado por fire_risk_inference.FastPredictor, que prediz sem
+        importar scikit-learn nem pandas
+
+        Antes de gravar, compara cada modelo achatado com o original no
+        conjunto de teste (quando disponível).
+
+        Args:
+            path: caminho do arquivo .npz
+            tolerance: diferença absoluta máxima aceita por predição
+
+        Returns:
+            Instância de FastPredictor exportada
+        """
+        models = {
+            model_name: FLAT_MODELS[model_name].from_sklearn(model)
+            for model_name, model in self.models.items()
+        }
+
+        if self.X_test_scaled is not None and len(self.X_test_scaled):
+            X_check = np.asarray(self.X_test_scaled[:FAST_EXPORT_CHECK_ROWS], dtype=np.float64)
+            for model_name, flat_model in models.items():
+                model = self.models[model_name]
+                # O achatado do KNN aproximado faz busca exata; não há o que comparar
+                if isinstance(model, ApproximateKNNRegressor):
+                    continue
+                # Empates na k-ésima distância não têm vizinho canônico
+                rows = ~flat_model.boundary_ties(X_check) if model_name == 'knn' else slice(None)
+                diff = np.abs(flat_model.predict(X_check[rows]) - model.predict(X_check[rows]))
+                max_diff = float(diff.max()) if diff.size else 0.0
+                if max_diff > tolerance:
+                    raise ValueError(
+                        f"Modelo achatado {model_name} difere do original em {max_diff:.2e} "
+                        f"(tolerância {tolerance:.0e})"
+                    )
+
+        meta = {
+            'format_version': FAST_BUNDLE_VERSION,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'model_version': self.model_version,
+            'models': list(models),
+            'feature_names': self.feature_names,
+            'default_features': {name: float(value) for name, value in self.default_features.items()},
+            'label_classes': {col: [str(c) for c in le.classes_] for col, le in self.label_encoders.items()},
+            'risk_level_thresholds': RISK_LEVEL_THRESHOLDS,
+            'risk_level_names': RISK_LEVEL_NAMES,
+            'monthly_stats': self.monthly_stats,
+            'overall_stats': self.overall_stats,
+        }
+        if self.spatial_index is not None:
+            meta['neighbourhood'] = {
+                'features': [name for name in NEIGHBOURHOOD_FEATURES if name in self.feature_names],
+                'radius_km': NEIGHBOURHOOD_RADIUS_KM,
+                'window_days': NEIGHBOURHOOD_WINDOW_DAYS,
+                'lag_days': NEIGHBOURHOOD_LAG_DAYS,
+            }
+        fast_predictor = FastPredictor(
+            meta, models, FlatScaler(self.scaler.mean_, self.scaler.scale_), self.spatial_index
+        )
+        fast_predictor.save(path)
 
-        # Calcular estatísticas por mês do dataset real
-        monthly_stats = self._calculate_monthly_stats()
+        print(f"💾 Bundle achatado (NumPy) salvo em {path}")
+        return fast_predictor
+
+    @_profiled('predict_grid', rows_out=lambda self, result: result['risk'].size)
+    def predict_grid(self, bbox=REGION_BBOX, resolution=0.05, dates=None, output_dir=None):
+        """
+        Prediz o risco de fogo numa grade lat/lon para cada data. As features
+        são montadas e avaliadas uma data por vez (em blocos de até
+        GRID_BATCH_ROWS células), então a memória não cresce com a grade.
+
+        Args:
+            bbox: extensão (lon_min, lat_min, lon_max, lat_max) em graus
+            resolution: tamanho da célula em graus
+            dates: datas a prever (default: hoje)
+            output_dir: se informado, cada bloco é gravado no diretório assim
+                que é predito, em formato colunar (grid_risk.json e o binário
+                float32 indicado nele)
+
+        Returns:
+            Dicionário com 'risk' (float32, datas x latitudes x longitudes,
+            norte na primeira linha), 'latitudes', 'longitudes' e 'dates'. Com
+            output_dir, 'risk' é um memmap somente leitura do binário gravado
+        """
+        lon_min, lat_min, lon_max, lat_max = bbox
+        n_lon = int(np.ceil((lon_max - lon_min) / resolution))
+        n_lat = int(np.ceil((lat_max - lat_min) / resolution))
+        dates = pd.DatetimeIndex(dates if dates is not None else [datetime.now()]).normalize()
+
+        print(f"\n🗺️  Gerando grade de risco: {n_lat}x{n_lon} células, {len(dates)} datas...")
+
+        # Centros das células (norte para sul, oeste para leste)
+        longitudes = lon_min + (np.arange(n_lon) + 0.5) * resolution
+        latitudes = lat_max - (np.arange(n_lat) + 0.5) * resolution
+        cell_lat = np.repeat(latitudes, n_lon)
+        cell_lon = np.tile(longitudes, n_lat)
+
+        shape = (len(dates), n_lat, n_lon)
+        blocks = self._grid_blocks(dates, cell_lat, cell_lon)
+        grid = {
+            'latitudes': latitudes,
+            'longitudes': longitudes,
+            'dates': [date.strftime('%Y-%m-%d') for date in dates],
+        }
+
+        if output_dir:
+            writer = OutputWriter(output_dir)
+            manifest_path = writer.column_blocks(
+                'grid_risk', 'risk', blocks, shape, np.float32,
+                axes=['date', 'latitude', 'longitude'],
+                bbox=list(bbox),
+                resolution=resolution,
+                origin='north-west',
+                dates=grid['dates'],
+                risk_level_thresholds=RISK_LEVEL_THRESHOLDS,
+                risk_level_names=RISK_LEVEL_NAMES,
+                models=list(self.models),
+                created_at=datetime.now().isoformat(timespec='seconds'),
+            )
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            entry = manifest['columns'][0]
+            grid['risk'] = np.memmap(
+                writer.path(manifest['file']), dtype=entry['dtype'], mode='r',
+                offset=entry['offset'], shape=shape,
+            )
+
+            print(f"💾 Grade salva em {manifest_path}")
+        else:
+            risk = np.empty(shape, dtype=np.float32).reshape(-1)
+            start = 0
+            for block in blocks:
+                risk[start:start + len(block)] = block
+                start += len(block)
+            grid['risk'] = risk.reshape(shape)
+
+        print("✅ Grade de risco gerada!")
+        return grid
+
+    def _grid_blocks(self, dates, cell_lat, cell_lon):
+        """
+        Gera o risco da grade bloco a bloco (uma data e até GRID_BATCH_ROWS
+        células por bloco), na ordem data, latitude, longitude
+        """
+        n_cells = len(cell_lat)
+        for date in dates:
+            # Estatísticas do mês da data
+            stats = self._stats_for_month(date.month)
+            for start in range(0, n_cells, GRID_BATCH_ROWS):
+                lat = cell_lat[start:start + GRID_BATCH_ROWS]
+                features = pd.DataFrame({
+                    'Mes': date.month,
+                    'Dia': date.day,
+                    'DiaSemana': date.dayofweek,
+                    'Hora': 14,
+                    'DiaSemChuva': stats['DiaSemChuva'],
+                    'Precipitacao': stats['Precipitacao'],
+                    'FRP': stats['FRP'],
+                    'Latitude': lat,
+                    'Longitude': cell_lon[start:start + GRID_BATCH_ROWS],
+                    # Vizinhança de cada célula calculada pelo índice na data
+                    'DataHora': np.full(len(lat), date.to_datetime64()),
+                })
+                result = self.predict_batch(features, use_cache=False)
+                yield result['average_prediction'].to_numpy(dtype=np.float32)
+
+    def _batch_to_records(self, features, result):
+        """
+        Converte a saída de predict_batch em dicionários (formato dos JSONs da API)
+        """
+        records = []
+        for i in range(len(result)):
+            row = result.iloc[i]
+            records.append({
+                'features_used': {
+                    'DiaSemChuva': round(float(features['DiaSemChuva'].iloc[i]), 2),
+                    'Precipitacao': round(float(features['Precipitacao'].iloc[i]), 2),
+                    'FRP': round(float(features['FRP'].iloc[i]), 2),
+                },
+                'predictions': {model_name: float(row[model_name]) for model_name in self.models},
+                'average_prediction': float(row['average_prediction']),
+                'risk_level': row['risk_level']
+            })
+        return records
+
+    def _stats_for_month(self, month):
+        """
+        Estatísticas reais do mês (ou média geral se não houver dados do mês)
+        """
+        return self.monthly_stats.get(month, self.overall_stats)
+
+    @_profiled('predict_year', rows_out=lambda self, result: len(result))
+    def predict_year(self, year=2025, location_data=None):
+        """
+        Prediz risco de fogo para todos os meses do ano usando estatísticas reais do dataset
+
+        Args:
+            year: ano para as predições (default: 2025)
+            location_data: dados da localização (lat, lon, etc)
+
+        Returns:
+            Lista com predições mensais
+        """
+        print(f"\n🔮 Gerando predições mensais para {year}...")
 
         # Nomes dos meses em português
         month_names = {
@@ -412,129 +2183,104 @@ class FireRiskPredictor:
             9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'
         }
 
-        predictions_data = []
-
-        for month in range(1, 13):
-            # Usar estatísticas reais do mês (ou média geral se não houver dados do mês)
-            if month in monthly_stats:
-                stats = monthly_stats[month]
-            else:
-                # Usar média geral do dataset
-                stats = {
-                    'DiaSemChuva': self.df_mossoro['DiaSemChuva'].median(),
-                    'Precipitacao': self.df_mossoro['Precipitacao'].median(),
-                    'FRP': self.df_mossoro['FRP'].median(),
-                    'Latitude': self.df_mossoro['Latitude'].median(),
-                    'Longitude': self.df_mossoro['Longitude'].median(),
-                    'RiscoFogo_medio': self.df_mossoro['RiscoFogo'].mean(),
-                    'count': 0
-                }
-
-            # Features baseadas no mês e estatísticas reais
-            features = {
-                'Mes': month,
-                'Dia': 15,  # Meio do mês
-                'DiaSemana': 3,  # Quarta-feira (valor médio)
-                'Hora': 14,  # Hora do pico (14h)
-                'DiaSemChuva': stats['DiaSemChuva'],
-                'Precipitacao': stats['Precipitacao'],
-                'FRP': stats['FRP'],
-                'Latitude': stats['Latitude'],
-                'Longitude': stats['Longitude'],
-            }
-
-            # Se tiver dados de localização específicos, sobrescrever
-            if location_data:
-                features.update(location_data)
-
-            # Adicionar encoding categórico (usando moda do dataset)
-            features['Bioma_encoded'] = self.df_mossoro['Bioma'].astype('category').cat.codes.mode()[0] if 'Bioma' in self.df_mossoro.columns else 0
-            features['Municipio_encoded'] = self.df_mossoro['Municipio'].astype('category').cat.codes.mode()[0] if 'Municipio' in self.df_mossoro.columns else 0
-
-            # Criar array de features na ordem correta
-            feature_array = np.array([[
-                features['DiaSemChuva'],
-                features['Precipitacao'],
-                features['FRP'],
-                features['Latitude'],
-                features['Longitude'],
-                features['Mes'],
-                features['Dia'],
-                features['DiaSemana'],
-                features['Hora'],
-                features['Bioma_encoded'],
-                features['Municipio_encoded']
-            ]])
-
-            # Normalizar
-            feature_scaled = self.scaler.transform(feature_array)
-
-            # Predições de cada modelo
-            predictions = {}
-            for model_name, model in self.models.items():
-                pred = model.predict(feature_scaled)[0]
-                # Limitar entre 0 e 1 (escala de risco)
-                predictions[model_name] = round(max(0, min(1, pred)), 4)
-
-            # Calcular média das predições para ranking
-            avg_prediction = round(sum(predictions.values()) / len(predictions), 4)
-
-            # Determinar nível de risco
-            if avg_prediction >= 0.8:
-                risk_level = "CRÍTICO"
-            elif avg_prediction >= 0.6:
-                risk_level = "ALTO"
-            elif avg_prediction >= 0.4:
-                risk_level = "MODERADO"
-            elif avg_prediction >= 0.2:
-                risk_level = "BAIXO"
-            else:
-                risk_level = "MÍNIMO"
+        months = list(range(1, 13))
+        stats = [self._stats_for_month(month) for month in months]
+
+        # Features baseadas no mês e estatísticas reais
+        features = pd.DataFrame({
+            'Mes': months,
+            'Dia': 15,  # Meio do mês
+            'DiaSemana': 3,  # Quarta-feira (valor médio)
+            'Hora': 14,  # Hora do pico (14h)
+            'DiaSemChuva': [s['DiaSemChuva'] for s in stats],
+            'Precipitacao': [s['Precipitacao'] for s in stats],
+            'FRP': [s['FRP'] for s in stats],
+            'Latitude': [s['Latitude'] for s in stats],
+            'Longitude': [s['Longitude'] for s in stats],
+            # Vizinhança calculada pelo índice na data de cada predição
+            'DataHora': pd.to_datetime([f'{year}-{month:02d}-15 14:00' for month in months]),
+        })
+
+        # Se tiver dados de localização específicos, sobrescrever
+        if location_data:
+            for name, value in location_data.items():
+                features[name] = value
+
+        result = self.predict_batch(features)
 
+        predictions_data = []
+        for month, month_stats, record in zip(months, stats, self._batch_to_records(features, result)):
             predictions_data.append({
                 'month': month,
                 'month_name': month_names[month],
                 'year': year,
                 'date': f'{year}-{month:02d}-15',
-                'features_used': {
-                    'DiaSemChuva': round(features['DiaSemChuva'], 2),
-                    'Precipitacao': round(features['Precipitacao'], 2),
-                    'FRP': round(features['FRP'], 2),
-                },
+                'features_used': record['features_used'],
                 'historical_data': {
-                    'registros_historicos': stats.get('count', 0),
-                    'risco_medio_historico': round(stats.get('RiscoFogo_medio', 0), 4)
+                    'registros_historicos': month_stats.get('count', 0),
+                    'risco_medio_historico': round(month_stats.get('RiscoFogo_medio', 0), 4)
                 },
-                'predictions': predictions,
-                'average_prediction': avg_prediction,
-                'risk_level': risk_level
+                'predictions': record['predictions'],
+                'average_prediction': record['average_prediction'],
+                'risk_level': record['risk_level']
             })
 
+        if not location_data:
+            self.forecasts[('year', year)] = predictions_data
+
         print("✅ Predições anuais geradas!")
         return predictions_data
 
     def _calculate_monthly_stats(self):
         """
-        Calcula estatísticas por mês do dataset real
+        Calcula estatísticas por mês do dataset real (uma única agregação)
         """
-        monthly_stats = {}
+        grouped = self.df_mossoro.groupby('Mes').agg(
+            **{col: (col, 'median') for col in MONTHLY_MEDIAN_FEATURES},
+            RiscoFogo_medio=('RiscoFogo', 'mean'),
+            count=('RiscoFogo', 'size')
+        )
 
-        for month in range(1, 13):
-            month_data = self.df_mossoro[self.df_mossoro['Mes'] == month]
-
-            if len(month_data) > 0:
-                monthly_stats[month] = {
-                    'DiaSemChuva': month_data['DiaSemChuva'].median(),
-                    'Precipitacao': month_data['Precipitacao'].median(),
-                    'FRP': month_data['FRP'].median(),
-                    'Latitude': month_data['Latitude'].median(),
-                    'Longitude': month_data['Longitude'].median(),
-                    'RiscoFogo_medio': month_data['RiscoFogo'].mean(),
-                    'count': len(month_data)
-                }
+        monthly_stats = {}
+        for month, row in grouped.iterrows():
+            monthly_stats[int(month)] = {
+                **{col: float(row[col]) for col in MONTHLY_MEDIAN_FEATURES},
+                'RiscoFogo_medio': float(row['RiscoFogo_medio']),
+                'count': int(row['count'])
+            }
 
         return monthly_stats
 
+    def update_monthly_stats(self, new_data):
+        """
+        Incorpora novas detecções às estatísticas mensais sem reprocessar o
+        histórico. As medianas vêm de histogramas de largura fixa
+        (MonthlyHistograms), então o custo depende só das linhas novas e do
+        número de faixas, não do tamanho do histórico. São aproximadas: cada
+        mediana atualizada fica a até uma largura de faixa da exata.
+
+        Args:
+            new_data: DataFrame já limpo, com as colunas de df_mossoro
+        """
+        sketches = self.monthly_sketches
+        months = sketches.update(new_data)
+
+        # Recalcular apenas os meses afetados
+        for month in months:
+            self.monthly_stats[month] = {
+                **{col: sketches.median(col, month) for col in MONTHLY_MEDIAN_FEATURES},
+                'RiscoFogo_medio': sketches.risk_mean(month),
+                'count': sketches.count(month)
+            }
+
+        # Média geral a partir do histograma acumulado de todos os meses
+        for col in MONTHLY_MEDIAN_FEATURES:
+            self.overall_stats[col] = sketches.median(col)
+        self.overall_stats['RiscoFogo_medio'] = sketches.risk_mean()
+
+        print(f"✅ Estatísticas mensais atualizadas com {len(new_data)} novas detecções")
+
+    @_profiled('predict_week', rows_out=lambda self, result: len(result))
     def predict_week(self, location_data=None):
         """
         Prediz risco de fogo para os próximos 7 dias usando estatísticas reais do dataset
@@ -547,9 +2293,6 @@ class FireRiskPredictor:
         """
         print("\n🔮 Gerando predições para próxima semana...")
 
-        # Calcular estatísticas por mês do dataset real
-        monthly_stats = self._calculate_monthly_stats()
-
         # Nomes dos dias em português
         day_names_pt = {
             'Monday': 'Segunda-feira',
@@ -564,135 +2307,303 @@ class FireRiskPredictor:
         # Criar dados para próxima semana
         today = datetime.now()
         week_dates = [today + timedelta(days=i) for i in range(7)]
+        stats = [self._stats_for_month(date.month) for date in week_dates]
+
+        # Features baseadas na data e estatísticas reais
+        features = pd.DataFrame({
+            'Mes': [date.month for date in week_dates],
+            'Dia': [date.day for date in week_dates],
+            'DiaSemana': [date.weekday() for date in week_dates],
+            'Hora': 14,
+            'DiaSemChuva': [s['DiaSemChuva'] for s in stats],
+            'Precipitacao': [s['Precipitacao'] for s in stats],
+            'FRP': [s['FRP'] for s in stats],
+            'Latitude': [s['Latitude'] for s in stats],
+            'Longitude': [s['Longitude'] for s in stats],
+            'DataHora': pd.to_datetime([date.replace(hour=14, minute=0, second=0) for date in week_dates]),
+        })
+
+        # Se tiver dados de localização específicos, sobrescrever
+        if location_data:
+            for name, value in location_data.items():
+                features[name] = value
+
+        result = self.predict_batch(features)
 
         predictions_data = []
-
-        for date in week_dates:
-            month = date.month
-
-            # Usar estatísticas reais do mês
-            if month in monthly_stats:
-                stats = monthly_stats[month]
-            else:
-                stats = {
-                    'DiaSemChuva': self.df_mossoro['DiaSemChuva'].median(),
-                    'Precipitacao': self.df_mossoro['Precipitacao'].median(),
-                    'FRP': self.df_mossoro['FRP'].median(),
-                    'Latitude': self.df_mossoro['Latitude'].median(),
-                    'Longitude': self.df_mossoro['Longitude'].median(),
-                    'RiscoFogo_medio': self.df_mossoro['RiscoFogo'].mean(),
-                }
-
-            # Features baseadas na data e estatísticas reais
-            features = {
-                'Mes': date.month,
-                'Dia': date.day,
-                'DiaSemana': date.weekday(),
-                'Hora': 14,
-                'DiaSemChuva': stats['DiaSemChuva'],
-                'Precipitacao': stats['Precipitacao'],
-                'FRP': stats['FRP'],
-                'Latitude': stats['Latitude'],
-                'Longitude': stats['Longitude'],
-            }
-
-            # Se tiver dados de localização específicos, sobrescrever
-            if location_data:
-                features.update(location_data)
-
-            # Adicionar encoding categórico
-            features['Bioma_encoded'] = self.df_mossoro['Bioma'].astype('category').cat.codes.mode()[0] if 'Bioma' in self.df_mossoro.columns else 0
-            features['Municipio_encoded'] = self.df_mossoro['Municipio'].astype('category').cat.codes.mode()[0] if 'Municipio' in self.df_mossoro.columns else 0
-
-            # Criar array de features na ordem correta
-            feature_array = np.array([[
-                features['DiaSemChuva'],
-                features['Precipitacao'],
-                features['FRP'],
-                features['Latitude'],
-                features['Longitude'],
-                features['Mes'],
-                features['Dia'],
-                features['DiaSemana'],
-                features['Hora'],
-                features['Bioma_encoded'],
-                features['Municipio_encoded']
-            ]])
-
-            # Normalizar
-            feature_scaled = self.scaler.transform(feature_array)
-
-            # Predições de cada modelo
-            predictions = {}
-            for model_name, model in self.models.items():
-                pred = model.predict(feature_scaled)[0]
-                predictions[model_name] = round(max(0, min(1, pred)), 4)
-
-            # Calcular média das predições
-            avg_prediction = round(sum(predictions.values()) / len(predictions), 4)
-
-            # Determinar nível de risco
-            if avg_prediction >= 0.8:
-                risk_level = "CRÍTICO"
-            elif avg_prediction >= 0.6:
-                risk_level = "ALTO"
-            elif avg_prediction >= 0.4:
-                risk_level = "MODERADO"
-            elif avg_prediction >= 0.2:
-                risk_level = "BAIXO"
-            else:
-                risk_level = "MÍNIMO"
-
+        for date, record in zip(week_dates, self._batch_to_records(features, result)):
             day_name_en = date.strftime('%A')
             predictions_data.append({
                 'date': date.strftime('%Y-%m-%d'),
                 'day_name': day_names_pt.get(day_name_en, day_name_en),
                 'day_of_week': date.weekday(),
-                'features_used': {
-                    'DiaSemChuva': round(features['DiaSemChuva'], 2),
-                    'Precipitacao': round(features['Precipitacao'], 2),
-                    'FRP': round(features['FRP'], 2),
-                },
-                'predictions': predictions,
-                'average_prediction': avg_prediction,
-                'risk_level': risk_level
+                'features_used': record['features_used'],
+                'predictions': record['predictions'],
+                'average_prediction': record['average_prediction'],
+                'risk_level': record['risk_level']
             })
 
+        if not location_data:
+            self.forecasts[('week', today.strftime('%Y-%m-%d'))] = predictions_data
+
         print("✅ Predições semanais geradas!")
         return predictions_data
 
-    def save_results(self, output_dir='./output'):
+    @_profiled('save_results')
+    def save_results(self, output_dir='./output', year=2025):
         """
-        Salva resultados em JSON para uso na API
+        Salva resultados em JSON para uso na API. Predições anuais e semanais
+        já calculadas nesta versão dos modelos são reaproveitadas; os
+        arquivos são gravados de forma atômica (OutputWriter).
+
+        Args:
+            output_dir: diretório de saída
+            year: ano das predições mensais
         """
-        import os
-        os.makedirs(output_dir, exist_ok=True)
+        writer = OutputWriter(output_dir)
 
         print(f"\n💾 Salvando resultados em {output_dir}...")
 
         # Salvar métricas
-        with open(f'{output_dir}/model_metrics.json', 'w', encoding='utf-8') as f:
-            json.dump(self.metrics, f, indent=2, ensure_ascii=False)
+        writer.json('model_metrics.json', self.metrics)
 
-        # Salvar predições anuais (janeiro a dezembro de 2025)
-        year_predictions = self.predict_year(year=2025)
-        with open(f'{output_dir}/year_predictions.json', 'w', encoding='utf-8') as f:
-            json.dump(year_predictions, f, indent=2, ensure_ascii=False)
+        # Salvar predições anuais (janeiro a dezembro)
+        year_predictions = self.forecasts.get(('year', year)) or self.predict_year(year=year)
+        writer.json('year_predictions.json', year_predictions)
 
         # Salvar predições semanais (próximos 7 dias)
-        week_predictions = self.predict_week()
-        with open(f'{output_dir}/week_predictions.json', 'w', encoding='utf-8') as f:
-            json.dump(week_predictions, f, indent=2, ensure_ascii=False)
+        today = datetime.now().strftime('%Y-%m-%d')
+        week_predictions = self.forecasts.get(('week', today)) or self.predict_week()
+        writer.json('week_predictions.json', week_predictions)
 
         print("✅ Resultados salvos!")
         print(f"   - model_metrics.json")
         print(f"   - year_predictions.json")
         print(f"   - week_predictions.json")
 
-    def plot_comparison(self):
+    @_profiled('save_map_data', rows_in=lambda self, *args, **kwargs: len(self.df_mossoro))
+    def save_map_data(self, output_dir='./output'):
         """
-        Plota gráficos de comparação dos modelos
+        Grava map_data.json para a rota /api/fire-risk/map-data: um registro
+        por município (e por mês dentro dele) com centróide, contagem, risco
+        médio observado, medianas das condições e a predição do ensemble,
+        indexado pelo nome do município. Todas as predições saem de uma única
+        chamada a predict_batch.
+
+        As predições usam o centróide e as medianas do grupo no dia 15 às 14h
+        (como predict_year); o registro do município usa o mês da detecção
+        mais recente.
+
+        Args:
+            output_dir: diretório de saída
+
+        Returns:
+            Dicionário gravado
         """
+        print("\n🗺️  Agregando dados do mapa por município...")
+
+        df = self.df_mossoro.dropna(subset=['Municipio'])
+        aggregations = {
+            'Latitude': ('Latitude', 'mean'),
+            'Longitude': ('Longitude', 'mean'),
+            'risk_mean': ('RiscoFogo', 'mean'),
+            'count': ('RiscoFogo', 'size'),
+            'DiaSemChuva': ('DiaSemChuva', 'median'),
+            'Precipitacao': ('Precipitacao', 'median'),
+            'FRP': ('FRP', 'median'),
+            'Bioma': ('Bioma', 'first'),
+            'last_detection': ('DataHora', 'max'),
+        }
+        by_municipality = df.groupby('Municipio', observed=True).agg(**aggregations).reset_index()
+        by_municipality['Mes'] = by_municipality['last_detection'].dt.month
+        by_month = df.groupby(['Municipio', 'Mes'], observed=True).agg(**aggregations).reset_index()
+
+        groups = pd.concat([by_municipality, by_month], ignore_index=True).assign(Dia=15, DiaSemana=3, Hora=14)
+        result = self.predict_batch(self._encode_features(groups))
+
+        def number(value, digits):
+            return round(float(value), digits) if pd.notna(value) else None
+
+        def entry(group, prediction):
+            return {
+                'latitude': number(group['Latitude'], 5),
+                'longitude': number(group['Longitude'], 5),
+                'count': int(group['count']),
+                'risk_mean': number(group['risk_mean'], 4),
+                'dias_sem_chuva': number(group['DiaSemChuva'], 2),
+                'precipitacao': number(group['Precipitacao'], 2),
+                'frp': number(group['FRP'], 2),
+                'last_detection': group['last_detection'].isoformat(),
+                'predictions': {model_name: float(prediction[model_name]) for model_name in self.models},
+                'average_prediction': float(prediction['average_prediction']),
+                'risk_level': prediction['risk_level'],
+            }
+
+        groups = groups.to_dict('records')
+        predictions = result.to_dict('records')
+        n_municipalities = len(by_municipality)
+
+        municipalities = {}
+        for group, prediction in zip(groups[:n_municipalities], predictions[:n_municipalities]):
+            name = str(group['Municipio']).upper()
+            municipalities[name] = {'municipio': name, **entry(group, prediction), 'months': {}}
+        for group, prediction in zip(groups[n_municipalities:], predictions[n_municipalities:]):
+            municipalities[str(group['Municipio']).upper()]['months'][str(int(group['Mes']))] = entry(group, prediction)
+
+        map_data = {
+            'format_version': 1,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'model_version': self.model_version,
+            'models': list(self.models),
+            'source_rows': len(df),
+            'municipalities': municipalities,
+        }
+        path = OutputWriter(output_dir).json('map_data.json', map_data)
+
+        print(f"✅ Dados do mapa salvos em {path} ({len(municipalities)} municípios)")
+        return map_data
+
+    def save(self, path=BUNDLE_PATH):
+        """
+        Salva o bundle de inferência (scaler, encoders, modelos, ordem das
+        features, índice espacial e estatísticas de referência) para uso sem
+        retreinar
+
+        Args:
+            path: caminho do arquivo do bundle
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        import joblib
+        import sklearn
+
+        bundle = {
+            'format_version': BUNDLE_VERSION,
+            'sklearn_version': sklearn.__version__,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'feature_names': self.feature_names,
+            'scaler': self.scaler,
+            'label_encoders': self.label_encoders,
+            'cleaner': self.cleaner,
+            'models': self.models,
+            'knn_reference': self.knn_reference,
+            'monthly_stats': self.monthly_stats,
+            'monthly_sketches': self.monthly_sketches,
+            'overall_stats': self.overall_stats,
+            'default_features': self.default_features,
+            'spatial_index': self.spatial_index,
+            'metrics': self.metrics,
+            'model_version': self.model_version,
+            'scaler_running': self.scaler_running,
+            'updates_since_rebuild': self.updates_since_rebuild,
+        }
+
+        tmp_path = f'{path}.tmp'
+        joblib.dump(bundle, tmp_path)
+        os.replace(tmp_path, path)
+
+        print(f"💾 Bundle de modelos salvo em {path}")
+
+    @classmethod
+    def load(cls, path=BUNDLE_PATH):
+        """
+        Carrega um bundle salvo por save() e retorna um preditor pronto para
+        predict_year/predict_week, sem ler o CSV nem treinar
+
+        Args:
+            path: caminho do arquivo do bundle
+
+        Returns:
+            Instância de FireRiskPredictor
+        """
+        import joblib
+        import sklearn
+
+        bundle = joblib.load(path)
+
+        # Bundles de outras versões não têm o mesmo conteúdo (nem a mesma
+        # definição das features); não há migração, só retreino
+        if bundle.get('format_version') != BUNDLE_VERSION:
+            raise ValueError(
+                f"Bundle {path} tem versão {bundle.get('format_version')}, "
+                f"esperada {BUNDLE_VERSION}. Treine novamente os modelos."
+            )
+        if bundle['sklearn_version'] != sklearn.__version__:
+            print(f"⚠️  Bundle criado com scikit-learn {bundle['sklearn_version']}, "
+                  f"em uso {sklearn.__version__}")
+
+        predictor = cls()
+        predictor.feature_names = bundle['feature_names']
+        predictor.neighbourhood_features = any(name in predictor.feature_names for name in NEIGHBOURHOOD_FEATURES)
+        predictor.scaler = bundle['scaler']
+        predictor.label_encoders = bundle['label_encoders']
+        predictor.cleaner = bundle['cleaner']
+        predictor.models = bundle['models']
+        predictor.knn_reference = bundle['knn_reference']
+        predictor.monthly_stats = bundle['monthly_stats']
+        predictor.monthly_sketches = bundle['monthly_sketches']
+        predictor.overall_stats = bundle['overall_stats']
+        predictor.default_features = bundle['default_features']
+        predictor.spatial_index = bundle['spatial_index']
+        predictor.metrics = bundle['metrics']
+        predictor.model_version = bundle['model_version']
+        predictor.scaler_running = bundle['scaler_running']
+        predictor.updates_since_rebuild = bundle['updates_since_rebuild']
+
+        return predictor
+
+    @classmethod
+    def load_fast(cls, path=FAST_BUNDLE_PATH):
+        """
+        Carrega o bundle achatado de export_fast_bundle(): predict_batch,
+        predict_year e predict_week funcionam sem importar scikit-learn nem
+        joblib (inicialização rápida para cron e para a API). Não permite
+        retreinar nem atualizar os modelos.
+
+        Args:
+            path: caminho do arquivo .npz
+
+        Returns:
+            Instância de FireRiskPredictor
+        """
+        fast_predictor = FastPredictor.load(path)
+        meta = fast_predictor.meta
+
+        predictor = cls()
+        predictor.feature_names = fast_predictor.feature_names
+        predictor.neighbourhood_features = any(name in predictor.feature_names for name in NEIGHBOURHOOD_FEATURES)
+        predictor.scaler = fast_predictor.scaler
+        predictor.models = fast_predictor.models
+        predictor.default_features = fast_predictor.default_features
+        predictor.spatial_index = fast_predictor.spatial_index
+        # Só as classes de cada encoder (o que _encode_features usa)
+        predictor.label_encoders = {
+            col: SimpleNamespace(classes_=np.asarray(classes, dtype=object))
+            for col, classes in meta['label_classes'].items()
+        }
+        predictor.monthly_stats = {int(month): stats for month, stats in meta['monthly_stats'].items()}
+        predictor.overall_stats = meta['overall_stats']
+        predictor.model_version = meta['model_version']
+
+        # Os modelos já estão achatados; não há o que compilar
+        predictor.compiled_version = predictor.model_version
+
+        return predictor
+
+    def plot_comparison(self, output_dir='./output', show=False):
+        """
+        Plota gráficos de comparação dos modelos. O matplotlib só é importado
+        aqui, com o backend Agg (sem janela) a menos que show seja True.
+
+        Args:
+            output_dir: diretório onde salvar model_comparison.png
+            show: abre a janela interativa após salvar
+        """
+        import matplotlib
+        if not show:
+            matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+
         fig, axes = plt.subplots(2, 2, figsize=(15, 12))
 
         # 1. Comparação de RMSE
@@ -737,66 +2648,1363 @@ class FireRiskPredictor:
         ax4.axvline(x=0, color='red', linestyle='--', alpha=0.5)
 
         plt.tight_layout()
-        plt.savefig('./output/model_comparison.png', dpi=300, bbox_inches='tight')
-        print("\n📊 Gráfico de comparação salvo em: ./output/model_comparison.png")
-        plt.show()
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, 'model_comparison.png')
+        plt.savefig(output_path, dpi=300, bbox_inches='tight')
+        print(f"\n📊 Gráfico de comparação salvo em: {output_path}")
+        if show:
+            plt.show()
+        plt.close(fig)
+
+
+def main(argv=None):
+    """
+    Ponto de entrada com subcomandos (sem subcomando executa train):
 
+        train    pipeline completo: dados, treino, validação, resultados e bundles
+        predict  predições a partir do bundle achatado, sem scikit-learn
+        plot     gráfico de comparação dos modelos de um bundle salvo
+        serve    servidor HTTP de predição (fire_risk_server.py)
+        train-regions
+                 um bundle por estado (ou estado e bioma) num registro
 
-def main():
+    Args:
+        argv: argumentos da linha de comando (default: sys.argv[1:])
     """
-    Função principal para executar o pipeline completo
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Sistema de Predição de Risco de Fogo - Mossoró/RN')
+    subparsers = parser.add_subparsers(dest='command')
+
+    train = subparsers.add_parser('train', help='treina os modelos e grava resultados e bundles')
+    train.add_argument('--data', default='./bdqueimadas.csv', help='CSV do BDQueimadas')
+    train.add_argument('--headless', action='store_true',
+                       help='não gera o gráfico (matplotlib nem é importado)')
+    train.add_argument('--show', action='store_true', help='abre a janela do gráfico')
+    train.add_argument('--out-of-core', action='store_true',
+                       help='matriz de features em disco e treino em blocos (o quadro regional segue em memória)')
+    train.add_argument('--neighbourhood-features', action='store_true',
+                       help='inclui as features de vizinhança do índice espacial nos modelos')
+
+    predict = subparsers.add_parser('predict', help='prediz a partir do bundle achatado')
+    predict.add_argument('--bundle', default=FAST_BUNDLE_PATH, help='bundle de export_fast_bundle()')
+    predict.add_argument('--registry', help='registro de train-regions (cada linha vai ao bundle da sua região; só com --input)')
+    target = predict.add_mutually_exclusive_group(required=True)
+    target.add_argument('--year', type=int, help='predições mensais do ano')
+    target.add_argument('--week', action='store_true', help='predições dos próximos 7 dias')
+    target.add_argument('--input', help="JSON (lista de registros) ou NDJSON com features numéricas; '-' lê da entrada padrão")
+    predict.add_argument('--output', default='-', help="arquivo de saída ('-' para a saída padrão)")
+    predict.add_argument('--format', choices=['json', 'ndjson'], default='json',
+                         help='ndjson grava um registro por linha (para lotes grandes)')
+
+    plot = subparsers.add_parser('plot', help='gráfico de comparação a partir do bundle salvo')
+    plot.add_argument('--bundle', default=BUNDLE_PATH, help='bundle de FireRiskPredictor.save()')
+    plot.add_argument('--data', default='./bdqueimadas.csv', help='CSV usado no treino (refaz o conjunto de teste)')
+    plot.add_argument('--show', action='store_true', help='abre a janela do gráfico')
+
+    regions = subparsers.add_parser('train-regions', help='treina um bundle por região em paralelo')
+    regions.add_argument('--data', default='./bdqueimadas.csv', help='CSV nacional do BDQueimadas')
+    regions.add_argument('--registry', default=REGISTRY_DIR, help='diretório do registro')
+    regions.add_argument('--shard-by', choices=list(SHARD_KEYS), default='state',
+                         help='colunas que definem cada região')
+    regions.add_argument('--states', nargs='+', default=NORTHEAST_STATES, help='estados incluídos')
+    regions.add_argument('--workers', type=int, help='processos de treino (default: um por núcleo)')
+    regions.add_argument('--min-rows', type=int, default=SHARD_MIN_ROWS,
+                         help='regiões com menos linhas não são treinadas')
+
+    # Os argumentos de serve (inclusive --help) seguem para fire_risk_server.py
+    subparsers.add_parser('serve', help='servidor HTTP de predição', add_help=False)
+
+    argv = sys.argv[1:] if argv is None else argv
+    args, extra = parser.parse_known_args(argv or ['train'])
+    if args.command == 'serve':
+        args.server_args = extra
+    elif extra:
+        parser.error(f"argumentos não reconhecidos: {' '.join(extra)}")
+    if args.command == 'predict' and args.registry and not args.input:
+        parser.error('--registry só pode ser usado com --input')
+
+    commands = {
+        'train': _command_train,
+        'predict': _command_predict,
+        'plot': _command_plot,
+        'serve': _command_serve,
+        'train-regions': _command_train_regions,
+    }
+    return commands[args.command](args)
+
+
+def _command_train(args):
+    """
+    Executa o pipeline completo de treino
     """
     print("🔥 Sistema de Predição de Risco de Fogo - Mossoró/RN")
     print("=" * 80)
 
     # Inicializar preditor
-    predictor = FireRiskPredictor(data_path='./bdqueimadas.csv')
+    predictor = FireRiskPredictor(data_path=args.data, neighbourhood_features=args.neighbourhood_features)
 
     # Carregar e preparar dados do CSV real
     predictor.load_and_prepare_data()
 
-    # Preparar features
-    predictor.prepare_features()
-
-    # Treinar modelos
-    predictor.train_neural_network()
-    predictor.train_knn()
-    predictor.train_random_forest()
+    # Preparar features e treinar modelos (fora da memória: matriz em disco,
+    # lida em blocos)
+    if args.out_of_core:
+        predictor.prepare_features(memmap_dir=os.path.join(predictor.cache_dir, 'design'))
+        predictor.train_out_of_core()
+    else:
+        predictor.prepare_features()
+        predictor.train_all(parallel=True)
 
     # Comparar modelos
     predictor.compare_models()
 
+    # Validação temporal (origem deslizante) dos três modelos; cada fold
+    # treina os modelos em memória, então fica de fora no modo out-of-core
+    if not args.out_of_core:
+        predictor.backtest()
+
     # Gerar predições anuais (janeiro a dezembro de 2025)
     predictor.predict_year(year=2025)
 
     # Salvar resultados
     predictor.save_results()
+    predictor.save_map_data()
+
+    # Salvar bundle para predições sem retreino
+    predictor.save()
+    predictor.export_fast_bundle()
+
+    # Salvar medições de tempo/memória das etapas
+    predictor.save_profile()
 
     # Plotar comparação
-    predictor.plot_comparison()
+    if not args.headless:
+        predictor.plot_comparison(show=args.show)
 
     print("\n✅ Pipeline completo executado com sucesso!")
     print("=" * 80)
+    return 0
 
 
-# Método auxiliar para demo
-def _create_demo_data(self):
-    """Cria dados sintéticos para demonstração"""
-    np.random.seed(42)
-    n_samples = 500
+def _command_predict(args):
+    """
+    Prediz a partir do bundle achatado e grava JSON ou NDJSON (arquivo
+    gravado de forma atômica). Com saída na saída padrão, as mensagens de
+    progresso vão para stderr.
+    """
+    with redirect_stdout(sys.stderr) if args.output == '-' else nullcontext():
+        if args.registry:
+            predictor = RegionRegistry(args.registry)
+        else:
+            predictor = FireRiskPredictor.load_fast(args.bundle)
+
+        if args.year is not None:
+            result = predictor.predict_year(year=args.year)
+        elif args.week:
+            result = predictor.predict_week()
+        else:
+            with open(args.input, 'r', encoding='utf-8') if args.input != '-' else nullcontext(sys.stdin) as f:
+                text = f.read()
+            text = text.strip()
+            if text.startswith('['):
+                records = json.loads(text)
+            else:
+                records = [json.loads(line) for line in text.splitlines() if line.strip()]
+            features = pd.DataFrame(records)
+            if not args.registry:
+                features = features.fillna(pd.Series(predictor.default_features))
+            result = predictor.predict_batch(features)
+
+    if args.output == '-':
+        if isinstance(result, pd.DataFrame):
+            result = result.to_dict('records')
+        if args.format == 'ndjson':
+            for record in result:
+                sys.stdout.write(json.dumps(record, ensure_ascii=False) + '\n')
+        else:
+            json.dump(result, sys.stdout, ensure_ascii=False)
+            sys.stdout.write('\n')
+        return 0
+
+    writer = OutputWriter(os.path.dirname(args.output) or '.')
+    name = os.path.basename(args.output)
+    if args.format == 'ndjson':
+        writer.ndjson(name, result)
+    else:
+        writer.json(name, result.to_dict('records') if isinstance(result, pd.DataFrame) else result)
+    return 0
+
+
+def _command_plot(args):
+    """
+    Refaz o conjunto de teste a partir do CSV (mesma divisão do treino),
+    prediz com os modelos do bundle e gera o gráfico de comparação
+    """
+    bundle = FireRiskPredictor.load(args.bundle)
+
+    predictor = FireRiskPredictor(data_path=args.data)
+    predictor.load_and_prepare_data()
+    predictor.prepare_features()
+    predictor.models = bundle.models
+    predictor.metrics = bundle.metrics
+    predictor.predictions = {
+        model_name: model.predict(predictor.X_test_scaled)
+        for model_name, model in predictor.models.items()
+    }
+
+    predictor.plot_comparison(show=args.show)
+    return 0
+
+
+def _command_serve(args):
+    """
+    Inicia o servidor HTTP de predição com os argumentos restantes
+    """
+    import fire_risk_server
+    return fire_risk_server.main(args.server_args)
+
+
+def _command_train_regions(args):
+    """
+    Particiona o CSV nacional e treina um bundle por região
+    """
+    print("🔥 Sistema de Predição de Risco de Fogo - treino por região")
+    print("=" * 80)
+
+    registry = train_regions(
+        args.data,
+        registry_dir=args.registry,
+        shard_by=args.shard_by,
+        states=args.states,
+        n_workers=args.workers,
+        min_rows=args.min_rows,
+    )
+
+    print("\n✅ Registro de regiões gerado com sucesso!")
+    print("=" * 80)
+    return 0 if registry['shards'] else 1
+
+
+def partition_regions(data_path, output_dir, shard_by='state', states=NORTHEAST_STATES,
+                      chunksize=CSV_CHUNKSIZE):
+    """
+    Lê o CSV nacional uma única vez, em blocos, e grava as linhas de cada
+    região num CSV próprio em output_dir
+
+    Args:
+        data_path: CSV do BDQueimadas
+        output_dir: diretório dos CSVs das regiões
+        shard_by: chave de SHARD_KEYS ('state' ou 'state-biome')
+        states: estados mantidos (None para todos)
+        chunksize: linhas por bloco de leitura
+
+    Returns:
+        Dicionário {shard_id: {'keys': {coluna: valor}, 'path': ..., 'rows': ...}}
+    """
+    key_columns = SHARD_KEYS[shard_by]
+    os.makedirs(output_dir, exist_ok=True)
+
+    reader = pd.read_csv(
+        data_path,
+        usecols=lambda col: col in CSV_COLUMNS,
+        dtype=CSV_DTYPES,
+        chunksize=chunksize
+    )
+
+    shards = {}
+    total_rows = 0
+    for chunk in reader:
+        total_rows += len(chunk)
+        if states is not None:
+            chunk = chunk[chunk['Estado'].isin(states)]
+
+        for values, part in chunk.groupby(key_columns, observed=True):
+            values = values if isinstance(values, tuple) else (values,)
+            keys = dict(zip(key_columns, (str(value) for value in values)))
+            shard_id = _shard_id(keys.values())
+
+            shard = shards.setdefault(shard_id, {
+                'keys': keys,
+                'path': os.path.join(output_dir, f'{shard_id}.csv'),
+                'rows': 0,
+            })
+            part.to_csv(shard['path'], mode='a', header=shard['rows'] == 0, index=False)
+            shard['rows'] += len(part)
+
+    print(f"   - {total_rows} linhas lidas, {sum(s['rows'] for s in shards.values())} "
+          f"em {len(shards)} regiões")
+    return shards
+
+
+def train_regions(data_path, registry_dir=REGISTRY_DIR, shard_by='state', states=NORTHEAST_STATES,
+                  n_workers=None, min_rows=SHARD_MIN_ROWS, cache_dir='./cache/regions'):
+    """
+    Treina um bundle achatado por região em um pool de processos e grava o
+    registro (registry.json) usado por RegionRegistry
+
+    Cada processo lê só o CSV da sua região, então a memória por worker
+    acompanha o tamanho da maior região e não o do arquivo nacional. Os
+    núcleos são divididos entre os workers; as regiões maiores são
+    treinadas primeiro.
+
+    Args:
+        data_path: CSV nacional do BDQueimadas
+        registry_dir: diretório do registro (um subdiretório por região)
+        shard_by: chave de SHARD_KEYS ('state' ou 'state-biome')
+        states: estados incluídos (None para todos)
+        n_workers: processos de treino (default: um por núcleo)
+        min_rows: regiões com menos linhas ficam fora do registro
+        cache_dir: cache Parquet das regiões
+
+    Returns:
+        Conteúdo do registry.json
+    """
+    from joblib import Parallel, delayed
+
+    print(f"🗺️  Particionando {data_path} por {'/'.join(SHARD_KEYS[shard_by])}...")
+    os.makedirs(cache_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix='shards_', dir=cache_dir) as partition_dir:
+        shards = partition_regions(data_path, partition_dir, shard_by=shard_by, states=states)
+
+        selected = sorted(
+            (shard_id for shard_id, shard in shards.items() if shard['rows'] >= min_rows),
+            key=lambda shard_id: shards[shard_id]['rows'],
+            reverse=True
+        )
+        skipped = {shard_id: shard['rows'] for shard_id, shard in shards.items() if shard_id not in selected}
+
+        n_workers = max(1, min(n_workers or os.cpu_count() or 1, len(selected) or 1))
+        n_cores = max(1, (os.cpu_count() or 1) // n_workers)
+        print(f"🚀 Treinando {len(selected)} regiões com {n_workers} processos "
+              f"({n_cores} núcleos cada)...")
+
+        start = time.perf_counter()
+        results = Parallel(n_jobs=n_workers, backend='loky')(
+            delayed(_train_shard_worker)(
+                shards[shard_id]['keys'],
+                shards[shard_id]['path'],
+                os.path.join(registry_dir, shard_id),
+                os.path.join(cache_dir, shard_id),
+                n_cores
+            )
+            for shard_id in selected
+        )
+        elapsed = time.perf_counter() - start
+
+    registry = {
+        'format_version': REGISTRY_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'source': os.path.abspath(data_path),
+        'shard_by': SHARD_KEYS[shard_by],
+        'shards': dict(zip(selected, results)),
+        'skipped': skipped,
+        'train_time_s': round(elapsed, 3),
+    }
+    OutputWriter(registry_dir).json('registry.json', registry)
+
+    # Regiões de registros antigos que não existem mais
+    for name in os.listdir(registry_dir):
+        path = os.path.join(registry_dir, name)
+        if os.path.isdir(path) and name not in registry['shards']:
+            shutil.rmtree(path)
+
+    for shard_id, shard in registry['shards'].items():
+        memory = f", pico de {shard['peak_rss_mb']:.0f} MB" if shard['peak_rss_mb'] else ""
+        print(f"   - {shard_id}: {shard['rows']} registros, RMSE "
+              f"{shard['metrics']['random_forest']['rmse']:.4f} (RF), "
+              f"{shard['train_time_s']:.1f}s{memory}")
+    if skipped:
+        print(f"   ⚠️  {len(skipped)} regiões com menos de {min_rows} linhas não treinadas")
+    print(f"💾 Registro salvo em {os.path.join(registry_dir, 'registry.json')} ({elapsed:.1f}s)")
+    return registry
+
+
+def _file_fingerprint(path):
+    """
+    Impressão digital barata de um arquivo grande: tamanho, mtime e hash de
+    blocos do início, meio e fim (evita reler GBs a cada execução)
+    """
+    stat = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{stat.st_size}:{stat.st_mtime_ns}'.encode())
+
+    with open(path, 'rb') as f:
+        for offset in (0, stat.st_size // 2, max(0, stat.st_size - FINGERPRINT_BLOCK)):
+            f.seek(offset)
+            digest.update(f.read(FINGERPRINT_BLOCK))
+
+    return digest.hexdigest()
+
+
+class OutlierCleaner:
+    """
+    Limpeza dos registros do BDQueimadas com limites ajustáveis e
+    reutilizáveis: o sentinela INVALID_VALUE vira NaN, linhas sem target são
+    descartadas e as colunas de OUTLIER_COLS têm os ausentes preenchidos com
+    0 e são limitadas ao intervalo do IQR. fit estima os limites (todos os
+    quartis numa só chamada); transform só os aplica, em O(n).
+    """
+
+    def __init__(self, invalid_value=INVALID_VALUE, invalid_value_cols=INVALID_VALUE_COLS,
+                 outlier_cols=OUTLIER_COLS, iqr_factor=IQR_FACTOR, target='RiscoFogo'):
+        self.invalid_value = invalid_value
+        self.invalid_value_cols = invalid_value_cols
+        self.outlier_cols = outlier_cols
+        self.iqr_factor = iqr_factor
+        self.target = target
+
+    def fit(self, df):
+        self._fit(*self._mask_invalid(df)[:2])
+        return self
+
+    def transform(self, df):
+        """
+        Aplica a limpeza com os limites já ajustados. O target é opcional
+        (lotes de predição): sem ele nenhuma linha é descartada.
+        """
+        return self._apply(df, *self._mask_invalid(df))
+
+    def fit_transform(self, df):
+        values, keep, columns = self._mask_invalid(df)
+        self._fit(values, keep, columns)
+        return self._apply(df, values, keep, columns)
+
+    def _mask_invalid(self, df):
+        """
+        Matriz (float32) das colunas tratadas, com o sentinela já como NaN, e
+        máscara das linhas com target válido
+        """
+        columns = [col for col in dict.fromkeys(self.invalid_value_cols + self.outlier_cols) if col in df.columns]
+        values = df[columns].to_numpy(dtype='float32', copy=True)
+
+        invalid = values == self.invalid_value
+        invalid[:, [col not in self.invalid_value_cols for col in columns]] = False
+        values[invalid] = np.nan
+
+        keep = ~np.isnan(values[:, columns.index(self.target)]) if self.target in columns else None
+        self.report_ = {
+            'invalid_counts': dict(zip(columns, invalid.sum(axis=0).tolist())),
+            'removed_rows': int((~keep).sum()) if keep is not None else 0,
+        }
+        return values, keep, columns
+
+    def _fit(self, values, keep, columns):
+        self.columns_ = [col for col in self.outlier_cols if col in columns]
+        outliers = values[:, [columns.index(col) for col in self.columns_]]
+        if keep is not None:
+            outliers = outliers[keep]
+        outliers = np.nan_to_num(outliers, nan=0.0).astype('float64')
+
+        q1, q3 = np.quantile(outliers, [0.25, 0.75], axis=0)
+        iqr = q3 - q1
+        self.lower_ = q1 - self.iqr_factor * iqr
+        self.upper_ = q3 + self.iqr_factor * iqr
+
+    def _apply(self, df, values, keep, columns):
+        outlier_idx = [columns.index(col) for col in self.columns_ if col in columns]
+        limit_idx = [j for j, col in enumerate(self.columns_) if col in columns]
+
+        block = values[:, outlier_idx]
+        np.nan_to_num(block, copy=False, nan=0.0)
+        np.clip(block, self.lower_[limit_idx], self.upper_[limit_idx], out=block)
+        values[:, outlier_idx] = block
+
+        if keep is not None and not keep.all():
+            df = df[keep]
+            values = values[keep]
+
+        # Manter o dtype compacto (float32) de cada coluna
+        return df.assign(**{
+            col: values[:, j].astype(df[col].dtype, copy=False)
+            for j, col in enumerate(columns)
+        })
+
+    def to_dict(self):
+        """
+        Limites ajustados em formato JSON
+        """
+        return {
+            'invalid_value': self.invalid_value,
+            'invalid_value_cols': self.invalid_value_cols,
+            'iqr_factor': self.iqr_factor,
+            'target': self.target,
+            'limits': {
+                col: [float(lower), float(upper)]
+                for col, lower, upper in zip(self.columns_, self.lower_, self.upper_)
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        limits = data['limits']
+        cleaner = cls(
+            invalid_value=data['invalid_value'],
+            invalid_value_cols=data['invalid_value_cols'],
+            outlier_cols=list(limits),
+            iqr_factor=data['iqr_factor'],
+            target=data['target'],
+        )
+        cleaner.columns_ = list(limits)
+        cleaner.lower_ = np.array([lower for lower, _ in limits.values()])
+        cleaner.upper_ = np.array([upper for _, upper in limits.values()])
+        return cleaner
+
+
+class ApproximateKNNRegressor:
+    """
+    Regressor KNN aproximado com índice IVF: os pontos de treino são
+    agrupados por k-means e cada consulta só é comparada com os pontos dos
+    n_probe grupos de centróide mais próximo. A consulta usa apenas NumPy.
+    """
+
+    def __init__(self, n_neighbors=5, weights='uniform', metric='euclidean',
+                 n_lists=None, n_probe=8, random_state=42):
+        """
+        Args:
+            n_neighbors, weights, metric: mesmos do KNeighborsRegressor
+                (metric: 'euclidean' ou 'manhattan')
+            n_lists: número de grupos do índice (default: raiz do nº de pontos)
+            n_probe: grupos visitados por consulta (mais grupos, mais recall)
+            random_state: semente do k-means
+        """
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.metric = metric
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.random_state = random_state
+
+    def get_params(self):
+        return {
+            'n_neighbors': self.n_neighbors,
+            'weights': self.weights,
+            'metric': self.metric,
+            'n_lists': self.n_lists,
+            'n_probe': self.n_probe,
+            'random_state': self.random_state
+        }
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype='float64')
+        y = np.asarray(y, dtype='float64')
+
+        # Grupos com, em média, pelo menos n_neighbors pontos
+        n_lists = self.n_lists or int(np.sqrt(len(X)))
+        n_lists = max(1, min(n_lists, len(X) // self.n_neighbors))
+
+        from sklearn.cluster import MiniBatchKMeans
+
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, random_state=self.random_state, n_init=3)
+        labels = kmeans.fit_predict(X)
+
+        # Pontos ordenados por grupo: o grupo c ocupa offsets_[c]:offsets_[c + 1]
+        order = np.argsort(labels, kind='stable')
+        self.order_ = order
+        self.centroids_ = kmeans.cluster_centers_
+        self.points_ = X[order]
+        self.targets_ = y[order]
+        self.offsets_ = np.searchsorted(labels[order], np.arange(n_lists + 1))
+        return self
+
+    def extend(self, X, y):
+        """
+        Acrescenta pontos ao índice sem refazer o k-means: cada ponto entra
+        no grupo do centróide mais próximo
+        """
+        X = np.asarray(X, dtype='float64')
+        y = np.asarray(y, dtype='float64')
+
+        n_lists = len(self.centroids_)
+        labels = np.concatenate([
+            np.repeat(np.arange(n_lists), np.diff(self.offsets_)),
+            _pairwise_distances(X, self.centroids_, 'euclidean').argmin(axis=1)
+        ])
+        order = np.argsort(labels, kind='stable')
+
+        n_fitted = len(self.points_)
+        self.order_ = np.concatenate([self.order_, n_fitted + np.arange(len(X))])[order]
+        self.points_ = np.vstack([self.points_, X])[order]
+        self.targets_ = np.concatenate([self.targets_, y])[order]
+        self.offsets_ = np.searchsorted(labels[order], np.arange(n_lists + 1))
+        return self
+
+    def kneighbors(self, X, return_distance=True):
+        """
+        Distâncias e índices (nas linhas do X de treino) dos vizinhos aproximados
+        """
+        dist, positions = self._search(X)
+        idx = self.order_[positions]
+
+        if return_distance:
+            return dist, idx
+        return idx
+
+    def predict(self, X):
+        dist, positions = self._search(X)
+        return _knn_predict_from_graph(dist, self.targets_[positions], self.n_neighbors, self.weights)
+
+    def _search(self, X):
+        """
+        Busca nos grupos visitados; retorna posições em points_ (ordem do índice)
+        """
+        X = np.asarray(X, dtype='float64')
+        k = self.n_neighbors
+        n_probe = min(self.n_probe, len(self.centroids_))
+
+        # Grupos visitados por cada consulta
+        probes = np.argpartition(
+            _pairwise_distances(X, self.centroids_, 'euclidean'), n_probe - 1, axis=1
+        )[:, :n_probe]
+
+        # Consultas agrupadas por grupo visitado (lista invertida)
+        query_ids = np.repeat(np.arange(len(X)), n_probe)
+        lists = probes.ravel()
+        order = np.argsort(lists, kind='stable')
+        query_ids, lists = query_ids[order], lists[order]
+        bounds = np.searchsorted(lists, np.arange(len(self.centroids_) + 1))
+
+        best_dist = np.full((len(X), k), np.inf)
+        best_idx = np.zeros((len(X), k), dtype=np.int64)
+
+        for c in range(len(self.centroids_)):
+            start, end = self.offsets_[c], self.offsets_[c + 1]
+            queries = query_ids[bounds[c]:bounds[c + 1]]
+            if start == end or len(queries) == 0:
+                continue
+
+            dist = _pairwise_distances(X[queries], self.points_[start:end], self.metric)
+            cand_dist = np.concatenate([best_dist[queries], dist], axis=1)
+            cand_idx = np.concatenate(
+                [best_idx[queries], np.broadcast_to(np.arange(start, end), dist.shape)], axis=1
+            )
+
+            top = np.argpartition(cand_dist, k - 1, axis=1)[:, :k]
+            best_dist[queries] = np.take_along_axis(cand_dist, top, axis=1)
+            best_idx[queries] = np.take_along_axis(cand_idx, top, axis=1)
+
+        order = np.argsort(best_dist, axis=1)
+        return np.take_along_axis(best_dist, order, axis=1), np.take_along_axis(best_idx, order, axis=1)
+
+
+class PredictionCache:
+    """
+    Cache LRU com validade (TTL) das predições dos modelos, por linha de
+    features quantizada. A chave inclui a versão dos modelos, então
+    predições de um treino anterior nunca são reaproveitadas.
+    """
+
+    def __init__(self, max_size=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL):
+        """
+        Args:
+            max_size: número máximo de linhas guardadas (0 desativa o cache)
+            ttl: segundos até uma predição expirar (None: sem expiração)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, keys):
+        """
+        Valores das chaves (None para ausentes ou expiradas)
+        """
+        now = time.monotonic()
+        values = []
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < now:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                values.append(None)
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                values.append(entry[1])
+        return values
+
+    def put_many(self, keys, values):
+        """
+        Guarda os valores e descarta os menos usados além de max_size
+        """
+        if self.max_size <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else float('inf')
+        for key, value in zip(keys, values):
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        """
+        Contadores do cache (formato JSON)
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl_s': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class MonthlyHistograms:
+    """
+    Histogramas mescláveis de largura fixa por mês e feature, para as
+    medianas mensais incrementais. As faixas cobrem o intervalo visto no
+    fit (valores fora dele caem na primeira ou na última faixa), então o
+    tamanho é fixo: 13 x n_bins contagens por feature. A linha 0 acumula
+    todos os meses e é atualizada junto com os meses afetados.
+    """
+
+    def __init__(self, columns=MONTHLY_MEDIAN_FEATURES, n_bins=MONTHLY_MEDIAN_BINS):
+        """
+        Args:
+            columns: features resumidas
+            n_bins: faixas de cada histograma
+        """
+        self.columns = list(columns)
+        self.n_bins = n_bins
+        self.low = {}
+        self.width = {}
+        self.counts = {}
+        self.rows = np.zeros(13, dtype=np.int64)
+        self.risk_sum = np.zeros(13)
+
+    def fit(self, df):
+        """
+        Define as faixas pelo mínimo e máximo de cada feature em df e
+        acumula suas linhas
+        """
+        for col in self.columns:
+            values = df[col].to_numpy(dtype='float64')
+            finite = values[np.isfinite(values)]
+            low, high = (float(finite.min()), float(finite.max())) if finite.size else (0.0, 1.0)
+            self.low[col] = low
+            self.width[col] = (high - low) / self.n_bins if high > low else 1.0 / self.n_bins
+            self.counts[col] = np.zeros((13, self.n_bins), dtype=np.int64)
+        self.update(df)
+        return self
+
+    def update(self, df):
+        """
+        Acumula as linhas de df (custo proporcional a len(df) e a n_bins)
+
+        Returns:
+            Meses (int) presentes em df
+        """
+        months = df['Mes'].to_numpy(dtype=np.int64)
+        rows = np.bincount(months, minlength=13)
+        risk = np.bincount(months, weights=np.nan_to_num(df['RiscoFogo'].to_numpy(dtype='float64')), minlength=13)
+        self.rows += rows
+        self.risk_sum += risk
+        self.rows[0] += rows[1:].sum()
+        self.risk_sum[0] += risk[1:].sum()
+
+        for col in self.columns:
+            values = df[col].to_numpy(dtype='float64')
+            valid = np.isfinite(values)
+            bins = np.clip(((values[valid] - self.low[col]) // self.width[col]).astype(np.int64), 0, self.n_bins - 1)
+            added = np.bincount(months[valid] * self.n_bins + bins, minlength=13 * self.n_bins)
+            added = added.reshape(13, self.n_bins)
+            self.counts[col] += added
+            self.counts[col][0] += added[1:].sum(axis=0)
+
+        return [int(month) for month in np.flatnonzero(rows[1:]) + 1]
+
+    def count(self, month=None):
+        return int(self.rows[month or 0])
+
+    def risk_mean(self, month=None):
+        return float(self.risk_sum[month or 0] / max(self.rows[month or 0], 1))
+
+    def median(self, col, month=None):
+        """
+        Mediana aproximada (centro da faixa; média das duas faixas centrais
+        quando a contagem é par, como no pandas) de um mês ou de todos
+        """
+        cumulative = self.counts[col][month or 0].cumsum()
+        total = cumulative[-1]
+        if total == 0:
+            return float('nan')
+        lower = np.searchsorted(cumulative, (total - 1) // 2, side='right')
+        upper = np.searchsorted(cumulative, total // 2, side='right')
+        return float(self.low[col] + ((lower + upper) / 2 + 0.5) * self.width[col])
+
+
+class OutputWriter:
+    """
+    Grava os arquivos de saída de forma atômica: cada arquivo é escrito num
+    temporário do mesmo diretório e renomeado no final, então quem lê (as
+    rotas do Next.js, o servidor) nunca vê um arquivo pela metade
+    """
+
+    def __init__(self, output_dir='./output'):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.output_dir, name)
+
+    @contextmanager
+    def open(self, name, mode='w'):
+        """
+        Arquivo temporário que substitui output_dir/name ao fechar sem erro
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.output_dir, prefix=f'.{name}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, mode, **({} if 'b' in mode else {'encoding': 'utf-8'})) as f:
+                yield f
+            # mkstemp cria com 0600; os leitores podem rodar com outro usuário
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.path(name))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def json(self, name, data, indent=None):
+        """
+        JSON compacto (sem indentação) ou, com indent, indentado para leitura
+        """
+        with self.open(name) as f:
+            if indent is None:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            else:
+                json.dump(data, f, ensure_ascii=False, indent=indent)
+        return self.path(name)
+
+    def ndjson(self, name, records):
+        """
+        Um objeto JSON por linha, gravado à medida que é gerado
+
+        Args:
+            name: nome do arquivo
+            records: DataFrame (convertido em blocos de NDJSON_CHUNK_ROWS
+                linhas) ou iterável de dicionários
+        """
+        with self.open(name) as f:
+            if isinstance(records, pd.DataFrame):
+                for start in range(0, len(records), NDJSON_CHUNK_ROWS):
+                    chunk = records.iloc[start:start + NDJSON_CHUNK_ROWS]
+                    f.write(chunk.to_json(orient='records', lines=True, force_ascii=False))
+            else:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False))
+                    f.write('\n')
+        return self.path(name)
+
+    def columns(self, name, columns, **meta):
+        """
+        Grava arrays NumPy num binário colunar (little-endian, uma coluna após
+        a outra, alinhadas em COLUMNS_ALIGNMENT bytes) e o manifesto
+        <name>.json com dtype, shape e offset de cada coluna. Colunas de texto
+        viram códigos inteiros com a lista de categorias no manifesto.
+
+        O binário tem um nome novo a cada gravação e o manifesto é trocado por
+        último: quem leu o manifesto anterior ainda encontra o binário dele.
+
+        Args:
+            name: prefixo dos arquivos
+            columns: dicionário nome -> array
+            **meta: campos extras do manifesto
+
+        Returns:
+            Caminho do manifesto
+        """
+        data_name = f'{name}.{uuid.uuid4().hex[:12]}.bin'
+
+        entries = []
+        offset = 0
+        with self.open(data_name, 'wb') as f:
+            for column, values in columns.items():
+                values = np.asarray(values)
+                entry = {'name': column}
+                if values.dtype.kind in 'OUS':
+                    codes, categories = pd.factorize(values.ravel(), sort=True)
+                    values = codes.reshape(values.shape).astype(np.uint8 if len(categories) <= 256 else np.int32)
+                    entry['categories'] = categories.tolist()
+                values = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<'))
+
+                f.write(values.data)
+                entry.update(dtype=values.dtype.str, shape=list(values.shape), offset=offset, nbytes=values.nbytes)
+                entries.append(entry)
+
+                padding = -(offset + values.nbytes) % COLUMNS_ALIGNMENT
+                f.write(b'\0' * padding)
+                offset += values.nbytes + padding
+
+        return self._publish(name, data_name, entries, meta)
+
+    def column_blocks(self, name, column, blocks, shape, dtype, **meta):
+        """
+        Como columns, para uma única coluna numérica gravada à medida que os
+        blocos são gerados, sem manter o array inteiro em memória
+
+        Args:
+            name: prefixo dos arquivos
+            column: nome da coluna
+            blocks: iterável de arrays que, concatenados, formam a coluna
+            shape: shape final da coluna
+            dtype: dtype numérico da coluna
+            **meta: campos extras do manifesto
+
+        Returns:
+            Caminho do manifesto
+        """
+        dtype = np.dtype(dtype).newbyteorder('<')
+        data_name = f'{name}.{uuid.uuid4().hex[:12]}.bin'
+        expected = int(np.prod(shape))
+
+        written = 0
+        with self.open(data_name, 'wb') as f:
+            for block in blocks:
+                block = np.ascontiguousarray(block, dtype=dtype).ravel()
+                f.write(block.data)
+                written += block.size
+            if written != expected:
+                raise ValueError(f"Coluna {column}: {written} valores gerados, shape {tuple(shape)} exige {expected}")
+
+        entries = [{'name': column, 'dtype': dtype.str, 'shape': list(shape), 'offset': 0,
+                    'nbytes': expected * dtype.itemsize}]
+        return self._publish(name, data_name, entries, meta)
+
+    def _publish(self, name, data_name, entries, meta):
+        """
+        Troca o manifesto <name>.json para apontar para data_name e apaga os
+        binários que nem ele nem o manifesto anterior referenciam
+        """
+        manifest_name = f'{name}.json'
+        previous = None
+        if os.path.exists(self.path(manifest_name)):
+            try:
+                with open(self.path(manifest_name), 'r', encoding='utf-8') as f:
+                    previous = json.load(f).get('file')
+            except (OSError, ValueError):
+                pass
+
+        self.json(manifest_name, {'format': 'columns', 'file': data_name, 'columns': entries, **meta})
+
+        # Mantém só o binário atual e o do manifesto anterior
+        for file_name in os.listdir(self.output_dir):
+            if (file_name.startswith(f'{name}.') and file_name.endswith('.bin')
+                    and file_name not in (data_name, previous)):
+                os.unlink(self.path(file_name))
+
+        return self.path(manifest_name)
+
+
+class RegionRegistry:
+    """
+    Bundles achatados por região (train_regions): cada linha é encaminhada
+    ao bundle do seu estado/bioma ou, sem essas colunas, ao da região de
+    centróide mais próximo. No máximo max_loaded bundles ficam em memória
+    (os menos usados são descartados).
+    """
+
+    def __init__(self, registry_dir=REGISTRY_DIR, max_loaded=REGISTRY_MAX_LOADED):
+        with open(os.path.join(registry_dir, 'registry.json'), 'r', encoding='utf-8') as f:
+            registry = json.load(f)
+        if registry.get('format_version') != REGISTRY_VERSION:
+            raise ValueError(
+                f"Registro de regiões na versão {registry.get('format_version')}; "
+                f"esperada {REGISTRY_VERSION}"
+            )
+
+        self.registry_dir = registry_dir
+        self.max_loaded = max_loaded
+        self.shard_by = registry['shard_by']
+        self.shards = registry['shards']
+        self.loaded = OrderedDict()
+
+        self._shard_ids = list(self.shards)
+        self._by_keys = {
+            tuple(shard['keys'][col] for col in self.shard_by): shard_id
+            for shard_id, shard in self.shards.items()
+        }
+        self._centroids = np.array([shard['centroid'] for shard in self.shards.values()]).reshape(-1, 2)
+
+    def predictor(self, shard_id):
+        """
+        FireRiskPredictor (bundle achatado) de uma região
+        """
+        if shard_id in self.loaded:
+            self.loaded.move_to_end(shard_id)
+            return self.loaded[shard_id]
+
+        with redirect_stdout(sys.stderr):
+            predictor = FireRiskPredictor.load_fast(
+                os.path.join(self.registry_dir, self.shards[shard_id]['bundle'])
+            )
+        self.loaded[shard_id] = predictor
+        while len(self.loaded) > self.max_loaded:
+            self.loaded.popitem(last=False)
+        return predictor
+
+    def route(self, features):
+        """
+        Região de cada linha de features: pelas colunas do registro (Estado,
+        Bioma) quando preenchidas, senão pelo centróide mais próximo da
+        Latitude/Longitude; NaN quando não há como decidir
+
+        Returns:
+            Array (object) com o shard_id de cada linha
+        """
+        shards = pd.Series(None, index=range(len(features)), dtype=object)
+        unkeyed = np.ones(len(features), dtype=bool)
+        if all(col in features.columns for col in self.shard_by):
+            keys = zip(*(features[col].astype(str).to_numpy() for col in self.shard_by))
+            shards[:] = [self._by_keys.get(key) for key in keys]
+            unkeyed = features[self.shard_by].isna().any(axis=1).to_numpy()
+
+        # Centróide só para linhas sem as colunas do registro (um estado fora
+        # do registro não é atribuído a uma região vizinha)
+        if len(self._centroids) and {'Latitude', 'Longitude'} <= set(features.columns):
+            coords = features[['Latitude', 'Longitude']].to_numpy(dtype='float64')
+            missing = unkeyed & ~np.isnan(coords).any(axis=1)
+            if missing.any():
+                nearest = _pairwise_distances(coords[missing], self._centroids, 'euclidean').argmin(axis=1)
+                shards[missing] = np.array(self._shard_ids, dtype=object)[nearest]
+
+        return shards.to_numpy()
+
+    def predict_batch(self, features):
+        """
+        Prediz cada linha com o bundle da sua região; as linhas de uma mesma
+        região vão num único predict_batch. Categóricas brutas (Bioma,
+        Municipio) são codificadas com os encoders da região.
+
+        Returns:
+            DataFrame de FireRiskPredictor.predict_batch, na ordem de
+            features, com a coluna shard (linhas sem região ficam com NaN)
+        """
+        shards = self.route(features)
+        codes, shard_ids = pd.factorize(shards)
+
+        parts = []
+        for code, shard_id in enumerate(shard_ids):
+            rows = np.flatnonzero(codes == code)
+            predictor = self.predictor(shard_id)
+            part = predictor.predict_batch(predictor._encode_features(features.iloc[rows]))
+            part.index = rows
+            parts.append(part.assign(shard=shard_id))
+
+        columns = list(parts[0].columns) if parts else ['average_prediction', 'risk_level', 'shard']
+        result = pd.concat(parts).reindex(range(len(features))) if parts else pd.DataFrame(
+            index=range(len(features)), columns=columns
+        )
+        result.index = features.index
+        return result[columns]
+
+
+def _quantize(values, resolution):
+    """
+    Arredonda os valores para o múltiplo mais próximo de resolution (float64)
+    """
+    values = np.asarray(values, dtype='float64')
+    # + 0.0 normaliza -0.0, para que a mesma linha gere sempre os mesmos bytes
+    return np.round(values / resolution) * resolution + 0.0
+
+
+def _pairwise_distances(A, B, metric):
+    """
+    Matriz de distâncias (euclidiana ou manhattan) entre as linhas de A e B
+    """
+    if metric == 'euclidean':
+        sq = (A ** 2).sum(axis=1)[:, None] + (B ** 2).sum(axis=1)[None, :] - 2 * A @ B.T
+        return np.sqrt(np.maximum(sq, 0))
+    if metric == 'manhattan':
+        dist = np.zeros((len(A), len(B)))
+        for j in range(A.shape[1]):
+            dist += np.abs(A[:, j][:, None] - B[:, j][None, :])
+        return dist
+    raise ValueError(f"Métrica não suportada: {metric}")
+
+
+def _make_knn(backend, params, **options):
+    """
+    Cria o regressor KNN do backend escolhido com os hiperparâmetros da busca
+    """
+    if backend == 'approximate':
+        return ApproximateKNNRegressor(**params, **options)
+
+    from sklearn.neighbors import KNeighborsRegressor
+    return KNeighborsRegressor(algorithm=backend, **params, **options)
+
+
+def _label_values(series):
+    """
+    Valores distintos de uma coluna categórica, como texto (NaN vira 'nan',
+    como em astype(str)); para o dtype category usa só as categorias
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        values = series.cat.remove_unused_categories().cat.categories.astype(str).tolist()
+        return values + ['nan'] if series.isna().any() else values
+    return series.astype(str).unique()
+
+
+def _encode_labels(series, encoder):
+    """
+    Códigos do LabelEncoder para uma coluna; no dtype category cada
+    categoria é codificada uma vez e as linhas só consultam a tabela
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return encoder.transform(series.astype(str))
+
+    categories = series.cat.categories.astype(str)
+    used = series.cat.codes.to_numpy()
+    lookup = np.full(len(categories) + 1, -1, dtype=np.intp)
+    present = np.unique(used[used >= 0])
+    lookup[present] = encoder.transform(categories[present])
+    if (used < 0).any():
+        lookup[-1] = encoder.transform(['nan'])[0]
+    return lookup[used]
+
+
+def _extend_knn(knn, reference, X, y):
+    """
+    Acrescenta pontos ao conjunto de referência de um KNN já treinado, sem
+    nova busca de parâmetros. O KNeighborsRegressor é refeito (mesmos
+    hiperparâmetros) sobre a referência guardada mais as linhas novas.
+
+    Returns:
+        (modelo, nova referência)
+    """
+    if isinstance(knn, ApproximateKNNRegressor):
+        return knn.extend(X, y), reference
+
+    from sklearn.base import clone
+
+    X_ref = np.vstack([reference[0], X])
+    y_ref = np.concatenate([reference[1], y])
+    return clone(knn).fit(X_ref, y_ref), (X_ref, y_ref)
+
+
+def _core_budget(n_cores):
+    """
+    Divide os núcleos entre os modelos: a MLP usa um, o restante vai para a
+    busca do KNN e para as árvores do Random Forest
+    """
+    remaining = max(1, n_cores - 1)
+    knn_cores = max(1, remaining // 3)
+    return {
+        'neural_network': 1,
+        'knn': knn_cores,
+        'random_forest': max(1, remaining - knn_cores),
+    }
+
+
+def _row_blocks(start, stop, block_rows):
+    """
+    Intervalos [início, fim) de até block_rows linhas cobrindo [start, stop)
+    """
+    return [(first, min(first + block_rows, stop)) for first in range(start, stop, block_rows)]
+
+
+def _train_model_worker(model_key, design_path, target_path, n_train, feature_names, cache_dir, n_cores):
+    """
+    Treina um modelo em um processo separado, lendo a matriz de features com
+    memory mapping e limitando as threads de BLAS/OpenMP ao orçamento de núcleos
+    """
+    predictor = FireRiskPredictor(cache_dir=cache_dir)
+    predictor.feature_names = feature_names
+    predictor.n_train = n_train
+    predictor.X_design = np.load(design_path, mmap_mode='r')
+    predictor.y_design = np.load(target_path, mmap_mode='r')
+    predictor.X_train_scaled = predictor.X_design[:n_train]
+    predictor.X_test_scaled = predictor.X_design[n_train:]
+    predictor.y_train = predictor.y_design[:n_train]
+    predictor.y_test = predictor.y_design[n_train:]
+
+    trainer = getattr(predictor, MODEL_TRAINERS[model_key])
+    from threadpoolctl import threadpool_limits
+
+    with threadpool_limits(limits=n_cores):
+        if model_key == 'neural_network':
+            trainer()
+        else:
+            trainer(n_jobs=n_cores)
+
+    return (
+        predictor.models[model_key],
+        predictor.predictions[model_key],
+        predictor.metrics[model_key],
+        predictor.profile
+    )
+
+
+def _backtest_worker(model_key, design_path, target_path, n_train, feature_names, cache_dir, n_cores):
+    """
+    Treina um modelo num fold do backtest e devolve só as predições do teste
+    """
+    _, y_pred_test, _, _ = _train_model_worker(
+        model_key, design_path, target_path, n_train, feature_names, cache_dir, n_cores
+    )
+    return np.asarray(y_pred_test)
+
+
+def _shard_id(values):
+    """
+    Identificador ASCII de uma região ('RIO GRANDE DO NORTE', 'Caatinga' ->
+    'rio-grande-do-norte__caatinga'), usado como nome de diretório
+    """
+    slugs = []
+    for value in values:
+        ascii_value = unicodedata.normalize('NFKD', str(value)).encode('ascii', 'ignore').decode()
+        slugs.append('-'.join(''.join(c if c.isalnum() else ' ' for c in ascii_value.lower()).split()))
+    return '__'.join(slugs)
+
+
+def _train_shard_worker(keys, csv_path, shard_dir, cache_dir, n_cores):
+    """
+    Treina os modelos de uma região num processo separado e grava o bundle
+    achatado em shard_dir; as mensagens do pipeline vão para train.log
+    """
+    from threadpoolctl import threadpool_limits
+
+    os.makedirs(shard_dir, exist_ok=True)
+    start = time.perf_counter()
+    with open(os.path.join(shard_dir, 'train.log'), 'w', encoding='utf-8') as log, \
+            redirect_stdout(log), threadpool_limits(limits=n_cores):
+        predictor = FireRiskPredictor(
+            data_path=csv_path,
+            cache_dir=cache_dir,
+            region={col: [value] for col, value in keys.items()}
+        )
+        predictor.load_and_prepare_data()
+        predictor.prepare_features()
+        predictor.train_all(parallel=False, n_cores=n_cores)
+        predictor.export_fast_bundle(os.path.join(shard_dir, 'model_bundle_fast.npz'))
+
+    latitude = predictor.df_mossoro['Latitude'].astype('float64')
+    longitude = predictor.df_mossoro['Longitude'].astype('float64')
+    return {
+        'keys': keys,
+        'bundle': os.path.join(os.path.basename(shard_dir), 'model_bundle_fast.npz'),
+        'model_version': predictor.model_version,
+        'rows': len(predictor.df_mossoro),
+        'centroid': [round(float(latitude.mean()), 5), round(float(longitude.mean()), 5)],
+        'bbox': [round(float(latitude.min()), 5), round(float(longitude.min()), 5),
+                 round(float(latitude.max()), 5), round(float(longitude.max()), 5)],
+        'metrics': {model_name: metrics['test'] for model_name, metrics in predictor.metrics.items()},
+        'train_time_s': round(time.perf_counter() - start, 3),
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def _regression_metrics(y_true, y_pred):
+    """
+    RMSE, MAE e R² (None com menos de duas amostras) e o número de amostras
+    """
+    from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+
+    return {
+        'rmse': float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        'mae': float(mean_absolute_error(y_true, y_pred)),
+        'r2': float(r2_score(y_true, y_pred)) if len(y_true) > 1 else None,
+        'n': int(len(y_true)),
+    }
+
+
+def _remove_stale_dirs(root, keep):
+    """
+    Remove os subdiretórios de root, exceto keep (folds de execuções antigas)
+    """
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.isdir(path) and path != keep:
+            for file_name in os.listdir(path):
+                os.remove(os.path.join(path, file_name))
+            os.rmdir(path)
+
+
+def _knn_fold_graph(X, y, train_idx, val_idx, metric, k):
+    """
+    Distâncias e alvos dos k vizinhos mais próximos de cada ponto de
+    validação de um fold
+    """
+    from sklearn.neighbors import NearestNeighbors
+
+    nn = NearestNeighbors(n_neighbors=min(k, len(train_idx)), metric=metric)
+    nn.fit(X[train_idx])
+    dist, idx = nn.kneighbors(X[val_idx])
+    return dist, y[train_idx][idx], y[val_idx]
+
+
+def _knn_predict_from_graph(dist, neighbor_y, k, weights):
+    """
+    Predição do KNeighborsRegressor a partir dos k primeiros vizinhos de um
+    grafo já calculado (mesma regra de pesos do scikit-learn)
+    """
+    dist = dist[:, :k]
+    neighbor_y = neighbor_y[:, :k]
+
+    if weights == 'uniform':
+        return neighbor_y.mean(axis=1)
+
+    # Pontos a distância zero recebem todo o peso
+    with np.errstate(divide='ignore'):
+        w = 1.0 / dist
+    inf_mask = np.isinf(w)
+    inf_rows = inf_mask.any(axis=1)
+    w[inf_rows] = inf_mask[inf_rows]
+    return (w * neighbor_y).sum(axis=1) / w.sum(axis=1)
+
+
+def create_synthetic_bdqueimadas(n_samples, seed=42, start='2024-01-01', end=None, freq='6h'):
+    """
+    Gera dados sintéticos no formato do BDQueimadas (RiscoFogo correlacionado
+    com dias sem chuva, precipitação e FRP)
+
+    Args:
+        n_samples: número de registros
+        seed: semente do gerador aleatório
+        start, end, freq: datas dos registros; com end, os registros são
+            distribuídos uniformemente entre start e end (ignora freq)
+
+    Returns:
+        DataFrame com as colunas do CSV do BDQueimadas
+    """
+    rng = np.random.RandomState(seed)
+
+    if end is not None:
+        dates = pd.date_range(start=start, end=end, periods=n_samples)
+    else:
+        dates = pd.date_range(start=start, periods=n_samples, freq=freq)
 
     data = {
-        'DataHora': pd.date_range(start='2024-01-01', periods=n_samples, freq='6H'),
+        'DataHora': dates,
         'Satelite': ['AQUA_M-T'] * n_samples,
         'Pais': ['Brasil'] * n_samples,
         'Estado': ['RIO GRANDE DO NORTE'] * n_samples,
-        'Municipio': np.random.choice(['MOSSORÓ', 'NATAL', 'PARNAMIRIM'], n_samples),
+        'Municipio': rng.choice(['MOSSORÓ', 'NATAL', 'PARNAMIRIM'], n_samples),
         'Bioma': ['Caatinga'] * n_samples,
-        'DiaSemChuva': np.random.randint(0, 30, n_samples),
-        'Precipitacao': np.random.exponential(2, n_samples),
-        'FRP': np.random.gamma(2, 10, n_samples),
-        'Latitude': np.random.uniform(-6, -5, n_samples),
-        'Longitude': np.random.uniform(-38, -37, n_samples),
+        'DiaSemChuva': rng.randint(0, 30, n_samples),
+        'Precipitacao': rng.exponential(2, n_samples),
+        'FRP': rng.gamma(2, 10, n_samples),
+        'Latitude': rng.uniform(-6, -5, n_samples),
+        'Longitude': rng.uniform(-38, -37, n_samples),
     }
 
     # RiscoFogo baseado em outras variáveis (correlação realista)
@@ -804,10 +4012,16 @@ def _create_demo_data(self):
         0.3 * data['DiaSemChuva'] / 30 +
         0.3 * (10 - np.minimum(data['Precipitacao'], 10)) / 10 +
         0.2 * data['FRP'] / 100 +
-        0.2 * np.random.random(n_samples)
+        0.2 * rng.random_sample(n_samples)
     ) * 100
 
-    self.df_mossoro = pd.DataFrame(data)
+    return pd.DataFrame(data)
+
+
+# Método auxiliar para demo
+def _create_demo_data(self):
+    """Cria dados sintéticos para demonstração"""
+    self.df_mossoro = create_synthetic_bdqueimadas(500)
     self.df = self.df_mossoro.copy()
 
     # Extrair features temporais
@@ -824,5 +4038,8 @@ FireRiskPredictor._create_demo_data = _create_demo_data
 
 
 if __name__ == "__main__":
-    main()
+    # Executar pelo módulo importado: assim as classes gravadas no bundle
+    # ficam referenciadas como fire_risk_prediction.* e não como __main__.*
+    import fire_risk_prediction
+    sys.exit(fire_risk_prediction.main())
 
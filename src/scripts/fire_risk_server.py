@@ -0,0 +1,463 @@
+"""
+Servidor de Predição de Risco de Fogo
+Carrega o bundle de modelos uma única vez e atende a API do Next.js por HTTP
+(TCP local ou socket Unix). Requisições concorrentes de /predict são
+agrupadas em micro-lotes e avaliadas numa única chamada de predict_batch.
+
+Uso:
+    python fire_risk_server.py                            # 127.0.0.1:8765
+    python fire_risk_server.py --port 9000 --max-wait-ms 5
+    python fire_risk_server.py --unix /tmp/fire_risk.sock
+
+Rotas:
+    GET  /health               status e informações do bundle
+    GET  /metrics              métricas dos modelos (model_metrics.json)
+    GET  /predictions/year     predições mensais (?year=2025)
+    GET  /predictions/week     predições dos próximos 7 dias
+    POST /predict              {"instances": [{"Latitude": ..., "Longitude": ..., ...}]}
+    GET  /detections/nearby    detecções históricas perto de um ponto
+                               (?lat=&lon=&radius_km=10 ou &k=20, &days=30)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from fire_risk_prediction import (
+    BUNDLE_PATH, NEARBY_MAX_RESULTS, NEIGHBOURHOOD_FEATURES, NEIGHBOURHOOD_RADIUS_KM, PREDICTION_CACHE_RESOLUTION,
+    FireRiskPredictor
+)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Micro-lotes: espera máxima para juntar requisições e linhas por chamada
+MAX_WAIT_MS = 2
+MAX_BATCH_ROWS = 4096
+
+# Limites de uma requisição HTTP
+MAX_BODY_BYTES = 1 << 20
+MAX_INSTANCES = 10_000
+READ_TIMEOUT_S = 30
+
+# Registros de profile mantidos em memória pelo servidor
+PROFILE_HISTORY = 1000
+
+
+class MicroBatcher:
+    """
+    Agrupa pedidos de predição concorrentes em lotes. Cada pedido entra numa
+    fila com um future; o laço do lote espera até MAX_WAIT_MS por mais pedidos
+    (ou até MAX_BATCH_ROWS linhas) e chama predict_batch uma vez no executor.
+    """
+
+    def __init__(self, predictor, executor, max_wait_ms=MAX_WAIT_MS, max_batch_rows=MAX_BATCH_ROWS):
+        self.predictor = predictor
+        self.executor = executor
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_rows = max_batch_rows
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def predict(self, features):
+        """
+        Enfileira um DataFrame de features e aguarda as predições dele
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((features, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            rows = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+
+            # Juntar o que chegar dentro da janela
+            while rows < self.max_batch_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                rows += len(item[0])
+
+            pending = [(features, future) for features, future in pending if not future.cancelled()]
+            if not pending:
+                continue
+
+            batch = pd.concat([features for features, _ in pending], ignore_index=True)
+            try:
+                result = await loop.run_in_executor(self.executor, self.predictor.predict_batch, batch)
+            except Exception as exc:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+
+            self.batches += 1
+            self.requests += len(pending)
+            self.rows += len(batch)
+
+            start = 0
+            for features, future in pending:
+                end = start + len(features)
+                if not future.done():
+                    future.set_result(result.iloc[start:end].reset_index(drop=True))
+                start = end
+
+
+class HTTPError(Exception):
+    """
+    Erro com status HTTP retornado ao cliente
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class FireRiskServer:
+    """
+    Servidor HTTP/1.1 mínimo (asyncio) em volta de um FireRiskPredictor
+    """
+
+    def __init__(self, predictor, max_wait_ms=MAX_WAIT_MS, max_batch_rows=MAX_BATCH_ROWS):
+        self.predictor = predictor
+        self.predictor.profile = deque(maxlen=PROFILE_HISTORY)
+
+        # Um único worker: os modelos são chamados sempre em série
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='fire-risk-model')
+        self.batcher = MicroBatcher(predictor, self.executor, max_wait_ms, max_batch_rows)
+        self.started_at = time.time()
+
+        self.routes = {
+            ('GET', '/health'): self.handle_health,
+            ('GET', '/metrics'): self.handle_metrics,
+            ('GET', '/predictions/year'): self.handle_year,
+            ('GET', '/predictions/week'): self.handle_week,
+            ('POST', '/predict'): self.handle_predict,
+            ('GET', '/detections/nearby'): self.handle_nearby,
+        }
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+        """
+        Inicia o servidor e atende até ser interrompido
+        """
+        self.batcher.start()
+
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.remove(unix_path)
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+            address = unix_path
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            address = f'http://{host}:{port}'
+
+        print(f"🚀 Servidor de risco de fogo ouvindo em {address}")
+
+        # Encerrar de forma limpa em SIGINT/SIGTERM
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:
+                pass
+
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            await self.batcher.stop()
+            self.executor.shutdown(wait=False)
+            if unix_path and os.path.exists(unix_path):
+                os.remove(unix_path)
+
+    async def handle_connection(self, reader, writer):
+        """
+        Atende requisições de uma conexão (keep-alive) até o cliente fechar
+        """
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), READ_TIMEOUT_S)
+                except HTTPError as exc:
+                    await self._write_response(writer, exc.status, {'error': str(exc)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, target, headers, body = request
+                status, payload = await self._dispatch(method, target, body)
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self._write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader):
+        """
+        Lê linha de requisição, cabeçalhos e corpo (Content-Length)
+        """
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+
+        try:
+            method, target, _ = request_line.decode('latin-1').split()
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Requisição inválida')
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Content-Length inválido')
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, 'Corpo da requisição muito grande')
+        body = await reader.readexactly(length) if length else b''
+
+        return method.upper(), target, headers, body
+
+    async def _dispatch(self, method, target, body):
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path.rstrip('/') or '/'))
+        if handler is None:
+            if any(path == url.path for _, path in self.routes):
+                return HTTPStatus.METHOD_NOT_ALLOWED, {'error': 'Método não permitido'}
+            return HTTPStatus.NOT_FOUND, {'error': 'Rota não encontrada'}
+
+        try:
+            return HTTPStatus.OK, await handler(parse_qs(url.query), body)
+        except HTTPError as exc:
+            return exc.status, {'error': str(exc)}
+        except Exception as exc:
+            print(f"❌ Erro em {method} {url.path}: {exc}", file=sys.stderr)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': 'Falha ao processar a requisição'}
+
+    async def _write_response(self, writer, status, payload, keep_alive=True):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (
+            f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+            'Content-Type: application/json; charset=utf-8\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n'
+            '\r\n'
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def _run_model(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def handle_health(self, query, body):
+        return {
+            'status': 'ok',
+            'models': list(self.predictor.models),
+            'feature_names': self.predictor.feature_names,
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'batches': self.batcher.batches,
+            'requests': self.batcher.requests,
+            'rows': self.batcher.rows,
+            'model_version': self.predictor.model_version,
+            'prediction_cache': self.predictor.prediction_cache.stats(),
+        }
+
+    async def handle_metrics(self, query, body):
+        return self.predictor.metrics
+
+    async def handle_year(self, query, body):
+        try:
+            year = int(query.get('year', [2025])[0])
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Ano inválido')
+        return await self._run_model(self.predictor.predict_year, year)
+
+    async def handle_week(self, query, body):
+        return await self._run_model(self.predictor.predict_week)
+
+    async def handle_predict(self, query, body):
+        """
+        Aceita um objeto de features, uma lista deles ou {"instances": [...]}.
+        Features ausentes (ou categorias desconhecidas) recebem os valores
+        padrão do treino. DataHora (ISO 8601, opcional) define a janela das
+        features de vizinhança; sem ela, a janela termina no fim do histórico.
+        """
+        try:
+            payload = json.loads(body or b'null')
+        except json.JSONDecodeError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'JSON inválido')
+
+        if isinstance(payload, dict):
+            instances = payload.get('instances', [payload])
+        else:
+            instances = payload
+        if not isinstance(instances, list) or not instances or not all(isinstance(i, dict) for i in instances):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Envie um objeto de features ou {"instances": [...]}')
+        if len(instances) > MAX_INSTANCES:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f'Máximo de {MAX_INSTANCES} instâncias')
+
+        encoders = self.predictor.label_encoders
+        accepted = set(self.predictor.feature_names) | set(encoders) | {'DataHora'}
+        unknown = sorted({name for instance in instances for name in instance} - accepted)
+        if unknown:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f'Features desconhecidas: {", ".join(unknown)}')
+
+        features = pd.DataFrame(instances)
+
+        # Data de cada instância (NaT quando ausente)
+        time = features.pop('DataHora') if 'DataHora' in features.columns else pd.Series(None, index=features.index)
+        parsed = pd.to_datetime(time, errors='coerce', utc=True, format='ISO8601').dt.tz_localize(None)
+        if (parsed.isna() & time.notna()).any():
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'DataHora deve estar no formato ISO 8601')
+
+        # Categóricas podem vir pelo nome (ex.: "Municipio": "MOSSORÓ")
+        for column in set(encoders) & set(features.columns):
+            codes = {value: code for code, value in enumerate(encoders[column].classes_)}
+            encoded = features.pop(column).map(codes)
+            if f'{column}_encoded' in features.columns:
+                encoded = features[f'{column}_encoded'].fillna(encoded)
+            features[f'{column}_encoded'] = encoded
+
+        try:
+            features = features.astype(float)
+        except (TypeError, ValueError):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Features devem ser numéricas')
+
+        # Todas as requisições com as colunas do treino, para que um micro-lote
+        # com conjuntos de features diferentes não fique com NaN. Ausentes
+        # recebem o padrão; as de vizinhança ficam para o índice espacial
+        computed = NEIGHBOURHOOD_FEATURES if self.predictor.spatial_index is not None else []
+        features = features.reindex(columns=self.predictor.feature_names).fillna({
+            name: value for name, value in self.predictor.default_features.items() if name not in computed
+        }).assign(DataHora=parsed.to_numpy())
+
+        # Sentinelas e outliers tratados com os limites do treino
+        if self.predictor.cleaner is not None:
+            features = self.predictor.cleaner.transform(features)
+
+        result = await self.batcher.predict(features)
+
+        return {
+            'predictions': [
+                {
+                    'predictions': {model_name: float(row[model_name]) for model_name in self.predictor.models},
+                    'average_prediction': float(row['average_prediction']),
+                    'risk_level': row['risk_level'],
+                }
+                for _, row in result.iterrows()
+            ]
+        }
+
+    async def handle_nearby(self, query, body):
+        """
+        Consulta o índice espacial do bundle (microssegundos; não passa pelo
+        executor dos modelos)
+        """
+        def number(name, cast=float, default=None):
+            try:
+                return cast(query[name][0]) if name in query else default
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f'Parâmetro inválido: {name}')
+
+        latitude, longitude = number('lat'), number('lon')
+        if latitude is None or longitude is None:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, 'Informe lat e lon')
+        if self.predictor.spatial_index is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, 'Bundle sem índice espacial; treine os modelos novamente')
+
+        return self.predictor.nearby_detections(
+            latitude,
+            longitude,
+            radius_km=number('radius_km', default=NEIGHBOURHOOD_RADIUS_KM),
+            k=number('k', int),
+            days=number('days'),
+            limit=min(number('limit', int, NEARBY_MAX_RESULTS), NEARBY_MAX_RESULTS),
+        )
+
+
+def main(argv=None):
+    """
+    Carrega o bundle e inicia o servidor
+
+    Args:
+        argv: argumentos da linha de comando (default: sys.argv[1:])
+    """
+    parser = argparse.ArgumentParser(description='Servidor de predição de risco de fogo')
+    parser.add_argument('--bundle', default=BUNDLE_PATH, help='bundle salvo por FireRiskPredictor.save()')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', help='caminho de um socket Unix (substitui host/porta)')
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS,
+                        help='espera máxima para agrupar requisições num lote')
+    parser.add_argument('--max-batch-rows', type=int, default=MAX_BATCH_ROWS)
+    parser.add_argument('--approximate-cache', action='store_true',
+                        help='linhas próximas (PREDICTION_CACHE_RESOLUTION) compartilham a predição em cache')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.bundle):
+        print(f"❌ Bundle {args.bundle} não encontrado. Rode fire_risk_prediction.py para treinar os modelos.")
+        return 1
+
+    print("🔥 Servidor de Predição de Risco de Fogo")
+    print("=" * 80)
+
+    predictor = FireRiskPredictor.load(args.bundle)
+    if args.approximate_cache:
+        predictor.prediction_cache_resolution = PREDICTION_CACHE_RESOLUTION
+    server = FireRiskServer(predictor, args.max_wait_ms, args.max_batch_rows)
+
+    asyncio.run(server.serve(args.host, args.port, args.unix))
+    print("\n👋 Servidor encerrado")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
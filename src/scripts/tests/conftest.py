@@ -0,0 +1,42 @@
+"""
+Fixtures compartilhadas: um preditor treinado uma vez por sessão em dados
+sintéticos no formato do BDQueimadas
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fire_risk_prediction import FireRiskPredictor, create_synthetic_bdqueimadas  # noqa: E402
+
+# Linhas do CSV sintético usado nos testes
+SYNTHETIC_ROWS = 3000
+
+
+@pytest.fixture(scope='session')
+def synthetic_csv(tmp_path_factory):
+    """
+    CSV sintético com datas espalhadas por dois anos
+    """
+    path = tmp_path_factory.mktemp('data') / 'bdqueimadas.csv'
+    df = create_synthetic_bdqueimadas(SYNTHETIC_ROWS, seed=7, start='2023-01-01', end='2024-12-31')
+    df['DataHora'] = df['DataHora'].dt.strftime('%Y/%m/%d %H:%M:%S')
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def trained_predictor(synthetic_csv, tmp_path_factory):
+    """
+    Preditor com os três modelos treinados (em sequência) no CSV sintético,
+    com as features de vizinhança
+    """
+    predictor = FireRiskPredictor(data_path=synthetic_csv, cache_dir=str(tmp_path_factory.mktemp('cache')),
+                                  neighbourhood_features=True)
+    predictor.load_and_prepare_data()
+    predictor.prepare_features()
+    predictor.train_all(parallel=False)
+    return predictor
@@ -0,0 +1,50 @@
+"""
+Bundles salvos: ida e volta e rejeição de versões anteriores do formato
+"""
+
+import json
+
+import joblib
+import numpy as np
+import pytest
+
+from fire_risk_inference import FAST_BUNDLE_VERSION
+from fire_risk_prediction import BUNDLE_VERSION, FireRiskPredictor
+
+
+def test_bundle_round_trip(trained_predictor, tmp_path):
+    path = str(tmp_path / 'bundle.joblib')
+    trained_predictor.save(path)
+    loaded = FireRiskPredictor.load(path)
+
+    features = trained_predictor.df_mossoro.head(50)
+    expected = trained_predictor.predict_batch(features, use_cache=False)
+    result = loaded.predict_batch(features, use_cache=False)
+
+    assert loaded.model_version == trained_predictor.model_version
+    assert loaded.spatial_index is not None and loaded.cleaner is not None
+    np.testing.assert_allclose(result['average_prediction'], expected['average_prediction'])
+
+
+def test_older_bundle_is_rejected(trained_predictor, tmp_path):
+    path = str(tmp_path / 'bundle.joblib')
+    trained_predictor.save(path)
+    bundle = joblib.load(path)
+    joblib.dump({**bundle, 'format_version': BUNDLE_VERSION - 1}, path)
+
+    with pytest.raises(ValueError, match='Treine novamente'):
+        FireRiskPredictor.load(path)
+
+
+def test_older_fast_bundle_is_rejected(trained_predictor, tmp_path):
+    path = str(tmp_path / 'bundle.npz')
+    trained_predictor.export_fast_bundle(path)
+    with np.load(path) as data:
+        arrays = dict(data)
+    meta = json.loads(arrays['meta'].tobytes().decode('utf-8'))
+    meta['format_version'] = FAST_BUNDLE_VERSION - 1
+    arrays['meta'] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+    np.savez(path, **arrays)
+
+    with pytest.raises(ValueError, match='export_fast_bundle'):
+        FireRiskPredictor.load_fast(path)
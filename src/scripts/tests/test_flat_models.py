@@ -0,0 +1,79 @@
+"""
+Paridade entre os modelos achatados (fire_risk_inference) e o scikit-learn
+"""
+
+import numpy as np
+import pytest
+from sklearn.neighbors import KNeighborsRegressor
+
+from fire_risk_inference import FastPredictor, FlatKNN, FlatMLP, FlatRandomForest
+from fire_risk_prediction import FAST_EXPORT_TOLERANCE
+
+FLAT_CLASSES = {
+    'random_forest': FlatRandomForest,
+    'neural_network': FlatMLP,
+    'knn': FlatKNN,
+}
+
+
+@pytest.mark.parametrize('model_name', list(FLAT_CLASSES))
+def test_flat_model_matches_sklearn(trained_predictor, model_name):
+    model = trained_predictor.models[model_name]
+    X = np.asarray(trained_predictor.X_test_scaled, dtype=np.float64)
+
+    flat = FLAT_CLASSES[model_name].from_sklearn(model)
+
+    np.testing.assert_allclose(flat.predict(X), model.predict(X), rtol=0, atol=FAST_EXPORT_TOLERANCE)
+
+
+@pytest.mark.parametrize('model_name', list(FLAT_CLASSES))
+def test_flat_model_round_trip(trained_predictor, model_name):
+    flat = FLAT_CLASSES[model_name].from_sklearn(trained_predictor.models[model_name])
+    X = np.asarray(trained_predictor.X_test_scaled[:100], dtype=np.float64)
+
+    restored = FLAT_CLASSES[model_name].from_arrays(flat.to_arrays('m__'), 'm__')
+
+    np.testing.assert_array_equal(restored.predict(X), flat.predict(X))
+
+
+@pytest.mark.parametrize('weights', ['uniform', 'distance'])
+@pytest.mark.parametrize('metric', ['euclidean', 'manhattan'])
+def test_flat_knn_ties_keep_lowest_indices(weights, metric):
+    rng = np.random.default_rng(0)
+    # Coordenadas com uma casa decimal: muitas distâncias empatadas
+    X = np.round(rng.normal(size=(400, 3)), 1)
+    y = rng.normal(size=400)
+    queries = np.round(rng.normal(size=(200, 3)), 1)
+    knn = KNeighborsRegressor(n_neighbors=5, weights=weights, metric=metric, algorithm='brute').fit(X, y)
+
+    flat = FlatKNN.from_sklearn(knn)
+    ties = flat.boundary_ties(queries)
+
+    # Empate: os vizinhos são os de menor índice entre os empatados
+    dist = flat._distances(queries)
+    index = np.broadcast_to(np.arange(len(X)), dist.shape)
+    expected = np.lexsort((index, np.round(dist, 9)))[:, :5]
+    idx, tied = flat._neighbors(dist)
+    assert ties.any()
+    np.testing.assert_array_equal(tied, ties)
+    np.testing.assert_array_equal(np.sort(idx[ties], axis=1), np.sort(expected[ties], axis=1))
+
+    # Sem empate a escolha é única e o resultado é o do scikit-learn
+    np.testing.assert_allclose(
+        flat.predict(queries[~ties]), knn.predict(queries[~ties]), rtol=0, atol=FAST_EXPORT_TOLERANCE
+    )
+
+
+def test_fast_bundle_matches_predictor(trained_predictor, tmp_path):
+    path = str(tmp_path / 'model_bundle_fast.npz')
+    trained_predictor.export_fast_bundle(path)
+    features = trained_predictor.df_mossoro.head(200)[['Latitude', 'Longitude', 'DiaSemChuva', 'Precipitacao', 'FRP']]
+
+    fast = FastPredictor.load(path).predict_batch(features)
+    expected = trained_predictor.predict_batch(features, use_cache=False)
+
+    for model_name in trained_predictor.models:
+        np.testing.assert_allclose(
+            fast[model_name], expected[model_name], rtol=0, atol=FAST_EXPORT_TOLERANCE
+        )
+    assert list(fast['risk_level']) == list(expected['risk_level'])
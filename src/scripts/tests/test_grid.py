@@ -0,0 +1,53 @@
+"""
+Grade de risco: blocos por data gravados à medida que são preditos
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import fire_risk_prediction
+
+
+BBOX = (-37.5, -5.5, -37.0, -5.2)
+DATES = ['2024-08-10', '2024-09-15']
+
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    # Vários blocos por data, inclusive um bloco final incompleto
+    monkeypatch.setattr(fire_risk_prediction, 'GRID_BATCH_ROWS', 7)
+
+
+def test_grid_matches_predict_batch(trained_predictor, small_batches):
+    grid = trained_predictor.predict_grid(bbox=BBOX, resolution=0.1, dates=DATES)
+    assert grid['risk'].shape == (2, 3, 5)
+
+    # Célula do meio da segunda data, predita diretamente
+    date = pd.Timestamp(DATES[1])
+    stats = trained_predictor._stats_for_month(date.month)
+    features = pd.DataFrame({
+        'Mes': [date.month], 'Dia': [date.day], 'DiaSemana': [date.dayofweek], 'Hora': [14],
+        'DiaSemChuva': [stats['DiaSemChuva']], 'Precipitacao': [stats['Precipitacao']], 'FRP': [stats['FRP']],
+        'Latitude': [grid['latitudes'][1]], 'Longitude': [grid['longitudes'][2]],
+        'DataHora': [date],
+    })
+    expected = trained_predictor.predict_batch(features, use_cache=False)['average_prediction'].iloc[0]
+    assert grid['risk'][1, 1, 2] == pytest.approx(expected, rel=1e-5)
+
+
+def test_streamed_grid_file_matches_memory(trained_predictor, small_batches, tmp_path):
+    in_memory = trained_predictor.predict_grid(bbox=BBOX, resolution=0.1, dates=DATES)
+    streamed = trained_predictor.predict_grid(bbox=BBOX, resolution=0.1, dates=DATES, output_dir=str(tmp_path))
+
+    with open(tmp_path / 'grid_risk.json', encoding='utf-8') as f:
+        manifest = json.load(f)
+    entry = manifest['columns'][0]
+    assert entry['dtype'] == '<f4' and entry['shape'] == [2, 3, 5]
+    assert manifest['dates'] == DATES
+
+    stored = np.fromfile(tmp_path / manifest['file'], dtype='<f4').reshape(entry['shape'])
+    np.testing.assert_array_equal(stored, in_memory['risk'])
+    np.testing.assert_array_equal(streamed['risk'], in_memory['risk'])
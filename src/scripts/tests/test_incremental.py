@@ -0,0 +1,45 @@
+"""
+Atualização incremental: o KNN é refeito sobre a referência guardada mais a
+janela nova, sem mexer em atributos internos do scikit-learn
+"""
+
+import numpy as np
+from sklearn.neighbors import KNeighborsRegressor
+
+from fire_risk_prediction import FireRiskPredictor, _extend_knn, create_synthetic_bdqueimadas
+
+
+def test_extend_knn_refits_on_reference_and_new_rows():
+    rng = np.random.default_rng(0)
+    X_old, y_old = rng.normal(size=(200, 4)), rng.random(200)
+    X_new, y_new = rng.normal(size=(50, 4)), rng.random(50)
+    X_query = rng.normal(size=(30, 4))
+
+    knn = KNeighborsRegressor(n_neighbors=5, weights='distance', algorithm='kd_tree').fit(X_old, y_old)
+    before = knn.predict(X_query)
+    extended, (X_ref, y_ref) = _extend_knn(knn, (X_old, y_old), X_new, y_new)
+
+    expected = KNeighborsRegressor(n_neighbors=5, weights='distance', algorithm='kd_tree').fit(
+        np.vstack([X_old, X_new]), np.concatenate([y_old, y_new])
+    )
+    np.testing.assert_allclose(extended.predict(X_query), expected.predict(X_query))
+    np.testing.assert_allclose(knn.predict(X_query), before)
+    assert extended.get_params() == knn.get_params()
+    assert len(X_ref) == len(y_ref) == 250
+
+
+def test_update_models_extends_saved_knn_reference(trained_predictor, tmp_path):
+    path = str(tmp_path / 'bundle.joblib')
+    trained_predictor.save(path)
+    predictor = FireRiskPredictor.load(path)
+    n_reference = len(predictor.knn_reference[0])
+
+    new_data = create_synthetic_bdqueimadas(100, seed=11, start='2025-01-01')
+    for name, part in [('Ano', 'year'), ('Mes', 'month'), ('Dia', 'day'), ('Hora', 'hour')]:
+        new_data[name] = getattr(new_data['DataHora'].dt, part)
+    new_data['DiaSemana'] = new_data['DataHora'].dt.dayofweek
+
+    predictor.update_models(new_data)
+
+    assert len(predictor.knn_reference[0]) == n_reference + len(new_data)
+    assert predictor.models['knn'].n_samples_fit_ == n_reference + len(new_data)
@@ -0,0 +1,63 @@
+"""
+Estatísticas mensais incrementais: histogramas de tamanho fixo, com medianas
+a até uma largura de faixa das do recálculo completo
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fire_risk_prediction import MONTHLY_MEDIAN_FEATURES, FireRiskPredictor, create_synthetic_bdqueimadas
+
+
+def detections(n_samples, seed):
+    df = create_synthetic_bdqueimadas(n_samples, seed=seed, start='2024-01-01', end='2024-12-31')
+    df['Mes'] = df['DataHora'].dt.month
+    return df
+
+
+@pytest.fixture
+def predictor():
+    history = detections(5000, seed=1)
+    predictor = FireRiskPredictor(cache_dir=None)
+    predictor.df_mossoro = history
+    predictor.feature_names = []
+    predictor._fit_reference_stats(np.empty((len(history), 0)))
+    return predictor
+
+
+def test_incremental_medians_match_full_recompute(predictor):
+    sketches = predictor.monthly_sketches
+    shapes = {col: sketches.counts[col].shape for col in MONTHLY_MEDIAN_FEATURES}
+    new_data = detections(1000, seed=2)
+
+    predictor.update_monthly_stats(new_data)
+    full = pd.concat([predictor.df_mossoro, new_data], ignore_index=True)
+    predictor.df_mossoro = full
+    expected = predictor._calculate_monthly_stats()
+
+    # Tolerância: uma largura de faixa de cada feature
+    for col in MONTHLY_MEDIAN_FEATURES:
+        tolerance = sketches.width[col]
+        for month, stats in expected.items():
+            assert predictor.monthly_stats[month][col] == pytest.approx(stats[col], abs=tolerance), (month, col)
+        assert predictor.overall_stats[col] == pytest.approx(full[col].median(), abs=tolerance), col
+        assert sketches.counts[col].shape == shapes[col]
+
+    for month, stats in expected.items():
+        assert predictor.monthly_stats[month]['count'] == stats['count']
+        assert predictor.monthly_stats[month]['RiscoFogo_medio'] == pytest.approx(stats['RiscoFogo_medio'])
+    assert predictor.overall_stats['RiscoFogo_medio'] == pytest.approx(full['RiscoFogo'].mean())
+
+
+def test_update_touches_only_new_months(predictor):
+    new_data = detections(200, seed=3)
+    new_data = new_data[new_data['Mes'] == 3]
+    before = {month: dict(stats) for month, stats in predictor.monthly_stats.items()}
+
+    predictor.update_monthly_stats(new_data)
+
+    for month, stats in before.items():
+        if month != 3:
+            assert predictor.monthly_stats[month] == stats
+    assert predictor.monthly_stats[3]['count'] == before[3]['count'] + len(new_data)
@@ -0,0 +1,69 @@
+"""
+Features de vizinhança: janela com defasagem, limite de origem do backtest e
+o mesmo cálculo no treino e na predição
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fire_risk_inference import FastPredictor, SpatialIndex
+from fire_risk_prediction import NEIGHBOURHOOD_FEATURES
+
+
+def single_site_index():
+    """
+    Uma detecção por dia, todas no mesmo ponto, em janeiro de 2024; o
+    RiscoFogo de cada uma é o dia (0 a 30) dividido por 30
+    """
+    days = pd.date_range('2024-01-01', periods=31, freq='D').to_numpy()
+    n = len(days)
+    return SpatialIndex.build(np.full(n, -5.2), np.full(n, -37.3), days, np.arange(n) / 30, cell_km=50)
+
+
+def test_lag_shifts_window():
+    index = single_site_index()
+    time = np.array(['2024-01-21'], dtype='datetime64[s]')
+
+    count, risk = index.neighbourhood([-5.2], [-37.3], time, 50, window_days=10)
+    lagged_count, lagged_risk = index.neighbourhood([-5.2], [-37.3], time, 50, window_days=10, lag_days=7)
+
+    # Dias [10, 20) sem defasagem; [3, 13) com 7 dias
+    assert count[0] == lagged_count[0] == 10
+    assert risk[0] == pytest.approx(np.mean(np.arange(10, 20) / 30))
+    assert lagged_risk[0] == pytest.approx(np.mean(np.arange(3, 13) / 30))
+
+
+def test_until_caps_window_end():
+    index = single_site_index()
+    time = np.array(['2024-01-31'], dtype='datetime64[s]')
+
+    capped, _ = index.neighbourhood([-5.2], [-37.3], time, 50, window_days=30, until=pd.Timestamp('2024-01-11'))
+    free, _ = index.neighbourhood([-5.2], [-37.3], time, 50, window_days=30)
+
+    # Só as detecções de 1 a 10 de janeiro antecedem a origem
+    assert capped[0] == 10
+    assert free[0] == 30
+
+
+def test_training_and_serving_features_match(trained_predictor, tmp_path):
+    rows = trained_predictor.df_mossoro.head(200)
+    raw = rows.drop(columns=NEIGHBOURHOOD_FEATURES)
+
+    # Treino (build_spatial_index) e predict_batch calculam igual
+    recomputed = trained_predictor._encode_features(raw)
+    np.testing.assert_allclose(
+        recomputed[NEIGHBOURHOOD_FEATURES].to_numpy(), rows[NEIGHBOURHOOD_FEATURES].to_numpy()
+    )
+
+    # O bundle achatado usa a mesma janela (inclusive a defasagem)
+    path = str(tmp_path / 'bundle.npz')
+    trained_predictor.export_fast_bundle(path)
+    fast = FastPredictor.load(path)
+    X = fast.feature_matrix({
+        'Latitude': raw['Latitude'].to_numpy(),
+        'Longitude': raw['Longitude'].to_numpy(),
+        'DataHora': raw['DataHora'].to_numpy(),
+    })
+    columns = [fast.feature_names.index(name) for name in NEIGHBOURHOOD_FEATURES]
+    np.testing.assert_allclose(X[:, columns], rows[NEIGHBOURHOOD_FEATURES].to_numpy())
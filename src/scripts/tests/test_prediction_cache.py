@@ -0,0 +1,91 @@
+"""
+Cache de predições: os modelos sempre recebem as features exatas; só o modo
+aproximado compartilha predições entre linhas próximas
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fire_risk_prediction import PREDICTION_CACHE_RESOLUTION
+
+FEATURES = ['Latitude', 'Longitude', 'DiaSemChuva', 'Precipitacao', 'FRP']
+
+
+@pytest.fixture
+def predictor(trained_predictor):
+    trained_predictor.prediction_cache.clear()
+    yield trained_predictor
+    trained_predictor.prediction_cache.clear()
+    trained_predictor.prediction_cache_resolution = None
+
+
+@pytest.fixture
+def features(trained_predictor):
+    return trained_predictor.df_mossoro[FEATURES].head(300).reset_index(drop=True)
+
+
+def model_columns(result, predictor):
+    return result[list(predictor.models)].to_numpy()
+
+
+def jitter(features, fraction, seed=0):
+    """
+    Linhas deslocadas até fraction da resolução de quantização de cada feature
+    """
+    rng = np.random.default_rng(seed)
+    jittered = features.copy()
+    for name in FEATURES:
+        step = PREDICTION_CACHE_RESOLUTION.get(name, 1.0) * fraction
+        jittered[name] = features[name] + rng.uniform(-step, step, len(features))
+    return jittered
+
+
+@pytest.mark.parametrize('resolution', [None, PREDICTION_CACHE_RESOLUTION])
+def test_cold_cache_matches_uncached(predictor, features, resolution):
+    predictor.prediction_cache_resolution = resolution
+    uncached = predictor.predict_batch(features, use_cache=False)
+
+    cached = predictor.predict_batch(features)
+
+    np.testing.assert_array_equal(model_columns(cached, predictor), model_columns(uncached, predictor))
+    assert len(predictor.prediction_cache) > 0
+
+
+def test_exact_cache_hits_match_uncached(predictor, features):
+    batch = pd.concat([features, jitter(features, 0.25)], ignore_index=True)
+    predictor.predict_batch(batch)
+
+    hits_before = predictor.prediction_cache.stats()['hits']
+    cached = predictor.predict_batch(batch)
+
+    assert predictor.prediction_cache.stats()['hits'] - hits_before == len(batch)
+    np.testing.assert_array_equal(
+        model_columns(cached, predictor), model_columns(predictor.predict_batch(batch, use_cache=False), predictor)
+    )
+
+
+def test_approximate_cache_shares_cell_prediction(predictor, features):
+    predictor.prediction_cache_resolution = PREDICTION_CACHE_RESOLUTION
+    first = predictor.predict_batch(features)
+
+    # Cada valor levado para a metade do caminho até o centro da sua célula
+    moved = features.copy()
+    for name in FEATURES:
+        resolution = PREDICTION_CACHE_RESOLUTION.get(name, 1.0)
+        center = np.round(features[name] / resolution) * resolution
+        moved[name] = center + (features[name] - center) / 2
+    nearby = predictor.predict_batch(moved)
+
+    np.testing.assert_array_equal(model_columns(nearby, predictor), model_columns(first, predictor))
+
+
+def test_duplicate_rows_in_one_batch(predictor, features):
+    batch = pd.concat([features.head(10)] * 3, ignore_index=True)
+
+    result = predictor.predict_batch(batch)
+
+    np.testing.assert_array_equal(
+        model_columns(result, predictor),
+        model_columns(predictor.predict_batch(batch, use_cache=False), predictor)
+    )
@@ -0,0 +1,131 @@
+"""
+Servidor de predição: micro-lotes de requisições concorrentes
+"""
+
+import asyncio
+import json
+
+import pandas as pd
+import pytest
+
+from fire_risk_server import FireRiskServer, HTTPError
+
+# Espera do micro-lote nos testes: longa o bastante para juntar as requisições
+BATCH_WAIT_MS = 50
+
+
+def predict_concurrently(predictor, bodies):
+    """
+    Envia os corpos a /predict ao mesmo tempo; devolve as respostas (ou
+    exceções) e o número de lotes avaliados
+    """
+    async def run():
+        server = FireRiskServer(predictor, max_wait_ms=BATCH_WAIT_MS)
+        server.batcher.start()
+        try:
+            results = await asyncio.gather(
+                *(server.handle_predict({}, json.dumps(body).encode()) for body in bodies),
+                return_exceptions=True
+            )
+        finally:
+            await server.batcher.stop()
+            server.executor.shutdown(wait=True)
+        return results, server.batcher.batches
+
+    return asyncio.run(run())
+
+
+def predictions_of(response):
+    return [item['predictions'] for item in response['predictions']]
+
+
+def test_concurrent_requests_share_one_batch(trained_predictor):
+    bodies = [
+        {'instances': [{'Latitude': -5.2 - i / 100, 'Longitude': -37.3, 'FRP': 10.0 + i}]}
+        for i in range(4)
+    ]
+
+    batched, batches = predict_concurrently(trained_predictor, bodies)
+    alone = [predict_concurrently(trained_predictor, [body])[0][0] for body in bodies]
+
+    assert batches == 1
+    for response, expected in zip(batched, alone):
+        assert predictions_of(response) == pytest.approx(predictions_of(expected))
+
+
+def test_batch_results_return_to_their_request(trained_predictor):
+    bodies = [
+        {'instances': [{'Latitude': -5.2, 'Longitude': -37.3, 'DiaSemChuva': 0}] * 3},
+        {'Latitude': -5.2, 'Longitude': -37.3, 'DiaSemChuva': 29},
+    ]
+
+    (many, one), _ = predict_concurrently(trained_predictor, bodies)
+
+    assert len(many['predictions']) == 3
+    assert len(one['predictions']) == 1
+
+
+@pytest.mark.parametrize('bodies', [
+    [{'Latitude': -5.2, 'Longitude': -37.3, 'FRP': 12.0}, {'Latitude': -5.3, 'Longitude': -37.4}],
+    [{'Latitude': -5.2, 'Longitude': -37.3, 'Municipio': 'MOSSORÓ'}, {'Latitude': -5.2, 'Longitude': -37.3}],
+    [{'Latitude': -5.2, 'Longitude': -37.3, 'DataHora': '2024-06-01T14:00:00'}, {'Latitude': -5.2, 'Longitude': -37.3}],
+])
+def test_batch_with_different_feature_sets(trained_predictor, bodies):
+    batched, batches = predict_concurrently(trained_predictor, bodies)
+    alone = [predict_concurrently(trained_predictor, [body])[0][0] for body in bodies]
+
+    assert batches == 1
+    for response, expected in zip(batched, alone):
+        assert not isinstance(response, Exception), response
+        assert predictions_of(response) == pytest.approx(predictions_of(expected))
+
+
+def test_unknown_feature_is_rejected(trained_predictor):
+    (result,), _ = predict_concurrently(trained_predictor, [{'Latitude': -5.2, 'Temperatura': 30}])
+
+    assert isinstance(result, HTTPError)
+    assert 'Temperatura' in str(result)
+
+
+def test_datahora_sets_neighbourhood_window(trained_predictor):
+    dates = ['2023-03-01T14:00:00', '2024-09-01T14:00:00Z']
+    bodies = [{'Latitude': -5.2, 'Longitude': -37.3, 'DataHora': date} for date in dates]
+
+    responses, _ = predict_concurrently(trained_predictor, bodies)
+    expected = trained_predictor.predict_batch(pd.DataFrame({
+        'Latitude': -5.2, 'Longitude': -37.3, 'DataHora': pd.to_datetime(dates, utc=True, format='ISO8601').tz_localize(None),
+    }), use_cache=False)
+
+    for response, (_, row) in zip(responses, expected.iterrows()):
+        assert predictions_of(response) == [pytest.approx({name: row[name] for name in trained_predictor.models})]
+
+
+def test_invalid_datahora_is_rejected(trained_predictor):
+    (result,), _ = predict_concurrently(trained_predictor, [{'Latitude': -5.2, 'DataHora': 'ontem'}])
+
+    assert isinstance(result, HTTPError)
+    assert 'DataHora' in str(result)
+
+
+@pytest.mark.parametrize('content_length', ['abc', '-5'])
+def test_malformed_content_length_gets_400(trained_predictor, content_length):
+    async def run():
+        server = FireRiskServer(trained_predictor, max_wait_ms=BATCH_WAIT_MS)
+        listener = await asyncio.start_server(server.handle_connection, '127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(f'POST /predict HTTP/1.1\r\nContent-Length: {content_length}\r\n\r\n'.encode())
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return response
+        finally:
+            listener.close()
+            await listener.wait_closed()
+            server.executor.shutdown(wait=True)
+
+    response = asyncio.run(run())
+
+    assert response.startswith(b'HTTP/1.1 400')
+    assert b'Content-Length' in response